@@ -1,8 +1,40 @@
-from src.chrono_client import  (ChronoClient, ChronoSchedule)
-from src.commands import MSSH_COMMS
+import argparse
+import sys
 
 
 if __name__ == "__main__":
+    parser=argparse.ArgumentParser(description="Chrono")
+    parser.add_argument("--headless", action="store_true", help="save figures to files instead of showing them")
+    mode=parser.add_mutually_exclusive_group()
+    mode.add_argument("--script", metavar="FILE", help="execute the commands in FILE (one per line) and save once at the end")
+    mode.add_argument("--stdin", action="store_true", help="execute the commands read from stdin like --script")
+    mode.add_argument("--serve", action="store_true", help="keep the project in memory and execute commands sent with --send")
+    mode.add_argument("--send", metavar="COMMAND", nargs="+", help="execute commands (one per argument) on the running server")
+    mode.add_argument("--stop", action="store_true", help="save and stop the running server")
+    parser.add_argument("--reference", default="base", help="initial reference of --script / --stdin / --send")
+    parser.add_argument("--quiet", action="store_true", help="discard the output of the commands of --script / --stdin")
+    args=parser.parse_args()
+    if args.send!=None or args.stop:
+        # the thin client does not load the project
+        from src.server import send
+        sys.exit(send(args.send or [], args.reference, args.stop))
+    if args.script!=None:
+        try:
+            with open(args.script, "r", encoding="utf-8") as f:
+                lines=f.read().splitlines()
+        except OSError as e:
+            print(e, file=sys.stderr)
+            sys.exit(2)
+    elif args.stdin:
+        lines=sys.stdin.read().splitlines()
+    from src.chrono_client import  (ChronoClient, ChronoSchedule)
+    from src.commands import MSSH_COMMS, MSSH_MUTATING
     s=ChronoSchedule("data/schedule.json")
-    c=ChronoClient("data/project", s, MSSH_COMMS)
-    c.run()
+    c=ChronoClient("data/project", s, MSSH_COMMS, headless=args.headless or args.serve, mutating=MSSH_MUTATING)
+    if args.serve:
+        from src.server import ChronoServer
+        ChronoServer(c, autosave=c.project.settings.get("server_autosave", 60)).serve()
+    elif args.script!=None or args.stdin:
+        sys.exit(c.run_script(lines, args.reference, args.quiet))
+    else:
+        c.run()
@@ -0,0 +1,98 @@
+import logging
+import re
+from inspect import Parameter, signature
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.helper import split_command
+
+LITERAL, ARG, REST=0, 1, 2
+PLACEHOLDER=re.compile(r"^\$(\d+)$")
+
+Binding=Tuple[int, Any]
+
+
+def arity(f:Callable)->Tuple[int, Optional[int]]:
+    """(required, maximum) number of arguments of a command after project and reference. The maximum is None if
+    the command takes *args."""
+    params=list(signature(f).parameters.values())[2:]
+    if any(p.kind==Parameter.VAR_POSITIONAL for p in params):
+        return len([p for p in params if p.kind!=Parameter.VAR_POSITIONAL and p.default is Parameter.empty]), None
+    return len([p for p in params if p.default is Parameter.empty]), len(params)
+
+
+class AliasPipeline:
+    """A compiled alias (see the alias documentation): the commands seperated by |> with their callables resolved and a
+    binding plan for their arguments. $k binds the k-th argument of the alias, $N all arguments after the largest $k of
+    the same command. The reference is passed from one command to the next."""
+
+    name:str
+    text:str
+    steps:List[Tuple[str, Callable, List[Binding]]]
+    nargs:int
+
+    def __init__(self, name:str, text:str, cmds:Dict[str, Callable]):
+        """Constructor: AliasPipeline. Raises if a command does not exist or gets the wrong number of arguments."""
+        self.name=name
+        self.text=text
+        self.steps=[]
+        self.nargs=0
+        for part in text.split(" |> "):
+            words=split_command(part)
+            if words==[]:
+                raise Exception(f"alias {name}: empty command in \"{text}\"")
+            cmd=words[0].lower()
+            if not cmd in cmds.keys():
+                raise Exception(f"alias {name}: {words[0]} does not exist")
+            indices=[int(m.group(1)) for word in words[1:] if (m:=PLACEHOLDER.match(word))!=None]
+            if 0 in indices:
+                raise Exception(f"alias {name}: arguments start at $1")
+            plan:List[Binding]=[]
+            for word in words[1:]:
+                if (m:=PLACEHOLDER.match(word))!=None: plan.append((ARG, int(m.group(1))-1))
+                elif word=="$N": plan.append((REST, max(indices, default=0)))
+                elif "$" in word: raise Exception(f"alias {name}: invalid placeholder {word}")
+                else: plan.append((LITERAL, word))
+            fixed=len([kind for kind, _ in plan if kind!=REST])
+            required, maximum=arity(cmds[cmd])
+            if maximum!=None and fixed>maximum:
+                raise Exception(f"alias {name}: {cmd} takes at most {maximum} arguments, got {fixed}")
+            if not any(kind==REST for kind, _ in plan) and fixed<required:
+                raise Exception(f"alias {name}: {cmd} needs at least {required} arguments, got {fixed}")
+            self.nargs=max([self.nargs]+indices)
+            self.steps.append((cmd, cmds[cmd], plan))
+
+    def commands(self)->List[Tuple[str, Callable]]:
+        return [(cmd, f) for cmd, f, _ in self.steps]
+
+    def __call__(self, project:Any, reference:str, *args:str)->str:
+        if len(args)<self.nargs:
+            raise Exception(f"alias {self.name} needs at least {self.nargs} arguments, got {len(args)}")
+        for _, f, plan in self.steps:
+            call_args:List[str]=[]
+            for kind, value in plan:
+                if kind==LITERAL: call_args.append(value)
+                elif kind==ARG: call_args.append(args[value])
+                else: call_args+=args[value:]
+            reference=f(project, reference, *call_args)
+        return reference
+
+
+# compiled aliases by (name, text), reused as long as the commands they call are unchanged
+ALIAS_CACHE:Dict[Tuple[str, str], AliasPipeline]=dict()
+
+
+def compile_aliases(aliases:Dict[str, str], cmds:Dict[str, Callable])->Dict[str, AliasPipeline]:
+    """Compiles var:aliases (name -> text, see AliasPipeline) against var:cmds. Invalid aliases are skipped with a warning."""
+    rtn:Dict[str, AliasPipeline]={}
+    for name, text in aliases.items():
+        pipeline=ALIAS_CACHE.get((name.lower(), text))
+        if pipeline==None or any(cmds.get(cmd)!=f for cmd, f in pipeline.commands()):
+            try:
+                pipeline=AliasPipeline(name.lower(), text, cmds)
+            except Exception as e:
+                logging.warning(e)
+                print(f"Skipping {e}")
+                continue
+            ALIAS_CACHE[(name.lower(), text)]=pipeline
+        rtn[name.lower()]=pipeline
+    return rtn
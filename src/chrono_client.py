@@ -1,38 +1,68 @@
+import contextlib
+import copy
+import io
 import json
 import logging
 import os
 import shutil
 import subprocess
+import sys
+import threading
+import tracemalloc
 import calendar
 from datetime import (date, datetime, time, timedelta)
 from functools import reduce
+from time import perf_counter, thread_time
+from itertools import groupby
+from bisect import bisect_left
 from inspect import signature, Parameter
-from typing import (Callable, Dict, List, Tuple, Union, Set, Optional, Any)
+from typing import (Callable, Dict, Generator, Iterable, List, Tuple, Union, Set, Optional, Any)
 from os import mkdir, path
-import networkx as nx
 import sqlite3
-import imageio
-import src.monotone_clustering as mc
 import numpy as np
-from scipy.fft import fft, fftfreq
 
-import matplotlib.pyplot as plt
-import matplotlib.animation as animation
+from src.render import LazyModule, animation, plt, set_blocking, set_headless, show_plot
 
-from src.helper import (create_db, get_color, get_intersect, heatmap, list_to_string, seconds_to_time, split_command, str_to_seconds, times_tags_to_ints,
-                    write_table, time_from_str, get_tf_length, 
-                    WEEKDAYS, MSSH_color_scheme, sleepdata_to_time, cursed_get_lambda, what_or_none, 
-                    concatsem, get_pace_ticks,times_tags_to_ints, time_to_int, add_time_delta, fix_oura, get_sleep_phase)
+from src.helper import (create_db, draw_heatmap, get_intersect, heatmap, heatmap_data, list_to_string, seconds_to_time, split_command, str_to_seconds, times_tags_to_ints,
+                    write_table, time_from_str, 
+                    WEEKDAYS, MSSH_color_scheme, sleepdata_to_time, 
+                    get_pace_ticks,times_tags_to_ints, time_to_int, add_time_delta, get_sleep_phase)
 
 from src.sport import (ChronoPlankEvent, ChronoRunningEvent, ChronoSitUpsEvent, 
                    ChronoPushUpEvent, ChronoSportEvent)
 
 from src.atoms import (ChronoEvent, ChronoTime, ChronoNote)
 
-from src.oura import get_sleep
+from src.oura import night_hash, chunks, BASE_URL, CHUNK_DAYS, WORKERS, OuraClient, SleepSyncState, SleepData
+from src.series import ChronoSeries
+from src.functions import FunctionStore
+from src.tag_graph import TagGraphIndex
+from src.query import ChronoQuery
+from src.rollups import RollupIndex
+from src.export import export_csv, TABLES
+from src.parquet import export_parquet, import_parquet
+from src.alias import compile_aliases
+from src.grid import SlotGrid, fixed_slots, poi_slots, write_csv, write_html
+from src.latex import FragmentCache, LatexJob, LatexRunner, document_hash
+from src.locking import RWLock
+from src.jobs import Analysis, JobManager
+from src.perf import PerfStats
+from src.sleep import SleepStore, PHASES, SLOT, bedtime_offset, phases_from_str, smooth
 
 VERSION="2.0.0.d"
 
+# imported on first use, see LazyModule
+nx=LazyModule("networkx")
+imageio=LazyModule("imageio")
+mc=LazyModule("src.monotone_clustering")
+scipy_fft=LazyModule("scipy.fft")
+spectral=LazyModule("src.spectral")
+
+SCRIPT_FORBIDDEN=["refresh", "restore"] # reload the project from disk, which would drop the unsaved changes of a script
+CLIENT_MUTATING=["refresh", "restore", "importparquet", "overview", "lhof", "rhof", "ihof", "bg", "profile"] # commands of ChronoClient holding the project lock exclusively
+
+SYNC_PROVISIONAL_DAYS=2 # nights younger than this are fetched again by syncsleep
+
 REF_MAN="Reference Management"
 DAY_MAN="ChronoDay Management"
 EVE_MAN="ChronoEvent Management"
@@ -66,7 +96,9 @@ class ChronoDay:
         self.silent_events=[]
         self.sport={"runs":[],"pushups":[],"planks":[],"situps":[]}
         self.sleep=""
+        self.sleep_start=""
         self.functions=dict()
+        self.project=None
 
     def __repr__(self)->str:
         """Returns a string representation of this object. Used by the command today"""
@@ -92,6 +124,7 @@ class ChronoDay:
         """
         if not reduce(lambda a,b: a or b, [self.check_overlap(e, event) for e in self.events], False) or self.events==[]:
             self.events.append(event)
+            self.touch()
         elif force:
             self.events.append(event)
             todel=[]
@@ -100,10 +133,50 @@ class ChronoDay:
                     todel.append(e)
             for e in todel:
                 self.events.remove(e)
+            self.touch()
         else:
             logging.warning(f"Failed to add {event} on {self.date}") 
             raise Exception("Overlap")
 
+    def add_events(self, events:List[ChronoEvent])->List[ChronoEvent]:
+        """Adds multiple events at once. Events overlapping an existing event or a previously added one are skipped
+        (with a warning) and returned. Sorts instead of comparing every pair of events."""
+        slots=self.get_slots()
+        starts=[e.start for e in slots]
+        skipped=[]
+        for event in sorted(events, key=lambda x:x.start):
+            i=bisect_left(starts, event.start)
+            if (i>0 and self.check_overlap(slots[i-1], event)) or (i<len(slots) and self.check_overlap(slots[i], event)):
+                logging.warning(f"Skipped {event} on {self.date}: Overlap")
+                skipped.append(event)
+            else:
+                slots.insert(i, event)
+                starts.insert(i, event.start)
+        self.events=slots
+        self.touch()
+        return skipped
+
+    def remove_event(self, event:ChronoEvent)->None:
+        """Removes var:event from the events list."""
+        self.events.remove(event)
+        self.touch()
+
+    def set_events(self, events:List[ChronoEvent])->None:
+        """Replaces the events list."""
+        self.events=events
+        self.touch()
+
+    def set_sleep(self, sleep:str, sleep_start:str="")->None:
+        """Sets the oura sleep phases of the night ending on this day and its (isoformatted) start."""
+        self.sleep=sleep
+        self.sleep_start=sleep_start
+        self.touch()
+
+    def touch(self)->None:
+        """Has to be called after the events of this day changed, so that the indexes of the project stay in sync."""
+        if not self.project==None:
+            self.project.day_changed(self)
+
     def get_slots(self)->List[ChronoEvent]:
         """Returns the events sorted by starting time."""
         return sorted(self.events, key=lambda x:x.start)
@@ -136,6 +209,7 @@ class ChronoDay:
         d["sport"]={key:[entry.to_dict() for entry in self.sport[key]] for key in self.sport.keys()}
         d["functions"]=self.functions
         d["sleep"]=self.sleep
+        d["sleep_start"]=self.sleep_start
         return d
 
     def add_run(self, run:ChronoRunningEvent)->None:
@@ -156,10 +230,24 @@ class ChronoDay:
         self.sport["planks"].append(plank)
 
     def get_tags(self)->List[str]:
-        return list(set(reduce(lambda a,b:a+b,[event.tags for event in self.events])))
+        return list(set(reduce(lambda a,b:a+b,[event.tags for event in self.events],[])))
+
+    def snapshot(self)->"ChronoDay":
+        """A copy of this day which is not linked to a project, so it can be read after the project lock is released."""
+        day=ChronoDay([copy.copy(event) for event in self.events], self.date.isoformat())
+        for event in day.events:
+            event.tags=list(event.tags)
+        day.silent_events=list(self.silent_events)
+        day.sport={key:list(value) for key, value in self.sport.items()}
+        day.sleep, day.sleep_start=self.sleep, self.sleep_start
+        day.functions=dict(self.functions)
+        return day
 
     def add_function(self, function_name:str, function_value:float):
         self.functions[function_name]=function_value
+        if not self.project==None:
+            self.project.functions.set(self.date, function_name, function_value)
+        self.touch()
         return
 
     def get_function(self, function_name:str)->float:
@@ -206,12 +294,23 @@ class ChronoProject:
         self.name=name
         self.path=path
         self.days=dict()
+        self.functions=FunctionStore()
+        self.tag_graph=TagGraphIndex()
+        self.rollups=RollupIndex()
+        self.sleep_store=SleepStore()
+        self.sleep_sync:Optional[SleepSyncState]=None
+        self.dirty=set()
+        self.defer_save=False
+        self.lock=RWLock()
+        self.index_lock=threading.RLock()
         self.sevents=[]
         self.schedule=None
         self.todo=[]
         self.header=["\\documentclass{article}"]
         self.scheme=MSSH_color_scheme
         self.load_settings()
+        self.latex=LatexRunner(self.settings.get("latex_workers", 2), self.settings.get("pdflatex", "pdflatex"))
+        self.jobs=JobManager(self.settings.get("analysis_workers", 2))
         self.forbidden=["sleep_phase_deep","sleep_phase_light","sleep_phase_rem","sleep_phase_awake","all_sleep","run_distance","run_time"]
 
     def set_schedule(self,schedule:ChronoSchedule)->None:
@@ -229,7 +328,7 @@ class ChronoProject:
 
     def set_alias(self, cmds:Dict[str,Callable])->None:
         """Creates the alias Dict. Needs load_settings to be called first"""
-        self.alias={key.lower():cursed_get_lambda(self.settings["alias"][key], cmds) for key in self.settings["alias"].keys()}
+        self.alias=compile_aliases(self.settings["alias"], cmds)
 
     def add_note(self, note:ChronoNote)->None:
         """ Adds a note to the todo list."""
@@ -238,16 +337,17 @@ class ChronoProject:
         else:
             print("duplicate ChronoNote")
 
-    def add_day(self,day:ChronoDay)->None:
-        """Adds a day to the days dict."""
+    def add_day(self,day:ChronoDay, use_schedule:bool=True)->None:
+        """Adds a day to the days dict. If var:use_schedule is False the day is not populated based on the schedule."""
         if not day.date.isoformat() in self.days.keys():
-            if self.settings["schedule"] and day.events==[]:
+            if use_schedule and self.settings["schedule"] and day.events==[]:
                 #day.events += self.schedule.days[int(day.date.isocalendar()[1])%self.schedulemod][day.date.weekday()]
                 for event in self.schedule.days[int(day.date.isocalendar()[1])%self.schedulemod][day.date.weekday()]:
                     day.add_event(event)
                 day.merge()
             self.days[day.date.isoformat()]=day
-            if self.settings["schedule"]:
+            self.attach_day(day)
+            if use_schedule and self.settings["schedule"]:
                 sevents = []
                 td=timedelta(days=1)
                 cd:date=day.date
@@ -261,10 +361,140 @@ class ChronoProject:
             print(f"Adding {day.date} failed ...")
             logging.warning(f"can`t add day {day.date.isoformat()}")
 
+    def attach_day(self, day:ChronoDay)->None:
+        """Links var:day to this project and copies its functions to the FunctionStore."""
+        day.project=self
+        self.functions.clear_day(day.date)
+        for function_name, function_value in day.functions.items():
+            self.functions.set(day.date, function_name, function_value)
+        self.day_changed(day)
+
+    def remove_day(self, key:str)->ChronoDay:
+        """Removes the day var:key from the days dict."""
+        day=self.days.pop(key)
+        self.functions.clear_day(day.date)
+        self.dirty.add(key)
+        self.rollups.dirty.add(key)
+        self.sleep_store.dirty.add(key)
+        day.project=None
+        return day
+
+    def set_days(self, days:Dict[str, ChronoDay])->None:
+        """Replaces the days dict and rebuilds the FunctionStore and the indexes."""
+        self.days=days
+        self.functions=FunctionStore()
+        self.tag_graph=TagGraphIndex()
+        self.rollups=RollupIndex()
+        self.sleep_store=SleepStore()
+        self.dirty=set()
+        for day in days.values():
+            self.attach_day(day)
+
+    def day_changed(self, day:ChronoDay)->None:
+        """Marks var:day as changed. The indexes are updated lazily by sync."""
+        self.dirty.add(day.date.isoformat())
+        self.rollups.dirty.add(day.date.isoformat())
+        self.sleep_store.dirty.add(day.date.isoformat())
+
+    def sync(self)->None:
+        """Updates the indexes for all days changed since the last call. Readers holding the project lock shared may call
+        this concurrently, hence var:index_lock."""
+        with self.index_lock:
+            for key in self.dirty:
+                if key in self.days.keys():
+                    self.tag_graph.update_day(self.days[key].date, self.days[key].events)
+                else:
+                    self.tag_graph.remove_day(date.fromisoformat(key))
+            self.dirty=set()
+
+    def sync_rollups(self)->RollupIndex:
+        """Updates the rollups for all days changed since they were last updated and returns them."""
+        with self.index_lock:
+            for key in self.rollups.dirty:
+                if key in self.days.keys():
+                    self.rollups.update_day(self.days[key].date, self.days[key].events, self.days[key].functions)
+                else:
+                    self.rollups.remove_day(date.fromisoformat(key))
+            self.rollups.dirty=set()
+            return self.rollups
+
+    def sync_sleep(self)->SleepStore:
+        """Updates (and packs) the sleep store for all days changed since it was last updated and returns it."""
+        with self.index_lock:
+            for key in self.sleep_store.dirty:
+                if key in self.days.keys() and self.days[key].sleep!="" and (bedtime:=self.get_sleep_start(self.days[key]))!=None:
+                    self.sleep_store.set_night(self.days[key].date, bedtime, phases_from_str(self.days[key].sleep))
+                else:
+                    self.sleep_store.remove_night(date.fromisoformat(key))
+            self.sleep_store.dirty=set()
+            self.sleep_store.pack()
+            return self.sleep_store
+
+    def get_sleep_start(self, day:ChronoDay)->Optional[int]:
+        """Minutes between midnight of var:day and the start of the night ending on var:day. Projects saved before
+        sleep_start was stored fall back to the "ouras" events: the night starts on the day before iff it has an
+        "ouras" event ending at 23:59."""
+        if day.sleep_start!="":
+            return bedtime_offset(datetime.fromisoformat(day.sleep_start), day.date)
+        yesterday=(day.date-timedelta(days=1)).isoformat()
+        if yesterday in self.days.keys() and any(e.end==time(23,59) and "ouras" in e.tags for e in self.days[yesterday].events):
+            events=self.days[yesterday].get_slots()
+            chain=[e for e in events if "ouras" in e.tags]
+            start=chain[-1]
+            for e in reversed(chain[:-1]):
+                if e.end!=start.start: break
+                start=e
+            return time_to_int(start.start)//60-24*60
+        starts=[time_to_int(e.start)//60 for e in day.events if "ouras" in e.tags]
+        return min(starts) if starts!=[] else None
+
+    def sync_state(self)->SleepSyncState:
+        """The state of syncsleep, loaded on first use. It is saved with the project, so it never gets ahead of the imported nights."""
+        if self.sleep_sync==None:
+            self.sleep_sync=SleepSyncState.load("data/"+self.path+"_oura.json")
+        return self.sleep_sync
+
+    def rollups_stamp(self, path:Optional[str]=None)->List[int]:
+        """Identifies the current version of the project json file."""
+        if path == None: path=self.path
+        stat=os.stat("data/"+path+".json")
+        return [stat.st_mtime_ns, stat.st_size]
+
+    def load_rollups(self, changed:Iterable[str]=())->None:
+        """Replaces the rollups by the ones saved next to the project json file, if they belong to its current version. The days
+        var:changed differ from the saved file (e.g. filled from the schedule while loading), so they stay marked as changed."""
+        if path.exists("data/"+self.path+".json") and (rollups:=RollupIndex.load("data/"+self.path+"_rollups.json", self.rollups_stamp()))!=None:
+            self.rollups=rollups
+            self.rollups.dirty.update(changed)
+        if path.exists("data/"+self.path+".json") and (sleep_store:=SleepStore.load("data/"+self.path+"_sleep", self.rollups_stamp()))!=None:
+            self.sleep_store=sleep_store
+            self.sleep_store.dirty.update(changed)
+
     def add_event(self, event:ChronoEvent, date:str, force:bool=False)->None:
         """ Adds a ChronoEvent to a given day."""
         self.days[date].add_event(event, force)
 
+    def snapshot(self, keys:Optional[Iterable[str]]=None)->Dict[str, ChronoDay]:
+        """Copies of the days var:keys (default: all days, see ChronoDay.snapshot). Long running readers can work on them
+        without blocking commands which change the project."""
+        with self.lock.read():
+            if keys==None: keys=list(self.days.keys())
+            return {key:self.days[key].snapshot() for key in keys if key in self.days.keys()}
+
+    def detached(self)->"ChronoProject":
+        """A copy of this project holding copies of its days (see snapshot) with its own locks and indexes. Analyses can read it
+        without holding the project lock (see JobManager)."""
+        with self.lock.read():
+            view=copy.copy(self)
+            view.settings=copy.deepcopy(self.settings)
+            view.sevents=list(self.sevents)
+            view.todo=list(self.todo)
+            days=self.snapshot()
+        view.lock=RWLock()
+        view.index_lock=threading.RLock()
+        view.set_days(days)
+        return view
+
     def __repr__(self)->str:
         """Represents this object as a string."""
         return reduce(lambda a,b: a+"\n"+b, [day.__repr__() for day in self.days.values()])
@@ -273,52 +503,51 @@ class ChronoProject:
         """Generates metadata for the LaTeX file."""
         return ["\\title{" + f"{self.name}"+"}"]
 
-    def export_pdf(self, days:List[str]=[""])->None:
-        """ Exports the object to a LaTeX -> PDF file."""
+    def export_pdf(self, days:List[str]=[""], on_done:Optional[Callable[[str], None]]=None)->Optional[LatexJob]:
+        """ Exports the object to a LaTeX -> PDF file in the background (see LatexRunner). The sections of the days are cached in
+        ./latex_cache/ (see FragmentCache), pdflatex is not run if the document did not change since the last build (None is returned
+        and var:on_done is called right away)."""
         if not path.exists("./pdfs/"):
                 mkdir("./pdfs/")
         if days==[""]:
             days=[day for day in self.days.keys()]
         days=[self.days[key] for key in filter(lambda x: x in self.days.keys(), days)]
+        cache=FragmentCache("./latex_cache/"+self.name)
         header=["\\documentclass{article}", "\\usepackage{xcolor}","\\usepackage{hyperref}"]
-        with open(self.name+".tex", "w+", encoding="utf-8") as f:
-            f.write(list_to_string(header)+"\n"+list_to_string(self.get_meta())+"\n")
-            f.write("\\begin{document}\n")
-            f.write("\\maketitle\n")
-            for day in sorted(days, key=lambda x: x.date):
-                if day.events == []:
-                    pass
-                else:
-                    day.merge()
-                    f.write("\\section*{"+f"{day.date}"+ "}\n")
-                    f.write("\\hypertarget{"+f"{day.date}"+"}{}\n")
-                    slots=day.get_slots()
-                    data=[[f"{slot.start.isoformat()}-{slot.end.isoformat()}", "\\textcolor{"+get_color(self.scheme, slot.tags)+"}{"+f"{slot.what}"+"}"]for slot in slots]
-                    write_table(f, [2, len(slots)], data=data)
-                    write_table(f, [2, len(day.silent_events)], data=[[time.start.isoformat(), time.what] for time in day.silent_events])
-                    f.write("\\clearpage")
-            f.write("\\end{document}\n")
-        subprocess.run(["pdflatex", self.name+".tex"], stdout=subprocess.DEVNULL)
-        subprocess.run(["pdflatex", self.name+".tex"], stdout=subprocess.DEVNULL)
-        if os.path.isfile(f"{self.name}.log"):os.remove(f"{self.name}.log")
-        if os.path.isfile(f"{self.name}.aux"):os.remove(f"{self.name}.aux")
-        if os.path.isfile(f"{self.name}.nav"):os.remove(f"{self.name}.nav")
-        if os.path.isfile(f"{self.name}.out"):os.remove(f"{self.name}.out")
-        if os.path.isfile(f"{self.name}.toc"):os.remove(f"{self.name}.toc")
-        if os.path.isfile(f"{self.name}.tex"):os.remove(f"{self.name}.tex")
-        os.replace(self.name+".pdf","./pdfs/"+self.name+".pdf")
+        document=list_to_string(header)+"\n"+list_to_string(self.get_meta())+"\n"+"\\begin{document}\n"+"\\maketitle\n"
+        document+="".join(cache.fragment(day, self.scheme) for day in sorted(days, key=lambda x: x.date))
+        document+="\\end{document}\n"
+        cache.prune(list(self.days.keys()))
+        output="./pdfs/"+self.name+".pdf"
+        doc_hash=document_hash(document)
+        if path.isfile(output) and cache.last_build(output)==doc_hash:
+            print("Nothing changed since the last build")
+            if on_done!=None: on_done(output)
+            return None
+
+        def built(file:str)->None:
+            cache.set_build(output, doc_hash)
+            if on_done!=None: on_done(file)
+        return submit_latex(self, self.name, document, output, on_done=built)
         
     def save(self, path:Optional[str]=None)->None:
-        """Saves the current state of the project to a json file. """
+        """Saves the current state of the project to a json file. Does nothing while var:defer_save is set (see ChronoClient.run_script),
+        unless var:path is another file. Only needs the project lock shared, concurrent saves are serialized by var:index_lock."""
         if path == None: path=self.path
-        export=dict()
-        export["todo"]=[note.to_dict() for note in self.todo]
-        export["name"]=self.name
-        export["path"]=path
-        export["days"]={key:self.days[key].to_dict() for key in self.days.keys()}
-        export["sevents"]=[sev.to_dict() for sev in self.sevents]
-        with open("data/"+path+".json", "w+", encoding="utf-8") as f:
-            json.dump(export, f, indent=4)
+        if self.defer_save and path==self.path: return
+        with self.lock.read(), self.index_lock:
+            export=dict()
+            export["todo"]=[note.to_dict() for note in self.todo]
+            export["name"]=self.name
+            export["path"]=path
+            export["days"]={key:self.days[key].to_dict() for key in self.days.keys()}
+            export["sevents"]=[sev.to_dict() for sev in self.sevents]
+            with open("data/"+path+".json", "w+", encoding="utf-8") as f:
+                json.dump(export, f, indent=4)
+            self.sync_rollups().save("data/"+path+"_rollups.json", self.rollups_stamp(path))
+            self.sync_sleep().save("data/"+path+"_sleep", self.rollups_stamp(path))
+            if self.sleep_sync!=None:
+                self.sleep_sync.save("data/"+path+"_oura.json")
 
     def get_poi(self)->Set[time]:
         """ Collects all points of interest (starts / ends of all events)."""
@@ -354,79 +583,62 @@ class ChronoProject:
         else:
             return date(int(str_date[0:4]),int(str_date[5:7]),int(str_date[8:10])) 
 
+    def iter_between(self, start_date:str, end_date:str, reference:str)->Generator[ChronoDay, None, None]:
+        """Yields the days of analysis_get_between one by one."""
+        start=self.date_from_str(start_date, reference).isoformat()
+        end=self.date_from_str(end_date, reference).isoformat()
+        for key in sorted(self.days.keys()):
+            if start<=key<=end:
+                yield self.days[key]
+
     def analysis_get_between(self, start_date:str, end_date:str, reference:str)->List[ChronoDay]:
         """Returns a sorted sublist of self.days."""
         start_date_date=self.date_from_str(start_date, reference)
         end_date_date=self.date_from_str(end_date, reference)
         return list(sorted(self.analysis_get(lambda x: start_date_date<=x.date<=end_date_date), key=lambda x: x.date))
 
-    def get_tag_graph(self, start_date:str, end_date:str, reference:str, ignored_tags:List[str]=[])->nx.Graph:
-        days=sorted(self.analysis_get_between(start_date,end_date,reference), key=lambda x: x.date)
-        g=nx.Graph()
-        for day in days:
-            for event in day.events:
-                if len(event.tags)==1:
-                    g.add_node(event.tags[0])
-                else:
-                    for tag1 in event.tags:
-                        for tag2 in event.tags:
-                            if tag1 != tag2 and tag1 not in ignored_tags and tag2 not in ignored_tags:                          
-                                g.add_edge(tag1, tag2)
-        return g
-
-    def get_f_ug(self, g:nx.Graph, start_date:str, end_date:str, reference:str,)->Tuple[Dict[str, float], nx.Graph]:
-        rtn:Dict[str, float]={node:0 for node in g.nodes}
-        days=self.analysis_get_between(start_date, end_date, reference)
-        for day in days:
-            for event in day.events:
-                tf_length=get_tf_length((event.start, event.end))
-                for tag in event.tags:
-                    rtn[tag] += tf_length
-                    for tag2 in event.tags:
-                        if (tag,tag2) in g.edges:
-                            g.add_edge(tag,tag2, weight=tf_length) #Ich bin extrem dumm
+    def get_tag_graph(self, start_date:str, end_date:str, reference:str, ignored_tags:List[str]=[])->"nx.Graph":
+        """Co-occurrence graph of the tags in [start_date,end_date]. Edges between ignored tags are left out."""
+        self.sync()
+        return self.tag_graph.graph(self.date_from_str(start_date, reference), self.date_from_str(end_date, reference), ignored_tags)
+
+    def get_f_ug(self, g:"nx.Graph", start_date:str, end_date:str, reference:str,)->Tuple[Dict[str, float], "nx.Graph"]:
+        """Seconds spent on each node of var:g. The edge weights of var:g are the accumulated seconds of the co-occurrences."""
+        self.sync()
+        tag_seconds=self.tag_graph.tag_seconds(self.date_from_str(start_date, reference), self.date_from_str(end_date, reference))
+        rtn:Dict[str, float]={node:tag_seconds.get(node, 0) for node in g.nodes}
         return rtn, g
 
-    def get_ccs(self, g:nx.Graph)->List[List[str]]:
+    def get_ccs(self, g:"nx.Graph")->List[List[str]]:
         ccs=nx.connected_components(g)
         return [list(cc) for cc in ccs]
 
-    def get_gbl_data(self, start_date:str, end_date:str, reference:str, ignored_tags:List[str]=[])->Tuple[nx.Graph,Dict[str,float]]:
-        days=sorted(self.analysis_get_between(start_date,end_date,reference), key=lambda x: x.date)
-        g=nx.Graph()
-        tags:List[str]=[tag for tag in reduce(lambda a,b:a+b,[day.get_tags() for day in days]) if not tag in ignored_tags]
-        f:Dict[str,float]={tag:0 for tag in tags}
-        for day in days:
-            for event in day.events:
-                for tag in event.tags:
-                    if not tag in ignored_tags:
-                        f[tag]+=get_tf_length((event.start,event.end))/3600
-                if len(event.tags)==1 and not event.tags[0]:
-                    g.add_node(event.tags[0])
-                else:
-                    for tag1 in event.tags:
-                        for tag2 in event.tags:
-                            if tag1 != tag2 and tag1 not in ignored_tags and tag2 not in ignored_tags:                          
-                                g.add_edge(tag1, tag2)
+    def get_gbl_data(self, start_date:str, end_date:str, reference:str, ignored_tags:List[str]=[])->Tuple["nx.Graph",Dict[str,float]]:
+        """Co-occurrence graph (without tags which only occur alone) and hours per tag in [start_date,end_date]."""
+        self.sync()
+        start, stop=self.date_from_str(start_date, reference), self.date_from_str(end_date, reference)
+        g=self.tag_graph.graph(start, stop, ignored_tags, solo_nodes=False)
+        f:Dict[str,float]={tag:seconds/3600 for tag, seconds in self.tag_graph.tag_seconds(start, stop).items() if not tag in ignored_tags}
         return g,f
     
     def get_tags(self)->List[str]:
-        tags=set()
-        for day in self.days.values():
-            for tag in day.get_tags():
-                tags.add(tag)
-        return tags
+        self.sync()
+        return set(self.tag_graph.tags())
 
     def get_function(self, date:datetime.date, function_name:str, interpolate:int=0)->float:
+        """Returns function_name(date). Missing values are interpolated (see FunctionStore.get_range), days that do not exist are 0."""
         if not date.isoformat() in self.days.keys():
             return 0
-        elif function_name in self.days[date.isoformat()].functions.keys():
-            return self.days[date.isoformat()].functions[function_name]
+        elif (value:=self.functions.get(date, function_name))!=None:
+            return value
         elif interpolate==0:
             return 0
         else:
-            days=[date.isoformat() for date in [date-timedelta(days=i) for i in range(1,interpolate)]+[date+timedelta(days=i) for i in range(1,interpolate)]]
-            return sum([self.days[date].get_function(function_name) for date in days if date in self.days.keys()])/max(1,len([self.days[date].get_function(function_name) for date in days if date in self.days.keys() and function_name in self.days[date].functions.keys()]))
+            return float(self.functions.get_range(function_name, date, date, interpolate)[0])
+
+    def get_function_range(self, function_name:str, start:date, stop:date, interpolate:int=0)->np.ndarray:
+        """Returns function_name on every day of [start,stop] as if every day existed."""
+        return self.functions.get_range(function_name, start, stop, interpolate)
 
     def get_functions(self, days:List[ChronoDay])->List[str]:
         fs=set()
@@ -510,11 +722,43 @@ class MSSH:
         project.export_pdf([date.today().isoformat() if day=="today" else day for day in days.split(",")])
         return reference
 
+    @staticmethod
+    def c_mk_range(project:ChronoProject, reference:str, start:str="start", stop:str="stop")->str:
+        """Exports the days in [var:start,var:stop] to pdf. Both var:start and var:stop support IntelliRef."""
+        start_date, stop_date=project.date_from_str(start, reference), project.date_from_str(stop, reference)
+        project.export_pdf([key for key in sorted(project.days.keys()) if start_date<=project.days[key].date<=stop_date])
+        return reference
+
+    @staticmethod
+    def c_latex_jobs(project:ChronoProject, reference:str, wait:str="0")->str:
+        """Prints the LaTeX jobs (pdf exports) of this session. If var:wait is 1 waits until all of them are done."""
+        if wait=="1":
+            project.latex.wait()
+        with project.latex.lock:
+            jobs=list(project.latex.jobs.values())
+        for job in jobs:
+            print(f"{job.id}\t{job.status()}\t{job.output}")
+        return reference
+
+    @staticmethod
+    def c_jobs(project:ChronoProject, reference:str, action:str="list", id:str="all")->str:
+        """Lists the analyses started with bg. "jobs collect var:id" shows the plot of the finished job var:id, "jobs collect" the plots
+        of all finished jobs."""
+        if action=="collect":
+            ids=[job.id for job in project.jobs.list() if job.status()=="done"] if id=="all" else [int(id)]
+            for i in ids:
+                project.jobs.collect(i)
+        elif action=="list":
+            for job in project.jobs.list():
+                print(f"{job.id}\t{job.status()}\t{job.command}")
+        else:
+            raise Exception(f"unknown action: {action}")
+        return reference
+
     @staticmethod
     def c_show(project:ChronoProject, reference:str)->str:
         """Exports the ChronoProject to pdf and opens the file."""
-        project.export_pdf()
-        subprocess.Popen([project.settings["pdfpath"], "/A" ,f"nameddest={date.today().isoformat()}", "./pdfs/"+project.name+".pdf"], shell=True)
+        project.export_pdf(on_done=lambda file: subprocess.Popen([project.settings["pdfpath"], "/A" ,f"nameddest={date.today().isoformat()}", file], shell=True))
         return reference
 
     @staticmethod
@@ -531,7 +775,7 @@ class MSSH:
         """Saves the project to a backup and deletes all days if the var:code is correct."""
         if code == project.settings["code"]:
             project.save(path=project.path+"_backup") 
-            project.days={}
+            project.set_days({})
         else:
             logging.warning(f"wrong code: {code}")
         return reference
@@ -546,7 +790,7 @@ class MSSH:
                 if project.days[key].date > date.today():
                     keys.append(key)
             for key in keys:
-                project.days.pop(key)
+                project.remove_day(key)
         else:
             logging.warning(f"wrong code: {code}")
         return reference
@@ -590,7 +834,7 @@ class MSSH:
     def c_delete_day(project:ChronoProject, reference:str)->str:
         """Deletes the reference day and sets reference to base"""
         if reference in project.days.keys():
-            project.days.pop(reference)
+            project.remove_day(reference)
             print("Deleted "+ reference)
             logging.info("Deleted "+ reference)
         return "base"
@@ -602,7 +846,7 @@ class MSSH:
             for event in project.days[reference].events:
                 if event.start.isoformat()[:5]==start and event.end.isoformat()[:5]==stop:
                     print("removed")
-                    project.days[reference].events.remove(event)
+                    project.days[reference].remove_event(event)
                     return reference
         return reference
 
@@ -612,6 +856,7 @@ class MSSH:
         for event in project.days[date.today().isoformat()].events:
             if event.start <= datetime.now().time()<=event.end:
                 event.end=datetime.now().time()
+                project.days[date.today().isoformat()].touch()
                 return reference
         logging.warning("couldn`t end event: no current event")
         return reference
@@ -635,6 +880,7 @@ class MSSH:
                     if e.start.isoformat()[:-3]==start and e.end.isoformat()[:-3]==stop:
                         e.start=time_from_str(nstart)
                         e.end=time_from_str(nend)
+                        project.days[reference].touch()
                         return reference
         return reference
 
@@ -645,6 +891,7 @@ class MSSH:
             for e in project.days[reference].events:
                 if e.start.isoformat()[:-3]==start and e.end.isoformat()[:-3]==stop:
                     e.what=what
+            project.days[reference].touch()
         return reference
 
     @staticmethod        
@@ -654,6 +901,7 @@ class MSSH:
             for e in project.days[reference].events:
                 if e.start.isoformat()[:-3]==start and e.end.isoformat()[:-3]==stop:
                     e.tags=tags.split(",")
+            project.days[reference].touch()
         return reference
 
     @staticmethod
@@ -670,93 +918,8 @@ class MSSH:
     
     @staticmethod
     def c_plot_stats(project:ChronoProject, reference:str, tags:str="mathe", r_str:str="7",interpolate:str="0", start_date:str="start", end_date:str="stop", )->str:
-        """Plots the hours of var:tags and their sum. Calls fillemptydays. Both var:start_date and var:end_date support IntelliRef."""
-        assert not "sum" in tags
-        plt.clf()
-        #preperation
-        MSSH.c_fill_empty_days(project,reference,start_date,end_date)
-        tags=tags.split(",")
-        ticksi=5
-        r=int(r_str)
-        days = project.analysis_get_between(start_date, end_date, reference)
-        n=len(days)
-        xs=[i for i in range(n)]
-        ys={tag:[] for tag in tags}
-        fs=project.get_functions(days)
-        #populate ys
-        for day in days:
-            for tag in tags:
-                if tag in fs:
-                    ys[tag].append(project.get_function(day.date,tag,interpolate=int(interpolate)))
-                else:
-                    ys[tag].append(get_time(day, tag))
-
-        for tag in tags:
-            N=len(ys[tag])
-            for i in range(len(ys[tag])):
-                if ys[tag][i]=="i": 
-                    ys[tag][i]=sum([ys[tag][i+j] for j in range(int(interpolate)) if ys[tag][i+j] != "i" and i+j<N])+sum([ys[tag][i-j] for j in range(int(interpolate)) if ys[tag][i-j] != "i"])
-                    normalizier=max(1,len([j for j in range(int(interpolate))  if ys[tag][i+j] != "i"and i+j<N])+len([j for j in range(int(interpolate))  if ys[tag][i-j] != "i"]))
-                    ys[tag][i]=ys[tag][i]/normalizier
-
-        #Calculate overhead (sum)
-        corr=[0.0 for _ in days]
-        for i in range(n):
-            for event in days[i].events:
-                if not (I:=get_intersect(tags, event.tags))==[]:
-                    corr[i] += ((datetime.combine(date.today(), event.end)\
-                     - datetime.combine(date.today(), event.start))\
-                .seconds/3600)*(len(I)-1) 
-
-        if len(tags)>1: 
-            ys["sum"]=[sum([ys[tag][i] for tag in tags])-corr[i] for i in range(n)]
-
-
-        #plot tags+sum
-        ax=plt.subplot(111)
-        box = ax.get_position()
-        ax.set_position([box.x0, box.y0, box.width * 0.8, box.height])
-        for tag in ys.keys():
-             plt.plot([x for x in xs[r-1:]], [sum(ys[tag][i-j] for j in range(r))/r for i in range(r-1,len(ys[tag]))], label=tag)
-
-        #Calculate and plot weekday average
-        if not days == []: 
-            zeroday=days[0].date.weekday()
-            if len(tags)>1: WDA=[sum(wds:=[ys["sum"][i] for i in range(n) if (i+zeroday)%7==wd])/max(len(wds),1) for wd in range(7)] 
-            else: WDA=[sum(wds:=[ys[tags[0]][i] for i in range(n) if (i+zeroday)%7==wd])/max(len(wds),1) for wd in range(7)] 
-            plt.plot(xs,[WDA[day.date.weekday()] for day in days],"--",label="wda")
-        
-        #Mark "reference" with a *
-
-        try:
-            tmp=project.date_from_str(reference)
-        except:
-            tmp=date.fromisocalendar(1900,1,1)
-        if tmp in [day.date for day in days]:
-            d=-1
-            for i in range(len(days)):
-                if days[i].date==tmp:
-                    d=i
-            try: 
-                if len(tags)>1:
-                    plt.scatter([d], ys["sum"][d], label="Reference", marker="*", color="red", s=[70])
-                else:
-                    plt.scatter([d], sum(ys[tags[0]][d-j] for j in range(r))/r, label="Reference", marker="*", color="red", s=[70])
-            except:
-                logging.warn("Some days are missing.")
-                print("Some days are missing.")
-        
-        #visuals
-        plt.legend(loc='center left', bbox_to_anchor=(1, 0.5))
-        if n<ticksi:
-            plt.xticks([i for i in range(n)], [days[i].date.isoformat() for i in range(n)])
-        else:
-            plt.xticks([round((n-1)*i/(ticksi-1)) for i in range(ticksi)], [days[round((n-1)*i/(ticksi-1))].date.isoformat() for i in range(ticksi)])
-        plt.xlabel("Days")
-        plt.ylabel("Quantity")
-        logging.info("Displaying plot ...")
-        plt.show()
-        logging.info("Plot closed")
+        """Plots the hours of var:tags and their sum. Missing days count as empty days. Both var:start_date and var:end_date support IntelliRef."""
+        PLOT_STATS.run(project, reference, tags, r_str, interpolate, start_date, end_date)
         return reference
 
     @staticmethod
@@ -776,7 +939,7 @@ class MSSH:
         else:
             end=date(int(end_date[:4]), int(end_date[5:7]), int(end_date[8:]))
         start_date=(end-timedelta(days=int(k))).isoformat()
-        MSSH.c_plot_stats(project,reference,tags,start_date,end_date)
+        MSSH.c_plot_stats(project,reference,tags,"1","0",start_date,end_date)
         return reference
 
     @staticmethod
@@ -816,14 +979,13 @@ class MSSH:
     def c_stats(project:ChronoProject, reference:str, tags:str, start_date:str="start", end_date:str="stop")->str:
         """Displays stats for given tags."""
         tags=tags.split(",")
-        hours=[]
-        days=project.analysis_get_between(start_date, end_date, reference)
+        rollups=project.sync_rollups()
+        start, stop=project.date_from_str(start_date, reference), project.date_from_str(end_date, reference)
+        week=max(start, date.today()-timedelta(days=7))
         for tag in tags:
-            hours=[]
-            for day in days:
-                hours.append(get_time(day, tag))
-            rest=restrict(days,hours, 7)
-            print(f"{tag}: Daily Avg (hours): {sum(hours)/len(hours)}\n"+f"this week: {sum(rest)/len(rest)} hours")
+            hours=rollups.tag_total(tag, start, stop)[0]/3600
+            rest=rollups.tag_total(tag, week, stop)[0]/3600 if week<=stop else 0
+            print(f"{tag}: Daily Avg (hours): {hours/max(rollups.count_days(start, stop), 1)}\n"+f"this week: {rest/max(rollups.count_days(week, stop), 1)} hours")
         return reference
 
     @staticmethod
@@ -870,10 +1032,7 @@ class MSSH:
     def c_heatmap(project:ChronoProject, reference:str, tag:str, start_date:str="start", end_date:str="stop")->str:
         """Draws a heat map for a specific var:tag with at most 15 vertical labels with data from 
         [var:start_date,var:end_date]."""
-        heatmap(project,tag,reference,start_date,end_date)
-        logging.info("Displaying heatmap ...")
-        plt.show()
-        logging.info("Heatmap closed")
+        HEATMAP.run(project, reference, tag, start_date, end_date)
         return reference
 
     @staticmethod
@@ -882,48 +1041,66 @@ class MSSH:
          to project.json."""
         tmp=project.days.copy()
         splitdate=project.date_from_str(split,reference)
-        project.days = {key:tmp[key] for key in tmp.keys() if tmp[key].date <=splitdate}
+        project.set_days({key:tmp[key] for key in tmp.keys() if tmp[key].date <=splitdate})
         project.save(path=old_name)
-        project.days = {key:tmp[key] for key in tmp.keys() if tmp[key].date >splitdate}
+        project.set_days({key:tmp[key] for key in tmp.keys() if tmp[key].date >splitdate})
         project.save()
         return reference
 
     @staticmethod
-    def c_oura_sleep(project:ChronoProject, reference:str, start:str, stop:str)->str:
-        """Gets your sleep data $\n$ [start-1,stop] from oura is such a connection exists."""
+    def c_oura_sleep(project:ChronoProject, reference:str, start:str, stop:str, refresh:str="0")->str:
+        """Gets your sleep data $\n$ [start-1,stop] from oura is such a connection exists. Nights in the oura cache are not fetched
+        again unless var:refresh is 1."""
         start=project.date_from_str(start, reference).isoformat()
         stop=project.date_from_str(stop, reference).isoformat()
-        delete_by_tag(project,reference,"ouras",project.analysis_get_between(start, stop, reference))
         if project.settings["oura"]:
-            sleepdata=get_sleep(start_date=start,stop_date=stop,code=project.settings["oura_key"])
-            if sleepdata[0]:
-                keys=project.days.keys()
-                for key in sleepdata[1].keys():
-                    css=datetime.fromisoformat(sleepdata[1][key][0]) # current sleep start
-                    cse=css+timedelta(minutes=5) # cse
-                    pattern_5_min=sleepdata[1][key][2]
-                    for i in range(len(pattern_5_min)):
-                        try: 
-                            if css.date()==cse.date():
-                                project.days[css.date().isoformat()].add_event(ChronoEvent(css.time().isoformat(),cse.time().isoformat(),"sleep", ["all_sleep",get_sleep_phase(pattern_5_min[i]),"ouras", "generated"]))
-                            elif cse.time().isoformat()!="00:00":
-                                project.days[css.date().isoformat()].add_event(ChronoEvent(css.time().isoformat(),"23:59","sleep", ["all_sleep",get_sleep_phase(pattern_5_min[i]),"ouras", "generated"]))
-                                project.days[cse.date().isoformat()].add_event(ChronoEvent("00:00",cse.time().isoformat(),"sleep", ["all_sleep",get_sleep_phase(pattern_5_min[i]),"ouras", "generated"]))
-                            else:
-                                project.days[css.date().isoformat()].add_event(ChronoEvent(css.time().isoformat(),"23:59","sleep", ["all_sleep",get_sleep_phase(pattern_5_min[i]),"ouras", "generated"]))
-                        except:
-                            if not css.date().isoformat() in keys: project.add_day(ChronoDay([],css.date().isoformat()))
-                            if not cse.date().isoformat() in keys: project.add_day(ChronoDay([],cse.date().isoformat()))
-                        project
-                        css=cse
-                        cse=css+timedelta(minutes=5)
-                    project.days[key].sleep=pattern_5_min
-                    project.days[key].merge()
+            print(f"Getting sleep data: [{start},{stop}]")
+            state=project.sync_state()
+            try:
+                for chunk_first, chunk_last, nights in fetch_sleep(project, start, stop, refresh=(refresh=="1")):
+                    for i in range((date.fromisoformat(chunk_last)-date.fromisoformat(chunk_first)).days+1):
+                        key=(date.fromisoformat(chunk_first)+timedelta(days=i)).isoformat()
+                        update_night(project, state, key, nights.get(key))
+            except Exception as e:
+                logging.warning(e)
+                print("Failed")
         else:           
             print("No oura is linked: Check your settings")
             logging.warning("No oura is linked: Check your settings")   
         return reference 
 
+    @staticmethod
+    def c_sync_sleep(project:ChronoProject, reference:str, start:str="start")->str:
+        """Imports the oura nights which are new or changed since the last sync. Only the days of those nights are modified.
+        var:start (IntelliRef) is only used for the first sync, later syncs continue after the last imported night. The sync state is
+        saved together with the project."""
+        if not project.settings["oura"]:
+            print("No oura is linked: Check your settings")
+            logging.warning("No oura is linked: Check your settings")
+            return reference
+        state=project.sync_state()
+        if state.last!=None:
+            first=min(date.fromisoformat(state.last)+timedelta(days=1), date.today()-timedelta(days=SYNC_PROVISIONAL_DAYS))
+        else:
+            first=project.date_from_str(start, reference)
+        changed=0
+        try:
+            for chunk_first, chunk_last, nights in fetch_sleep(project, first.isoformat(), date.today().isoformat()):
+                for i in range((date.fromisoformat(chunk_last)-date.fromisoformat(chunk_first)).days+1):
+                    key=(date.fromisoformat(chunk_first)+timedelta(days=i)).isoformat()
+                    if state.nights.get(key)==(night_hash(nights[key]) if key in nights.keys() else None):
+                        continue
+                    update_night(project, state, key, nights.get(key))
+                    changed+=1
+                if nights!={}:
+                    state.last=max([key for key in [state.last] if key!=None]+list(nights.keys()))
+        except Exception as e:
+            logging.warning(e)
+            print(f"Failed after {changed} changed night(s): {e}")
+            return reference
+        print(f"Synced sleep data: {changed} night(s) changed")
+        return reference
+
     @staticmethod
     def c_get_sleep(project:ChronoProject, reference:str, sdate:str)->str:
         """Prints the sleep data from a specific var:sdate (and the day before if the sleep event has the split_sleep)."""
@@ -942,6 +1119,8 @@ class MSSH:
                 print("No sleep data :(")
             for sleep_e in sleep_es:
                 print(sdate+":"+str(sleep_e))
+            if (night:=project.sync_sleep().night(project.days[sdate].date))!=None:
+                print(sdate+": "+", ".join(f"{phase}: {SLOT*int((night[1]==i+1).sum())} min" for i, phase in enumerate(PHASES)))
         else:
             print(sdate+" is not a valid key")
             logging.warning(sdate+" is not a valid key")
@@ -977,37 +1156,7 @@ class MSSH:
     @staticmethod
     def c_runplot(project:ChronoProject, reference:str,start_date:str="start",end_date:str="stop")->str:
         """Plots the distance run each day in [start_date, end_date]. Both var:start_date and var:end_date support IntelliRef."""
-        plt.clf()
-        days = project.analysis_get_between(start_date, end_date, reference)
-        xs=[]
-        ys=[]#distance  
-        ysp=[]#pace
-        plt.close() # "Fix": 2 plots open, but one is empty
-        fig, ax1 = plt.subplots()
-
-        ax2 = ax1.twinx()
-
-        ax1.set_xlabel("Days")
-        ax1.set_ylabel("Distance")
-        ax2.set_ylabel("Pace")
-
-        for i in range(len(days)):
-            lengths=sum([run.time for run in days[i].sport["runs"]])
-            distance=sum([run.distance for run in days[i].sport["runs"]])
-            pace=lengths/max(distance,1)
-            if distance > 0:
-                xs.append(i)
-                ys.append(distance)
-                ysp.append(pace)
-        ax1.scatter(xs,ys,label="Distance",color="b")
-        ax2.plot(xs,ysp,label="Pace",color="r")
-        ticks=get_pace_ticks(ysp)
-        ax2.set_yticks(ticks[0])
-        ax2.set_yticklabels(ticks[1])
-        fig.legend()
-        logging.info("Displaying plot ...")
-        plt.show() 
-        logging.info("Plot closed") 
+        RUNPLOT.run(project, reference, start_date, end_date)
         return reference
 
     @staticmethod
@@ -1048,7 +1197,7 @@ class MSSH:
         td=timedelta(days=1)
         while current_day < last_day.date:
             if not (c_date:=current_day.isoformat()) in project.days.keys():
-                project.days[c_date]=ChronoDay(events=[], input_date=c_date)
+                project.add_day(ChronoDay(events=[], input_date=c_date), use_schedule=False)
             current_day += td
         return reference
 
@@ -1067,46 +1216,41 @@ class MSSH:
         return reference
 
     @staticmethod
-    def c_exportweek(project:ChronoProject, reference:str,end_date:str="stop")->str:
-        """ Exports 7 days ending on var:end_date to a LaTeX -> PDF file and opens the file. var:end_date support IntelliRef."""
+    def c_exportweek(project:ChronoProject, reference:str,end_date:str="stop",resolution:str="0",output:str="pdf",compact:str="0")->str:
+        """ Exports 7 days ending on var:end_date to a LaTeX -> PDF file and opens the file. var:end_date support IntelliRef.
+        If var:resolution is >0 the timeslots are var:resolution minutes long, otherwise they lie between the starts / ends of the events.
+        If var:compact is 1 consecutive timeslots with the same events are merged. var:output can be pdf, csv or html (weekexport.csv / .html)."""
         days=project.analysis_get_between("start", end_date, reference)[-7:]
         header=["\\documentclass{article}", "\\usepackage{xcolor}","\\usepackage{hyperref}","\\usepackage{pdflscape}"]
-        poi=set()
-        for day in days:
-            for event in day.events:
-                poi.add(event.start)
-                poi.add(event.end)
-        pois=sorted(poi)
-        slots=[(pois[i],pois[i+1]) for i in range(len(pois)-1)]
-        with open("weekexport.tex", "w+", encoding="utf-8") as f:
-            f.write(list_to_string(header)+"\n"+list_to_string(project.get_meta())+"\n")
-            f.write("\\begin{document}\n")
-            f.write("\\begin{landscape}\n")
-            f.write("\\maketitle\n")
-            data=[["Timeslots"]+[WEEKDAYS[day.date.weekday()] for day in days]]+[[f"{slot[0].isoformat()[:-3]}-{slot[1].isoformat()[:-3]}"]+[what_or_none(list(filter(lambda x: check_in_timeframe(slot,x),days[i].events)), project.scheme) for i in range(7)] for slot in slots]
-            write_table(f, [8, len(slots)+1], data=data)
-            f.write("\\end{landscape}\n")
-            f.write("\\end{document}\n")
-        subprocess.run(["pdflatex", "weekexport.tex"], stdout=subprocess.DEVNULL)
-        subprocess.run(["pdflatex", "weekexport.tex"], stdout=subprocess.DEVNULL)
-        if os.path.isfile("weekexport.log"):os.remove("weekexport.log")
-        if os.path.isfile("weekexport.aux"):os.remove("weekexport.aux")
-        if os.path.isfile("weekexport.nav"):os.remove("weekexport.nav")
-        if os.path.isfile("weekexport.out"):os.remove("weekexport.out")
-        if os.path.isfile("weekexport.toc"):os.remove("weekexport.toc")
-        if os.path.isfile("weekexport.tex"):os.remove("weekexport.tex")
-        os.replace("weekexport.pdf","./pdfs/weekexport.pdf")
-        subprocess.Popen([project.settings["pdfpath"],"./pdfs/weekexport.pdf"], shell=True)
-        return reference
-
-    @staticmethod
-    def c_to_csv(project:ChronoProject, reference:str,name:str,start_date:str="start",end_date:str="stop")->str:
-        """Exports the events of this project to a csv file. Both var:start_date and var:end_date support IntelliRef."""
-        days=project.analysis_get_between(start_date, end_date, reference)
-        with open(f"{name}.csv","w+") as f:
-            for day in days:
-                for event in day.events:
-                    f.write(f"{day.date.isoformat()},{event.what},{str(reduce(concatsem, event.tags))},{event.start.isoformat()},{event.end.isoformat()}\n")
+        grid=SlotGrid.build("week", [WEEKDAYS[day.date.weekday()] for day in days], [day.events for day in days], int(resolution))
+        if compact=="1": grid=grid.compact()
+        if write_grids("weekexport", [grid], output, project.scheme):
+            return reference
+        f=io.StringIO()
+        f.write(list_to_string(header)+"\n"+list_to_string(project.get_meta())+"\n")
+        f.write("\\begin{document}\n")
+        f.write("\\begin{landscape}\n")
+        f.write("\\maketitle\n")
+        write_table(f, [len(grid.columns)+1, len(grid.slots)+1], data=grid.latex_data(project.scheme))
+        f.write("\\end{landscape}\n")
+        f.write("\\end{document}\n")
+        submit_latex(project, "weekexport", f.getvalue(), "./pdfs/weekexport.pdf", on_done=lambda file: open_pdf(project, file))
+        return reference
+
+    @staticmethod
+    def c_to_csv(project:ChronoProject, reference:str,name:str,start_date:str="start",end_date:str="stop",tables:str="events",compress:str="0")->str:
+        """Exports var:tables (events, times, sport, functions; seperated by commata) of this project to csv files. The events are written to var:name.csv,
+        other tables to var:name_table.csv. If var:compress is 1 the files are gzipped (.csv.gz). Both var:start_date and var:end_date support IntelliRef."""
+        times:Dict[str, List[ChronoTime]]={}
+        for sevent in project.sevents:
+            times.setdefault(sevent.tdate.isoformat(), []).append(sevent)
+        for table in tables.split(","):
+            if not table in TABLES.keys():
+                print(f"Unknown table: {table}")
+                continue
+            file=(name if table=="events" else f"{name}_{table}")+(".csv.gz" if compress=="1" else ".csv")
+            n=export_csv(project.iter_between(start_date, end_date, reference), file, table, times, compress=="1")
+            print(f"Exported {n} rows to {file}")
         return reference
 
     @staticmethod
@@ -1153,38 +1297,26 @@ class MSSH:
         logging.info("Wrote images")
         header=["\\documentclass{article}", "\\usepackage{xcolor}", "\\usepackage{hyperref}", "\\usepackage{float}",
                 "\\usepackage{graphicx}", "\\usepackage[encoding,filenameencoding=utf8]{grffile}"]
-        with open("Summary.tex", "w+", encoding="utf-8") as f:
-            f.write(list_to_string(header)+"\n"+"\\title{Summary: "+min(days).isoformat()+" - "+max(days).isoformat()+"}\n")
-            f.write("\\begin{document}\n")
-            f.write("\\maketitle\n")
-            for tag in tags:
-                rep_tag=tag
-                for rep in tbr:
-                    rep_tag=rep_tag.replace(rep[0], rep[1])
-                f.write("\\section*{"+f"{rep_tag}"+ "}\n")
-                f.write("\\hypertarget{"+f"{rep_tag}"+"}{}\n")
-                f.write("\\begin{figure}[H]\n")
-                f.write("\\centering\n")
-                f.write("\\includegraphics{"+"./imgs/"+tag+".png"+"}\n")
-                f.write("\\caption{"+rep_tag+"}\n")
-                f.write("\\end{figure}\n")
-                f.write("\\clearpage\n")
-            f.write("\\end{document}\n")
+        f=io.StringIO()
+        f.write(list_to_string(header)+"\n"+"\\title{Summary: "+min(days).isoformat()+" - "+max(days).isoformat()+"}\n")
+        f.write("\\begin{document}\n")
+        f.write("\\maketitle\n")
+        for tag in tags:
+            rep_tag=tag
+            for rep in tbr:
+                rep_tag=rep_tag.replace(rep[0], rep[1])
+            f.write("\\section*{"+f"{rep_tag}"+ "}\n")
+            f.write("\\hypertarget{"+f"{rep_tag}"+"}{}\n")
+            f.write("\\begin{figure}[H]\n")
+            f.write("\\centering\n")
+            f.write("\\includegraphics{"+"./imgs/"+tag+".png"+"}\n")
+            f.write("\\caption{"+rep_tag+"}\n")
+            f.write("\\end{figure}\n")
+            f.write("\\clearpage\n")
+        f.write("\\end{document}\n")
         logging.info("generated .tex file")
-        subprocess.run(["pdflatex", "Summary.tex"], stdout=subprocess.DEVNULL)
-        subprocess.run(["pdflatex", "Summary.tex"], stdout=subprocess.DEVNULL)
-        if os.path.isfile("Summary.log"):os.remove("Summary.log")
-        if os.path.isfile("Summary.aux"):os.remove("Summary.aux")
-        if os.path.isfile("Summary.nav"):os.remove("Summary.nav")
-        if os.path.isfile("Summary.out"):os.remove("Summary.out")
-        if os.path.isfile("Summary.toc"):os.remove("Summary.toc")
-        if os.path.isfile("Summary.tex"):os.remove("Summary.tex")
-        if os.path.isfile("Summary.tex.bak"):os.remove("Summary.tex.bak")
+        submit_latex(project, "Summary", f.getvalue(), "./pdfs/Summary.pdf", files=["./imgs/"+tag+".png" for tag in tags], on_done=lambda file: open_pdf(project, file))
         shutil.rmtree("./imgs/")
-        os.replace("Summary.pdf","./pdfs/Summary.pdf")
-        logging.info("Removed useless files and generated pdf")
-        subprocess.Popen([project.settings["pdfpath"],"./pdfs/Summary.pdf"], shell=True)
-        logging.info("Pdf closed")
         return reference
 
     @staticmethod
@@ -1220,11 +1352,11 @@ class MSSH:
     def c_tag_summary(project:ChronoProject, reference:str, tag:str, start:str="start",end:str="stop")->str:
         """Creates a csv file of var:tag. Each day (with at least 1 event with tag var:tag) $\n$ [var:start, var:end] is represented by a row containing both the date and
            the iso-formatted length of time var:tag was done at this day. Both var:start and var:end support IntelliRef."""
-        days=project.analysis_get_between(start, end, reference)
+        rollups=project.sync_rollups()
         data=[]
-        for day in days:
-            if (duration:=get_time(day, tag))>0:
-                data.append((day.date, seconds_to_time(int(3600*duration)).isoformat()))
+        for period, entry in rollups.periods("day", project.date_from_str(start, reference), project.date_from_str(end, reference)):
+            if (seconds:=entry["tags"].get(tag, [0, 0])[0])>0:
+                data.append((date.fromisoformat(period), seconds_to_time(seconds).isoformat()))
         if not path.exists("./sums/"):
                 mkdir("./sums/")
         with open(f"sums/{tag}_{start}_{end}"+".csv","w+") as f:
@@ -1244,41 +1376,31 @@ class MSSH:
         if year=="": year_ld=ref_date.year
         else: year_ld=int(year)
         _, ld=calendar.monthrange(year_ld, month_ld)
+        seconds, count=project.sync_rollups().get("month", f"{year_ld}-{month_ld:02d}")["tags"].get(tag, [0, 0])
+        print(f"{tag}: {seconds/3600:.2f} hours ({count} events) in {year_ld}-{month_ld:02d}")
         MSSH.c_tag_summary(project,reference,tag,date(year=year_ld,month=month_ld, day=1).isoformat(),date(year=year_ld,month=month_ld, day=ld).isoformat())
         return reference
 
     @staticmethod
-    def c_export_schedule(project:ChronoProject, reference:str)->str:
-        """Exports the schedule to pdf."""
+    def c_export_schedule(project:ChronoProject, reference:str,resolution:str="0",output:str="pdf",compact:str="0")->str:
+        """Exports the schedule to pdf. var:resolution, var:output (schedule.csv / .html) and var:compact work like in exportweek."""
         header=["\\documentclass{article}", "\\usepackage{xcolor}","\\usepackage{hyperref}","\\usepackage{pdflscape}"]
-        poi=set()
-        for week in project.schedule.days:
-            for day in week:
-                for event in day:
-                    poi.add(event.start)
-                    poi.add(event.end)
-        pois=sorted(poi)
-        slots=[(pois[i],pois[i+1]) for i in range(len(pois)-1)]
-        with open("weekexport.tex", "w+", encoding="utf-8") as f:
-            f.write(list_to_string(header)+"\n")
-            f.write("\\begin{document}\n")
-            f.write("\\begin{landscape}\n")
-            for week in project.schedule.days:
-                data=[["Timeslots"]+[WEEKDAYS[day] for day in range(7)]]+[[f"{slot[0].isoformat()[:-3]}-{slot[1].isoformat()[:-3]}"]+[what_or_none(list(filter(lambda x: check_in_timeframe(slot,x),week[i])), project.scheme) for i in range(7)] for slot in slots]
-                write_table(f, [8, len(slots)+1], data=data)
-                f.write("\\clearpage")
-            f.write("\\end{landscape}\n")
-            f.write("\\end{document}\n")
-        subprocess.run(["pdflatex", "weekexport.tex"], stdout=subprocess.DEVNULL)
-        subprocess.run(["pdflatex", "weekexport.tex"], stdout=subprocess.DEVNULL)
-        if os.path.isfile(f"weekexport.log"):os.remove(f"weekexport.log")
-        if os.path.isfile(f"weekexport.aux"):os.remove(f"weekexport.aux")
-        if os.path.isfile(f"weekexport.nav"):os.remove(f"weekexport.nav")
-        if os.path.isfile(f"weekexport.out"):os.remove(f"weekexport.out")
-        if os.path.isfile(f"weekexport.toc"):os.remove(f"weekexport.toc")
-        if os.path.isfile(f"weekexport.tex"):os.remove(f"weekexport.tex")
-        os.replace("weekexport.pdf","./pdfs/weekexport.pdf")
-        subprocess.Popen([project.settings["pdfpath"], "./pdfs/weekexport.pdf"], shell=True)
+        weeks=[[week[i] for i in range(7)] for week in project.schedule.days]
+        slots=fixed_slots(sum(weeks, []), int(resolution)) if int(resolution)>0 else poi_slots(sum(weeks, []))
+        grids=[SlotGrid.build(f"week {i}", WEEKDAYS, week, slots=slots) for i, week in enumerate(weeks)]
+        if compact=="1": grids=[grid.compact() for grid in grids]
+        if write_grids("schedule", grids, output, project.scheme):
+            return reference
+        f=io.StringIO()
+        f.write(list_to_string(header)+"\n")
+        f.write("\\begin{document}\n")
+        f.write("\\begin{landscape}\n")
+        for grid in grids:
+            write_table(f, [8, len(grid.slots)+1], data=grid.latex_data(project.scheme))
+            f.write("\\clearpage")
+        f.write("\\end{landscape}\n")
+        f.write("\\end{document}\n")
+        submit_latex(project, "schedule", f.getvalue(), "./pdfs/weekexport.pdf", on_done=lambda file: open_pdf(project, file))
         return reference
 
     @staticmethod
@@ -1322,22 +1444,14 @@ class MSSH:
     def c_barplot_tags(project:ChronoProject, reference:str, tagss:str, start:str="start", end:str="stop")->str:
         """Barplot of the distribution of the var:tagss in [var:start, var:stop]. Both var:start and var:end support IntelliRef."""
         plt.clf()
-        ddays=sorted(project.analysis_get_between(start,end,reference), key=lambda x: x.date)
         tags=tagss.split(",")
-        days=[]
-        for day in ddays:
-            if reduce(lambda a,b: a or b, [tag in set(reduce(lambda a,b:a+b,[event.tags for event in day.events])) for tag in tags]):
-                    days.append(day)
-        data:Dict[str, float]={}
-        for tag in tags:
-            data[tag]=0.0
-        for day in days:
-            for tag in tags:
-                    data[tag]+=get_time(day, tag)
+        rollups=project.sync_rollups()
+        start_date, end_date=project.date_from_str(start, reference), project.date_from_str(end, reference)
+        data:Dict[str, float]={tag:rollups.tag_total(tag, start_date, end_date)[0]/3600 for tag in tags}
         plt.bar(tags, [data[tag] for tag in tags])
         plt.title(tagss)
         logging.info("Genearted barplot")
-        plt.show()
+        show_plot("barplot_tags")
         logging.info("Plot closed")
         return reference
 
@@ -1413,6 +1527,15 @@ class MSSH:
         con.close()
         return reference
 
+    @staticmethod
+    def c_export_parquet(project:ChronoProject, reference:str, directory:str="")->str:
+        """Exports the project to parquet files (one per table: days, events, times, runs, pushups, planks, situps, functions, sleep, notes) in var:directory.
+        The default directory is data/path_parquet. Needs pyarrow."""
+        if directory=="": directory="data/"+project.path+"_parquet"
+        counts=export_parquet(project, directory)
+        print(f"Exported to {directory}: "+", ".join(f"{table}: {n}" for table, n in counts.items()))
+        return reference
+
     @staticmethod
     def c_tags(project:ChronoProject, reference:str, start:str="start", end:str="stop")->str:
         """Prints all tags in [var:start,var:end]. Both var:start and var:end support IntelliRef."""
@@ -1440,23 +1563,17 @@ class MSSH:
     @staticmethod
     def c_display_graph_img(project:ChronoProject, reference:str, start:str="start", end:str="stop")->str:
         """Saves a picture of the tag graph from [var:start,var:end]. Both var:start and var:end support IntelliRef."""
-        G=project.get_tag_graph(start, end, reference)
-        for cc in nx.connected_components(G):
-            plt.clf()
-            sub_g=G.subgraph(cc)
-            pos=nx.circular_layout(sub_g,scale=2)
-            nx.draw(sub_g, pos, with_labels=True, edge_color="tab:red", node_size=300)
-            logging.info("Plotted a cc")
-            plt.show()
-            logging.info("Plot closed")
+        SHOW_GRAPH.run(project, reference, start, end)
         return reference   
 
     @staticmethod
     def c_rename_tag(project:ChronoProject, reference:str, old_tag:str, new_tag:str)->str:
         """Rename all instances of var:old_tag to var:new_tag."""
         for day in project.days.values():
-            for event in day.events:
-                event.tags=[tag if tag!= old_tag else new_tag for tag in event.tags]
+            if old_tag in day.get_tags():
+                for event in day.events:
+                    event.tags=[tag if tag!= old_tag else new_tag for tag in event.tags]
+                day.touch()
         return reference
 
     @staticmethod
@@ -1469,6 +1586,7 @@ class MSSH:
                 if 0==len(event.tags)<n:
                     event.tags=["deleted_tag"]
                     logging.warning(f"Tags got deleted and the tags of {day.date} is now [deleted_tag]")
+            day.touch()
         return reference
 
     @staticmethod
@@ -1502,20 +1620,27 @@ class MSSH:
         min_y=min([min(min(ys[tag][0]),min(ys[tag][1])) for tag in tags_list])
         yticks=[round(min_y*(5-i)/5+i/5*max_y) for i in range(6)]
         plt.yticks(yticks, [seconds_to_time(y).isoformat() for y in yticks])
-        plt.show()    
+        show_plot("earliest_latest_plot")    
         return reference
 
     @staticmethod
     def c_earliest_latest_sleep(project:ChronoProject, reference:str, start:str="start", stop:str="stop")->str:
-        """Plots the start / end of the (nightly) sleep over time=[var:start,var:stop]. Both var:start and var:end support IntelliRef."""
+        """Plots the start / end of the (nightly) sleep over time=[var:start,var:stop]. Uses the oura data if available and the events tagged with sleep otherwise.
+        Both var:start and var:end support IntelliRef."""
         days=sorted(project.analysis_get_between(start, stop, reference),key=lambda x:x.date)
         if (days[0].date-timedelta(days=1)).isoformat() in project.days.keys():
             days=[project.days[(days[0].date-timedelta(days=1)).isoformat()]] + days
         xs:List[int]=[]
         ys:Tuple[List[int],List[int]]=([],[])
+        store=project.sync_sleep()
         for i in range(1,len(days)):
             split_sleep=False
-            if "sleep" in days[i].get_tags():
+            if (night:=store.night(days[i].date))!=None:
+                bedtime, phases=night
+                xs.append(i)
+                ys[0].append(60*bedtime)
+                ys[1].append(60*(bedtime+SLOT*len(phases)))
+            elif "sleep" in days[i].get_tags():
                 for event in days[i].events:
                     if "split_sleep" in event.tags:
                         split_sleep=True
@@ -1538,7 +1663,7 @@ class MSSH:
         min_y=min(ys[0]+ys[1])
         yticks=[round(min_y*(5-i)/5+i/5*max_y) for i in range(6)]+[0]
         plt.yticks(yticks, [seconds_to_time(y).isoformat() if y>=0 else "-"+seconds_to_time(-y).isoformat() for y in yticks])
-        plt.show()
+        show_plot("earliest_latest_sleep")
         return reference
 
     @staticmethod
@@ -1552,42 +1677,7 @@ class MSSH:
     @staticmethod
     def c_run_path(project:ChronoProject, reference:str, start:str="start", stop:str="stop")->str:
         """Plot the path of runs in (run_time,distance) space. Both var:start and var:end support IntelliRef."""
-        days = project.analysis_get_between(start, stop, reference)
-        xs=[] #distance
-        ys=[] #time  
-        for i in range(len(days)):
-            lengths=sum([run.time for run in days[i].sport["runs"]])
-            distance=sum([run.distance for run in days[i].sport["runs"]])
-            pace=lengths/max(distance,1)
-            if distance > 0:
-                xs.append(distance)
-                ys.append(pace)
-        plt.close() # "Fix": 2 plots open, but one is empty
-        fig, ax = plt.subplots()
-        line, = ax.plot([], [], lw=2)
-        ax.set_xlim(0.9*min(xs),1.1*max(xs))
-        ax.set_ylim(0.9*min(ys),1.1*max(ys))
-        ticks=get_pace_ticks(ys)
-        ax.set_yticks(ticks[0])
-        ax.set_yticklabels(ticks[1])
-
-        def init():
-            line.set_data([], [])
-            return line,
-
-        def animate(i, xs, ys):
-            i=i%len(xs)
-            line.set_data(xs[:i], ys[:i])
-            ax.set_title(f"{i}/{len(xs)}")
-            return line,    
-
-        anim = animation.FuncAnimation(fig, lambda x: animate(x,xs,ys), init_func=init,
-                               frames=len(xs)-1, interval=100, blit=False)
-
-        plt.grid(True)
-        logging.info("Displaying plot ...")
-        plt.show()
-        logging.info("Plot closed") 
+        RUN_PATH.run(project, reference, start, stop)
         return reference
 
     @staticmethod
@@ -1620,95 +1710,96 @@ class MSSH:
         return reference
 
     @staticmethod
-    def c_treeview(project:ChronoProject, reference:str, ignored_tags:str, start:str="start", stop:str="stop")->str:
-        """TreeView of the CRMs after ignoring specified tags. Data is filtered to be from days in [start,stop]."""
+    def c_treeview(project:ChronoProject, reference:str, ignored_tags:str, start:str="start", stop:str="stop", prune:str="0")->str:
+        """TreeView of the CRMs after ignoring specified tags. Data is filtered to be from days in [start,stop]. 
+        If var:prune is 1, levels without a split are left out."""
         G,f=project.get_gbl_data(start,stop,reference,ignored_tags.split(","))
-        ccs_data=mc.gbl_get_ccs(G,f)
-        ccs=[cc for _,cc in ccs_data]
-        assert len(ccs_data)>0
-        n=len(ccs)
-        subclusters=[{j:[k for k in range(len(ccs[i+1])) if mc.subset(ccs[i+1][k],ccs[i][j])] for j in range(len(ccs[i]))} for i in range(n-1)]
-        trees=[[[] for j in range(n)] for i in range(len(ccs[0]))]
-        for i in range(len(ccs[0])):
-            trees[i][0].append(i)
-            for j in range(n-1):
-                tmp=list(reduce(lambda a,b:a+b,[subclusters[j][index] for index in trees[i][j]],[]))
-                trees[i][j+1]=tmp
+        tree=mc.MergeTree(G,f).hierarchy(bool(int(prune)))
+        assert len(tree)>0
+        children=tree.children()
         x_start=0
-        pos=[[[] for _ in ccs[0]] for cluster in ccs]    
-        for tree in trees:
+        for subtree in tree.subtrees():
+            pos:Dict[Tuple[int,int],int]={}
             xs=[]
             ys=[]
-            for i,level in enumerate(tree):
-                xs+=[x_start+j for j in range(len(level))]
-                ys+=[i for _ in level]
+            for i,level in enumerate(subtree):
                 for index,j in enumerate(level):
-                    pos[i][j]=[x_start+index,i]
-            for i,level in enumerate(tree):
-                if i < n-1:
-                    for j1 in level:
-                        for j2 in subclusters[i][j1]:
-                            plt.plot([pos[i][j1][0],pos[i+1][j2][0]],[i,i+1],color="black")
-            x_start+=max(len(level) for level in tree)
+                    pos[(i,j)]=x_start+index
+                    xs.append(x_start+index)
+                    ys.append(i)
+            for i,level in enumerate(subtree[:-1]):
+                for j1 in level:
+                    for j2 in children[i][j1]:
+                        plt.plot([pos[(i,j1)],pos[(i+1,j2)]],[i,i+1],color="black")
+            x_start+=max(len(level) for level in subtree)
             plt.scatter(xs,ys,color="red")
-        plt.yticks([i for i in range(len(ccs))],[cc[0] for cc in ccs_data])
-        plt.show()
+        plt.yticks([i for i in range(len(tree))],tree.thresholds)
+        show_plot("treeview")
+        return reference
+
+    @staticmethod
+    def c_export_treeview(project:ChronoProject, reference:str, ignored_tags:str, start:str="start", stop:str="stop", prune:str="0")->str:
+        """Exports the cluster tree of gbltreeview to jsons/gbltree.json. If var:prune is 1, levels without a split are left out."""
+        if not path.exists("./jsons/"):
+            mkdir("./jsons/")
+        G,f=project.get_gbl_data(start,stop,reference,ignored_tags.split(","))
+        tree=mc.MergeTree(G,f).hierarchy(bool(int(prune)))
+        with open("./jsons/gbltree.json", "w+") as file:
+            json.dump(tree.to_dict(),file,indent=4)
         return reference
 
     @staticmethod
     def c_fftplot(project:ChronoProject, reference:str,tag:str,min_period_length:str="2",max_period_length:str="31", start:str="start", stop:str="stop")->str:
         """FFT of a tag in the specified timeframe. Will shorten the timeframe if the tag does not occ on the first day."""
-        MSSH.c_fill_empty_days(project,reference,start,stop)
-        days = project.analysis_get_between(start, stop, reference)
-        n=len(days)
-        tags=project.get_tags()
-        index_offsets:List[int]=[0,n-1]    
-        if tag in tags:  
-            for i in range(0,n):
-                if tag in days[i].get_tags():
-                    index_offsets[0]=i
-                    break
-            for i in range(1,n+1):
-                if (tag in days[n-i].get_tags()):
-                    index_offsets[1]=n-i
-                    break
-        else:
-            for i in range(0,n):
-                if tag in days[i].functions.keys():
-                    index_offsets[0]=i
-                    break
-            for i in range(1,n+1):
-                if tag in days[n-i].functions.keys():
-                    index_offsets[1]=n-i
-                    break
-        if index_offsets[0]>0:
-            logging.info(f"Ignored the first {index_offsets[0]} day(s)")
-        if index_offsets[1]>0:
-            logging.info(f"Ignored the last {index_offsets[1]} day(s)")
-        ys=[]
-        #populate ys
-        for day in days[index_offsets[0]:index_offsets[1]]:
-            if tag in day.functions.keys():
-                ys.append(day.functions[tag])
-            else:
-                ys.append(get_time(day, tag))
-        if len(ys)>0:avg=sum(ys)/len(ys)
-        else: avg=0
-        ys=[y-avg for y in ys]
-        N = index_offsets[1]-index_offsets[0]
-        T = 1
-        y = np.array(ys)
-        yf = fft(y)
-        xf = [1/v if v!=0 else 2*(n+1) for v in list(fftfreq(N, T)[:N//2])]
-        tmp=(2.0/N * np.abs(yf[:N//2]))
-        plt.plot(xf, tmp,label=f"Influence(1/f), {N} data points")
-        plt.scatter(xf, tmp,marker="*",c="red")
-        if max_period_length=="max": max_period_length=str(n+1)
-        plt.xlim(int(min_period_length),int(max_period_length))
-        plt.grid()
-        plt.title(f"fft({tag}):[{days[index_offsets[0]].date.isoformat()},{days[index_offsets[1]].date.isoformat()}]")
-        plt.legend()
-        plt.show()
+        FFTPLOT.run(project, reference, tag, min_period_length, max_period_length, start, stop)
+        return reference
+
+    @staticmethod
+    def c_spectrum(project:ChronoProject, reference:str, tags:str, min_period_length:str="2", max_period_length:str="31", top:str="3", method:str="fft", plot:str="0", start:str="start", stop:str="stop")->str:
+        """Prints the var:top dominant periods (in days) of each of the var:tags (tags or functions, seperated by commata) in [var:start, var:stop].
+        var:method is fft or welch. Missing days count as 0. If var:plot is 1 the spectra are plotted as well. Both var:start and var:stop support IntelliRef."""
+        keys=list(dict.fromkeys(tags.split(",")))
+        series=ChronoSeries.between(project, reference, keys, start, stop)
+        spectrum=spectral.ChronoSpectrum(series, keys, method)
+        if max_period_length=="max": max_period_length=str(spectrum.days)
+        print(spectrum.to_text(int(top), float(min_period_length), float(max_period_length)))
+        if plot=="1":
+            plt.clf()
+            allowed=(spectrum.periods>=float(min_period_length))&(spectrum.periods<=float(max_period_length))
+            for i, key in enumerate(keys):
+                plt.plot(spectrum.periods[allowed], spectrum.power[i, allowed], marker="*", label=key)
+            plt.xlabel("Period (days)")
+            plt.grid()
+            plt.legend()
+            show_plot("spectrum")
+        return reference
+
+    @staticmethod
+    def c_query(project:ChronoProject, reference:str, *terms:str)->str:
+        """Prints the events matching the query var:terms, e.g. tag:mathe and not tag:uni date:i-30..stop time:06:00..09:00 group:week sum:duration.
+        Conditions: tag:, what:, time:, weekday: combined with and, or, not and parentheses.
+        Options: date:start..stop (IntelliRef), group:day|week|month|year|weekday|tag, sum:duration|count."""
+        query=ChronoQuery(list(terms))
+        print("\t".join(query.header()))
+        for row in query.rows(project, reference):
+            print("\t".join(f"{value:.2f}" if isinstance(value, float) else str(value) for value in row))
+        return reference
+
+    @staticmethod
+    def c_rollup(project:ChronoProject, reference:str, tags:str, grain:str="month", start:str="start", stop:str="stop")->str:
+        """Prints the totals of the var:tags (tags or functions, seperated by commata) for every var:grain (day, week, month, year) in [var:start, var:stop].
+        Tags are given as hours and number of events, functions as sum, mean and number of days. Both var:start and var:stop support IntelliRef."""
+        keys=tags.split(",")
+        for period, entry in project.sync_rollups().periods(grain, project.date_from_str(start, reference), project.date_from_str(stop, reference)):
+            values=[]
+            for key in keys:
+                if key in entry["functions"].keys():
+                    value, count=entry["functions"][key]
+                    values.append(f"{key}: {value:.2f} (mean {value/count:.2f}, {count} days)")
+                else:
+                    seconds, count=entry["tags"].get(key, [0, 0])
+                    values.append(f"{key}: {seconds/3600:.2f} hours ({count} events)")
+            print(f"{period}\t"+"\t".join(values))
         return reference
 
     @staticmethod
@@ -1731,51 +1822,38 @@ class MSSH:
 
     @staticmethod
     def c_review_days(project:ChronoProject, reference:str, ndays:str,interpolate:str="3")->str:
-        assert len(project.settings["review_days"]["tags"])==9 #TODO: verbessern
-        n_days=int(ndays)
-        MSSH.c_oura_sleep(project,"ref",(datetime.today().date()-timedelta(days=n_days+1)).isoformat(),"stop")
-        days=project.analysis_get_between("start","stop","ref")[-int(n_days)-1:-1]
-        fs=project.get_functions(days)
-        tags=project.settings["review_days"]["tags"]
-        goals=project.settings["review_days"]["goals"]
-        ys={tag:[] for tag in tags}
-        goal_colors=project.settings["review_days"]["goal_colors"]
-        normalizer={key:n_days*project.settings["review_days"]["normalizer"][key] for key in project.settings["review_days"]["normalizer"].keys()}
-        for day in days:
-            for tag in tags:
-                if tag in fs: 
-                    ys[tag].append(project.get_function(day.date,tag,int(interpolate)))
-                    normalizer[tag]+=1
-                else:
-                    ys[tag].append(get_time(day, tag))
-        tags_sum={tag:sum(ys[tag]) for tag in ys.keys()}
-        fig, axs = plt.subplots(3, 3)
-        for i in range(9):
-            axs[i//3, i%3].plot(ys[tags[i]],label="Data")
-            axs[i//3, i%3].scatter([j for j in range(len(ys[tags[i]]))],ys[tags[i]],label="DataPoints",c="red",marker="*")
-            axs[i//3, i%3].plot([tags_sum[tags[i]]/max(normalizer[tags[i]],1) for _ in range(n_days)],label="Average")
-            axs[i//3, i%3].plot([goals[tags[i]] for _ in range(n_days)],label="Reference")
-            axs[i//3, i%3].set_title(tags[i],color=goal_colors[tags[i]][int(goals[tags[i]]<=tags_sum[tags[i]]/max(normalizer[tags[i]],1))])
-        if tags[i]=="weight":
-            axs[i//3, i%3].set_ylim((min([y for y in ys[tags[i]] if y >0])-1,max(max(ys[tags[i]])+1,goals[tags[i]])))
-        elif tags[i]=="all_sleep":
-            axs[i//3, i%3].set_ylim((min([y for y in ys[tags[i]] if y >0])-1,max(max(ys[tags[i]])+1,goals[tags[i]])))
-            axs[i//3, i%3].legend(loc=2,prop={'size': 6})
-        fig.tight_layout(pad=1.0)
-        plt.show()
+        REVIEW_DAYS.run(project, reference, ndays, interpolate)
+        return reference
+
+    @staticmethod
+    def c_sleep_stats(project:ChronoProject, reference:str, start:str="start", stop:str="stop")->str:
+        """Prints statistics of the oura sleep data of the nights ending in [var:start, var:stop]: average minutes per phase, average and standard deviation
+        of onset, wake time and midpoint, the drift of the midpoint (minutes per day) and the sleep regularity index. Both var:start and var:stop support IntelliRef."""
+        stats=project.sync_sleep().stats(project.date_from_str(start, reference), project.date_from_str(stop, reference))
+        summary=stats.summary()
+        if len(stats)==0:
+            print("No sleep data :(")
+            return reference
+        clock=lambda minutes: seconds_to_time(int(60*(minutes%(24*60)))).isoformat()[:5]
+        print(f"{len(stats)} nights [{stats.dates[0].isoformat()},{stats.dates[-1].isoformat()}]")
+        print(", ".join(f"{phase}: {summary[phase]:.0f} min" for phase in PHASES))
+        for name in ["onset","wake","midpoint"]:
+            print(f"{name}: {clock(summary[name])} (std {summary[name+'_std']:.0f} min)")
+        print(f"drift: {summary['drift']:.2f} min/day")
+        print(f"regularity: {summary['regularity']:.1f}")
         return reference
 
     @staticmethod
     def c_show_sleep_day(project:ChronoProject, reference:str, day:str)->str:
         """"Plot the sleep phases of the given day. 4~Awake,3~Rem,2~light,1~deep"""
         if day in project.days.keys():
-            if not project.days[day].sleep=="":
-                events=[e for e in project.days[day].events if "all_sleep" in e.tags]
-                plt.plot([int(sp) for sp in fix_oura(project.days[day].sleep)],label=f"sleepphases: {day}")
-                plt.xticks([0,len(project.days[day].sleep)-1], [events[0].start.isoformat(),events[-1].end.isoformat()])
+            if (night:=project.sync_sleep().night(project.days[day].date))!=None:
+                bedtime, phases=night
+                plt.plot(smooth(phases),label=f"sleepphases: {day}")
+                plt.xticks([0,len(phases)-1], [seconds_to_time(60*(minutes%(24*60))).isoformat()[:5] for minutes in [bedtime, bedtime+SLOT*len(phases)]])
                 plt.yticks([1,2,3,4],["deep","light","rem","awake"])
                 plt.legend()
-                plt.show()
+                show_plot("show_sleep_day")
         return reference
 
 class ChronoClient:
@@ -1835,6 +1913,18 @@ class ChronoClient:
             print(f"unknown command : {cmd}")
         return reference
 
+    def c_import_parquet(self, project:ChronoProject, reference:str, directory:str="")->str:
+        """Replaces the project by the one exported to var:directory by exportparquet (default: data/path_parquet). Needs pyarrow."""
+        if directory=="": directory="data/"+project.path+"_parquet"
+        p=import_parquet(ChronoProject, ChronoDay, directory)
+        p.set_schedule(project.schedule)
+        p.set_alias(self.command_set)
+        p.lock=project.lock
+        p.jobs=project.jobs
+        self.project=p
+        print(f"Imported {len(p.days)} days from {directory}")
+        return reference
+
     def c_save(self, project:ChronoProject, reference:str)->str:
         """Saves the project."""
         shutil.copy("data/"+project.path+".json", "data/"+project.path+"_backup.json")
@@ -1879,6 +1969,46 @@ class ChronoClient:
             print(f"Can't find f: {f}") 
             return reference
 
+    def c_bg(self, project:ChronoProject, reference:str, cmd:str, *args:str)->str:
+        """Runs the analysis var:cmd (plot, heatmap, plotrun, runpath, fftplot, showgraph or reviewday) with var:args in the background
+        and prints its job id. Its plot is shown by "jobs collect"."""
+        cmd=cmd.lower()
+        if ANALYSES.get(self.command_set.get(cmd))==None:
+            raise Exception(f"{cmd} can not run in the background")
+        job=project.jobs.submit(cmd, ANALYSES[self.command_set[cmd]], project, reference, list(args))
+        print(f"Job {job.id}: {job.command}")
+        return reference
+
+    def c_perf(self, project:ChronoProject, reference:str, reset:str="0")->str:
+        """Prints the median, 95th percentile and maximum of the wall time and the CPU time (in ms) of every command and alias since
+        the stats were reset, and the maximal peak allocation (in KiB) if the setting perf_tracemalloc is set. The peak is measured for
+        the whole process and only for commands which change the project (see execute). If var:reset is 1 the stats are reset afterwards."""
+        rows=self.perf.table()
+        widths=[max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+        for row in rows:
+            print("  ".join(row[0].ljust(widths[0]) if i==0 else cell.rjust(widths[i]) for i, cell in enumerate(row)))
+        if tracemalloc.is_tracing():
+            print("peak: allocations of the whole process (including background jobs), measured for commands which change the project only")
+        if reset=="1":
+            self.perf.reset()
+            self.perf.save()
+        return reference
+
+    def c_profile(self, project:ChronoProject, reference:str, cmd:str, *args:str)->str:
+        """Runs var:cmd with var:args under cProfile and prints the functions with the largest cumulative time (as many as the
+        setting profile_top, default 20)."""
+        import cProfile, pstats
+        if not self.exists(cmd.lower()):
+            raise Exception(f"{cmd} does not exist")
+        profiler=cProfile.Profile()
+        profiler.enable()
+        try:
+            reference=self.execute([cmd]+list(args), reference, timed=False)
+        finally:
+            profiler.disable()
+            pstats.Stats(profiler, stream=sys.stdout).sort_stats("cumulative").print_stats(project.settings.get("profile_top", 20))
+        return reference
+
     def c_options(self, project:ChronoProject, reference:str)->str:
         """Opens the settings file."""
         subprocess.Popen(["code","data/settings.json"], shell=True)
@@ -1927,7 +2057,9 @@ class ChronoClient:
                 "aliases",
                 "exportschedule",
                 "mk",
+                "mkrange",
                 "show",
+                "latexjobs",
                 "tags",
                 "help",
                 "commands",
@@ -1946,7 +2078,14 @@ class ChronoClient:
                 "showgraph",
                 "earliestlatestplot",
                 "earliestlatestplotsleep",
-                "runpath"],
+                "runpath",
+                "gblgetsplitforce",
+                "gbltreeview",
+                "spectrum",
+                "query",
+                "rollup",
+                "bg",
+                "jobs"],
             NOT:["note",
                 "notes",
                 "deletenote",
@@ -1959,10 +2098,15 @@ class ChronoClient:
                 "tagsummary",
                 "tagsummarymonth",
                 "exportgraph",
-                "exportdatabase"],
+                "exportdatabase",
+                "exportgbltree",
+                "exportparquet",
+                "importparquet"],
             OUR:["ourasleep",
+                "syncsleep",
                 "getsleep",
-                "lastnightsleep"],
+                "lastnightsleep",
+                "sleepstats"],
             MIS:["quit",
                 "restore",
                 "refresh",
@@ -1970,68 +2114,58 @@ class ChronoClient:
                 "lhof",
                 "rhof",
                 "ihof",
+                "perf",
+                "profile",
                 "options"]}   
         header=["\\documentclass{article}", "\\usepackage{xcolor}", "\\usepackage{hyperref}", "\\usepackage{float}",
                 "\\usepackage{graphicx}", "\\usepackage[encoding,filenameencoding=utf8]{grffile}"]
-        with open("Overview.tex", "w+", encoding="utf-8") as f:
-            f.write(list_to_string(header)+"\n"+"\\title{Overview: "+VERSION+"}\n")
-            f.write("\\begin{document}\n")
-            f.write("\\maketitle\n")
-            f.write("\\section{Features}\n")
-            f.write("\\subsection{IntelliRef}\n")
-            f.write("IntelliRef supports the following shortcuts:\n")
-            f.write("\\begin{itemize}\n")
-            f.write("\\item \"start\": The $<$ date of all ChronoDays.\n")
-            f.write("\\item \"stop\": The $>$ date of all ChronoDays.\n")
-            f.write("\\item \"ref\": The current reference.\n")
-            f.write("\\item \"today\": The current date.\n")
-            f.write("\\item \"ix\" where x is an integer: The xth ChronoDay (sorted by date and starting at x=0). Also supports negative x (Going backwards from the $>$ date).\n")
-            f.write("\\end{itemize}\n")
-            f.write("\\section{Commands}\n")
-            for key in to_section.keys():
-                f.write("\\subsection{"+key+"}\n")
-                for cmd in to_section[key]:
-                    if not cmd=="options":
-                        f.write("\\subsubsection*{"+cmd+"}\n\n")
-                        sig=signature(self.command_set[cmd])
-                        if not self.command_set[cmd].__doc__==None: 
-                            f.write(self.command_set[cmd].__doc__.replace("_","\_").replace("<","$<$").replace(">","$>$")+"\n\n")
-                        if not len(sig.parameters.keys())==2:
-                            sig=str(sig).replace("(project: src.chrono_client.ChronoProject, reference: str", "")\
-                                .replace(") -> str", "").replace("(p, r", "").replace(")", "").replace("_","\_")
-                            f.write("Arguments: "+sig[2:].replace(": str","")+"\n")
-                        else:
-                            f.write(f"{cmd} takes no arguments\n\n")
-                    else: 
-                        f.write("\\subsubsection*{"+cmd+"}\n\n") # spaghetti code, but whatever. Try to fix this if you dare 
-                        sig=signature(self.c_options)
-                        if not self.command_set[cmd].__doc__==None: 
-                            f.write(self.c_options.__doc__.replace("_","\_")+"\n\n")
-                        if not len(sig.parameters.keys())==2:
-                            sig=str(sig).replace("(project: src.chrono_client.ChronoProject, reference: str", "")\
-                                .replace(") -> str", "").replace("(p, r", "").replace(")", "").replace("_","\_")
-                            f.write(sig[2:]+"\n")
-                        else:
-                            f.write(f"{cmd} takes no arguments\n\n")
-            f.write("\\section{Aliases}")
-            for alias in self.project.alias.keys():
-                f.write("\\subsection*{"+alias+"}\n")
-                f.write(alias+" calls : "+self.project.settings["alias"][alias].replace("|>"," followed by ").replace("$","\\$").replace("_","\_")+"\n")
-            f.write("\\end{document}\n")
+        f=io.StringIO()
+        f.write(list_to_string(header)+"\n"+"\\title{Overview: "+VERSION+"}\n")
+        f.write("\\begin{document}\n")
+        f.write("\\maketitle\n")
+        f.write("\\section{Features}\n")
+        f.write("\\subsection{IntelliRef}\n")
+        f.write("IntelliRef supports the following shortcuts:\n")
+        f.write("\\begin{itemize}\n")
+        f.write("\\item \"start\": The $<$ date of all ChronoDays.\n")
+        f.write("\\item \"stop\": The $>$ date of all ChronoDays.\n")
+        f.write("\\item \"ref\": The current reference.\n")
+        f.write("\\item \"today\": The current date.\n")
+        f.write("\\item \"ix\" where x is an integer: The xth ChronoDay (sorted by date and starting at x=0). Also supports negative x (Going backwards from the $>$ date).\n")
+        f.write("\\end{itemize}\n")
+        f.write("\\section{Commands}\n")
+        for key in to_section.keys():
+            f.write("\\subsection{"+key+"}\n")
+            for cmd in to_section[key]:
+                if not cmd=="options":
+                    f.write("\\subsubsection*{"+cmd+"}\n\n")
+                    sig=signature(self.command_set[cmd])
+                    if not self.command_set[cmd].__doc__==None: 
+                        f.write(self.command_set[cmd].__doc__.replace("_","\_").replace("<","$<$").replace(">","$>$")+"\n\n")
+                    if not len(sig.parameters.keys())==2:
+                        sig=str(sig).replace("(project: src.chrono_client.ChronoProject, reference: str", "")\
+                            .replace(") -> str", "").replace("(p, r", "").replace(")", "").replace("_","\_")
+                        f.write("Arguments: "+sig[2:].replace(": str","")+"\n")
+                    else:
+                        f.write(f"{cmd} takes no arguments\n\n")
+                else: 
+                    f.write("\\subsubsection*{"+cmd+"}\n\n") # spaghetti code, but whatever. Try to fix this if you dare 
+                    sig=signature(self.c_options)
+                    if not self.command_set[cmd].__doc__==None: 
+                        f.write(self.c_options.__doc__.replace("_","\_")+"\n\n")
+                    if not len(sig.parameters.keys())==2:
+                        sig=str(sig).replace("(project: src.chrono_client.ChronoProject, reference: str", "")\
+                            .replace(") -> str", "").replace("(p, r", "").replace(")", "").replace("_","\_")
+                        f.write(sig[2:]+"\n")
+                    else:
+                        f.write(f"{cmd} takes no arguments\n\n")
+        f.write("\\section{Aliases}")
+        for alias in self.project.alias.keys():
+            f.write("\\subsection*{"+alias+"}\n")
+            f.write(alias+" calls : "+self.project.settings["alias"][alias].replace("|>"," followed by ").replace("$","\\$").replace("_","\_")+"\n")
+        f.write("\\end{document}\n")
         logging.info("generated .tex file")
-        subprocess.run(["pdflatex", "Overview.tex"], stdout=subprocess.DEVNULL)
-        subprocess.run(["pdflatex", "Overview.tex"], stdout=subprocess.DEVNULL)
-        if os.path.isfile("Overview.tex"): os.remove("Overview.log")
-        if os.path.isfile("Overview.aux"): os.remove("Overview.aux")
-        if os.path.isfile("Overview.nav"): os.remove("Overview.nav")
-        if os.path.isfile("Overview.out"): os.remove("Overview.out")
-        if os.path.isfile("Overview.toc"): os.remove("Overview.toc")
-        if os.path.isfile("Overview.tex"): os.remove("Overview.tex")
-        if os.path.isfile("Overview.tex.bak"): os.remove("Overview.tex.bak")
-        os.replace("Overview.pdf","./pdfs/Overview.pdf")
-        logging.info("Removed useless files and generated pdf")
-        subprocess.Popen([project.settings["pdfpath"],"./pdfs/Overview.pdf"], shell=True)
-        logging.info("Pdf closed")
+        submit_latex(project, "Overview", f.getvalue(), "./pdfs/Overview.pdf", on_done=lambda file: open_pdf(project, file))
         return reference
 
     def add_commands(self)->None:
@@ -2042,18 +2176,31 @@ class ChronoClient:
         self.command_set["refresh"]=self.c_refresh
         self.command_set["help"]=self.c_help
         self.command_set["save"]=self.c_save
+        self.command_set["importparquet"]=self.c_import_parquet
         self.command_set["lhof"]=self.c_lhof
         self.command_set["rhof"]=self.c_rhof
         self.command_set["ihof"]=self.c_ihof
         self.command_set["options"]=self.c_options
         self.command_set["overview"]=self.c_write_overview
-
-    def __init__(self, path:str,s:ChronoSchedule,command_set:Dict[str, Callable[[Union[List[str],ChronoProject],str], None]]={}):
+        self.command_set["bg"]=self.c_bg
+        self.command_set["perf"]=self.c_perf
+        self.command_set["profile"]=self.c_profile
+
+    def __init__(self, path:str,s:ChronoSchedule,command_set:Dict[str, Callable[[Union[List[str],ChronoProject],str], None]]={}, headless:bool=False,
+                 mutating:Optional[Iterable[str]]=None):
+        """Constructor: ChronoClient. If var:headless (or the setting "headless") is set, figures are saved to files instead of being shown.
+        var:mutating are the commands of var:command_set which change the project (see execute), None if all of them might."""
         self.path=path
         self.project=None
         self.command_set=command_set
+        self.mutating=None if mutating==None else set(mutating)
+        self.perf=PerfStats.load()
         logging.basicConfig(filename="log.txt", level=logging.INFO)
         self.build_ChronoProject(s)
+        if headless or self.project.settings.get("headless", False):
+            set_headless(True, self.project.settings.get("figure_dir"))
+        if self.project.settings.get("perf_tracemalloc", False) and not tracemalloc.is_tracing():
+            tracemalloc.start()
 
     def run(self)->None:
         """ Main loop of Chrono."""
@@ -2063,6 +2210,7 @@ class ChronoClient:
         last_command=""
         reference:str="base"
         print("Chrono active")
+        set_blocking(self.project.settings.get("block_plots", False))
         if len(self.project.days.values())==0:
             print("No ChronoDays detected. If you are new consider using the \"help\"/\"commands\" commands to get more information.")
             print("For a more detailed documentation visit: https://github.com/MathManuelHinz/chrono/tree/master/documentation")
@@ -2073,23 +2221,96 @@ class ChronoClient:
                 print("Please enter a command")
             else:
                 last_command=ip[0].lower()
-                if last_command in self.project.alias.keys():
-                    logging.info(msg=f"{ip}")
-                    try: reference = self.project.alias[last_command](self.project, reference, *ip[1:])
-                    except Exception as e:
-                        logging.warning(e)
-                        print(e)
-                elif last_command in self.command_set.keys():
-                    logging.info(msg=f"{ip}")
-                    try :reference= self.command_set[last_command](self.project, reference, *ip[1:])
+                if self.exists(last_command):
+                    try: reference=self.execute(ip, reference)
                     except Exception as e:
                         logging.warning(e)
                         print(e)
                 else:
                     logging.info(msg=f"Failed command: {ip}")
                     print("This command does not exist")
+        self.perf.save()
         logging.shutdown()
 
+    def exists(self, cmd:str)->bool:
+        """Checks if var:cmd is an alias or a command."""
+        return cmd in self.project.alias.keys() or cmd in self.command_set.keys()
+
+    def mutates(self, cmd:str)->bool:
+        """Checks if the command or alias var:cmd might change the project."""
+        if cmd in self.project.alias.keys():
+            return any(self.mutates(step) for step, _ in self.project.alias[cmd].commands())
+        return self.mutating==None or cmd in CLIENT_MUTATING or cmd in self.mutating
+
+    def execute(self, ip:List[str], reference:str, timed:bool=True)->str:
+        """Executes a split command line (alias or command) and returns the new reference. Commands which change the project
+        hold its lock exclusively, all others shared (see RWLock), so the REPL, a server and background jobs can use the
+        project at the same time. Unless var:timed is False the wall time and the CPU time of the command (without waiting
+        for the lock) are recorded in var:perf. If tracemalloc is tracing the peak allocation of commands which change the project
+        is recorded as well. tracemalloc only knows the peak of the whole process, so it is not measured for commands running
+        alongside other commands; background jobs and LaTeX builds are still counted."""
+        cmd=ip[0].lower()
+        logging.info(msg=f"{ip}")
+        lock=self.project.lock
+        mutates=self.mutates(cmd)
+        with lock.write() if mutates else lock.read():
+            if not timed:
+                return self.dispatch(ip, reference)
+            trace=mutates and tracemalloc.is_tracing()
+            if trace:
+                tracemalloc.reset_peak()
+                memory=tracemalloc.get_traced_memory()[0]
+            start, cpu_start=perf_counter(), thread_time()
+            try:
+                return self.dispatch(ip, reference)
+            finally:
+                self.perf.record(cmd, perf_counter()-start, thread_time()-cpu_start, tracemalloc.get_traced_memory()[1]-memory if trace else None)
+
+    def dispatch(self, ip:List[str], reference:str)->str:
+        """Calls the alias or command var:ip[0] with the arguments var:ip[1:]."""
+        cmd=ip[0].lower()
+        if cmd in self.project.alias.keys():
+            return self.project.alias[cmd](self.project, reference, *ip[1:])
+        return self.command_set[cmd](self.project, reference, *ip[1:])
+
+    def run_script(self, lines:Iterable[str], reference:str="base", quiet:bool=False)->int:
+        """Executes a command per line (empty lines and lines starting with # are skipped), threading the reference through.
+        The project is saved once at the end; if a command fails the script stops and nothing is saved. Output of the
+        commands is discarded if var:quiet is set. Returns the exit code: 0 on success, 1 if a command failed and 2 if the
+        script is invalid (unknown commands or commands which reload the project), in which case nothing is executed."""
+        logging.info(f"script at : {datetime.today()}, Version: {VERSION}")
+        commands:List[Tuple[int, List[str]]]=[]
+        for n, line in enumerate(lines, 1):
+            if line.strip()=="" or line.strip().startswith("#"):
+                continue
+            ip=split_command(line.strip())
+            if not self.exists(ip[0].lower()):
+                print(f"line {n}: {ip[0]} does not exist", file=sys.stderr)
+                return 2
+            if ip[0].lower() in SCRIPT_FORBIDDEN:
+                print(f"line {n}: {ip[0]} can not be used in scripts", file=sys.stderr)
+                return 2
+            commands.append((n, ip))
+        self.project.defer_save=True
+        try:
+            for n, ip in commands:
+                if ip[0].lower()=="quit":
+                    break
+                try:
+                    with contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+                        reference=self.execute(ip, reference)
+                except Exception as e:
+                    logging.warning(f"script failed at line {n}: {e}")
+                    print(f"line {n}: {' '.join(ip)}: {e}", file=sys.stderr)
+                    print("Nothing was saved", file=sys.stderr)
+                    return 1
+        finally:
+            self.project.defer_save=False
+            self.perf.save()
+        self.project.save()
+        self.project.latex.wait()
+        return 0
+
     def build_ChronoProject(self, s:ChronoSchedule=None, path:Optional[str]=None)->None:
         """ Builds a ChronoProject from a given path. """
         if path == None: path=self.path
@@ -2099,11 +2320,14 @@ class ChronoClient:
         if not s==None: p.set_schedule(s)
         for note in d["todo"]:
             p.todo.append(ChronoNote(note["text"], datetime.fromisoformat(note["datetime"])))
+        changed:List[str]=[] # days filled from the schedule
         for day in d["days"].values():
             events=[ChronoEvent(start=event["start"], end=event["end"], what=event["what"], tags=event["tags"]) for event in day["events"]]
             sport={sport:day["sport"][sport] for sport in day["sport"].keys()}
             p.add_day(ChronoDay(events=events, input_date=day["date"]))
-            p.days[day["date"]].functions=day["functions"]
+            if len(p.days[day["date"]].events)!=len(day["events"]): changed.append(day["date"])
+            for function_name, function_value in day["functions"].items():
+                p.days[day["date"]].add_function(function_name, function_value)
             for run in sport["runs"]:
                 p.days[day["date"]].add_run(ChronoRunningEvent(run["time"],run["distance"],time_from_str(run["start_time"])))
             for situp in sport["situps"]:
@@ -2112,8 +2336,12 @@ class ChronoClient:
                 p.days[day["date"]].add_plank(ChronoPlankEvent(plank["time"],time_from_str(plank["start_time"])))
             for pushup in sport["pushups"]:
                 p.days[day["date"]].add_pushup(ChronoPushUpEvent(pushup["times"],pushup["mults"],time_from_str(pushup["start_time"])))
-            p.days[day["date"]].sleep=day["sleep"]
+            p.days[day["date"]].set_sleep(day["sleep"], day.get("sleep_start", ""))
             p.days[day["date"]].update_after_run()   
+        p.load_rollups(changed)
+        if self.project!=None:
+            p.lock=self.project.lock # threads waiting for the old project continue with this one
+            p.jobs=self.project.jobs # running analyses stay listed and collectable
         self.project=p
         self.project.sevents=[ChronoTime(sevent["tdate"], start=sevent["start"], what=sevent["what"], tags=sevent["tags"]) for sevent in d["sevents"]]
         self.add_commands()
@@ -2162,7 +2390,349 @@ def check_in_timeframe(tf:Tuple[time, time], event:ChronoEvent)->bool:
     return (tf[0]<= event.start and event.start < tf[1]) or (tf[0]< event.end and event.end <= tf[1])\
             or (event.start <= tf[0] and tf[0]<event.end) or (event.start < tf[1] and tf[1]<=event.end)
 
+def fetch_sleep(project:ChronoProject, start:str, stop:str, refresh:bool=False)->Generator[Tuple[str, str, SleepData], None, None]:
+    """The oura nights in [var:start, var:stop] as (first, last, nights) chunks (see OuraClient.iter_sleep). The chunks are fetched
+    concurrently while the caller processes the previous ones; a progress line is printed for multiple chunks."""
+    client=OuraClient(project.settings["oura_key"], project.settings.get("oura_url", BASE_URL), provisional_days=SYNC_PROVISIONAL_DAYS,
+                      workers=project.settings.get("oura_workers", WORKERS))
+    chunk_days=project.settings.get("oura_chunk_days", CHUNK_DAYS)
+    total=len(chunks(start, stop, chunk_days))
+    try:
+        for i, chunk in enumerate(client.iter_sleep(start, stop, chunk_days, refresh)):
+            if total>1: print(f"\rFetched {i+1}/{total} chunks ({chunk[0]} - {chunk[1]})", end="", flush=True)
+            yield chunk
+    finally:
+        if total>1: print()
+        client.close()
+
+def insert_night(project:ChronoProject, key:str, night:Tuple[str, str, str])->None:
+    """Adds the events of the oura night (bedtime_start, bedtime_end, sleep_phase_5_min) ending on var:key. Missing days are created."""
+    events=sleep_to_events(datetime.fromisoformat(night[0]), night[2])
+    for day_key in set([key]+[d.isoformat() for d, _ in events]):
+        if not day_key in project.days.keys(): project.add_day(ChronoDay([],day_key))
+    for d, day_events in groupby(events, key=lambda x:x[0]):
+        project.days[d.isoformat()].add_events([event for _, event in day_events])
+    project.days[key].set_sleep(night[2], night[0])
+
+def remove_night(project:ChronoProject, key:str)->None:
+    """Removes the events of the oura night ending on var:key. They are found by the span of the night (see insert_night)."""
+    if not key in project.days.keys() or project.days[key].sleep=="" or (offset:=project.get_sleep_start(project.days[key]))==None:
+        return
+    day=project.days[key]
+    bounds:Dict[date, Tuple[time, time]]={}
+    for d, event in sleep_to_events(datetime.combine(day.date, time(0))+timedelta(minutes=offset), day.sleep):
+        bounds[d]=(min(bounds[d][0], event.start), max(bounds[d][1], event.end)) if d in bounds.keys() else (event.start, event.end)
+    for d, (start, end) in bounds.items():
+        if d.isoformat() in project.days.keys():
+            other=project.days[d.isoformat()]
+            other.set_events([e for e in other.events if not ("ouras" in e.tags and start<=e.start and e.end<=end)])
+    day.set_sleep("", "")
+
+def update_night(project:ChronoProject, state:SleepSyncState, key:str, night:Optional[Tuple[str, str, str]])->None:
+    """Replaces the oura night ending on var:key by var:night (None only removes it) and records it in var:state."""
+    remove_night(project, key)
+    if night!=None:
+        insert_night(project, key, night)
+        state.nights[key]=night_hash(night)
+    else:
+        state.nights.pop(key, None)
+
+def submit_latex(project:ChronoProject, name:str, document:str, output:str, files:List[str]=[],
+                 on_done:Optional[Callable[[str], None]]=None)->LatexJob:
+    """Builds var:document to var:output with the LatexRunner of var:project and prints the job id (see latexjobs)."""
+    job=project.latex.submit(name, document, output, files, on_done)
+    print(f"LaTeX job {job.id}: {output}")
+    return job
+
+def write_grids(name:str, grids:List[SlotGrid], output:str, scheme:Dict[str, str])->bool:
+    """Writes var:grids to var:name.csv or var:name.html if var:output is csv or html. False if var:output is pdf."""
+    if output=="pdf":
+        return False
+    if not output in ["csv", "html"]:
+        raise Exception(f"unknown output: {output}")
+    with open(name+"."+output, "w+", encoding="utf-8", newline="") as f:
+        if output=="csv": write_csv(f, grids)
+        else: write_html(f, grids, scheme)
+    print(f"Wrote {name}.{output}")
+    return True
+
+def open_pdf(project:ChronoProject, file:str)->None:
+    subprocess.Popen([project.settings["pdfpath"], file], shell=True)
+
+def sleep_to_events(bedtime_start:datetime, pattern_5_min:str)->List[Tuple[date, ChronoEvent]]:
+    """Turns the oura sleep phases (one character per 5 minutes starting at var:bedtime_start) into one ChronoEvent per
+    contiguous phase. Phases spanning midnight are split into [start,23:59] and [00:00,end]."""
+    rtn:List[Tuple[date, ChronoEvent]]=[]
+    css=bedtime_start # current sleep start
+    for phase, run in groupby(pattern_5_min):
+        cse=css+timedelta(minutes=5*len(list(run))) # current sleep end
+        while css<cse:
+            midnight=datetime.combine(css.date()+timedelta(days=1), time(0), tzinfo=css.tzinfo)
+            start, end=css.time().isoformat()[:5], ("23:59" if cse>=midnight else cse.time().isoformat()[:5])
+            if start<end:
+                rtn.append((css.date(), ChronoEvent(start, end, "sleep", ["all_sleep",get_sleep_phase(phase),"ouras","generated"])))
+            css=min(cse, midnight)
+    return rtn
+
 def delete_by_tag(project:ChronoProject, reference:str, tag:str, days:List[ChronoDay]):
     """Deletes all events with var:tag $\n$ tags."""
     for day in days:
-        day.events=[event for event in day.events if not tag in event.tags]
+        day.set_events([event for event in day.events if not tag in event.tags])
+
+def prepare_plot_stats(project:ChronoProject, reference:str, tags:str="mathe", r_str:str="7",interpolate:str="0", start_date:str="start", end_date:str="stop")->Dict[str, Any]:
+    assert not "sum" in tags
+    series=ChronoSeries.between(project, reference, tags.split(","), start_date, end_date, int(interpolate))
+    try:
+        tmp=project.date_from_str(reference)
+    except:
+        tmp=date.fromisocalendar(1900,1,1)
+    return {"tags":tags.split(","), "r":int(r_str), "series":series, "reference":series.index(tmp)}
+
+def render_plot_stats(data:Dict[str, Any])->None:
+    plt.clf()
+    #preperation
+    tags, r, series=data["tags"], data["r"], data["series"]
+    ticksi=5
+    n=series.n
+    xs=np.arange(n)
+    dates=series.dates
+
+    #plot tags+sum
+    ax=plt.subplot(111)
+    box = ax.get_position()
+    ax.set_position([box.x0, box.y0, box.width * 0.8, box.height])
+    for tag in series.ys.keys():
+        plt.plot(xs[r-1:], series.rolling(tag, r), label=tag)
+
+    #Calculate and plot weekday average
+    if n>0:
+        plt.plot(xs, series.weekday_profile(series.main_key()),"--",label="wda")
+    
+    #Mark "reference" with a *
+    if (d:=data["reference"])>=0:
+        if len(tags)>1:
+            plt.scatter([d], series.ys["sum"][d], label="Reference", marker="*", color="red", s=[70])
+        elif d>=r-1:
+            plt.scatter([d], series.rolling(tags[0], r)[d-r+1], label="Reference", marker="*", color="red", s=[70])
+    
+    #visuals
+    plt.legend(loc='center left', bbox_to_anchor=(1, 0.5))
+    if n<ticksi:
+        plt.xticks([i for i in range(n)], [dates[i].isoformat() for i in range(n)])
+    else:
+        plt.xticks([round((n-1)*i/(ticksi-1)) for i in range(ticksi)], [dates[round((n-1)*i/(ticksi-1))].isoformat() for i in range(ticksi)])
+    plt.xlabel("Days")
+    plt.ylabel("Quantity")
+    logging.info("Displaying plot ...")
+    show_plot("plot_stats")
+    logging.info("Plot closed")
+
+def prepare_heatmap(project:ChronoProject, reference:str, tag:str, start_date:str="start", end_date:str="stop")->Dict[str, Any]:
+    return heatmap_data(project, tag, reference, start_date, end_date)
+
+def render_heatmap(data:Dict[str, Any])->None:
+    draw_heatmap(data)
+    logging.info("Displaying heatmap ...")
+    show_plot("heatmap")
+    logging.info("Heatmap closed")
+
+def prepare_runplot(project:ChronoProject, reference:str, start_date:str="start", end_date:str="stop")->Tuple[List[int], List[float], List[float]]:
+    days = project.analysis_get_between(start_date, end_date, reference)
+    xs=[]
+    ys=[]#distance  
+    ysp=[]#pace
+    for i in range(len(days)):
+        lengths=sum([run.time for run in days[i].sport["runs"]])
+        distance=sum([run.distance for run in days[i].sport["runs"]])
+        pace=lengths/max(distance,1)
+        if distance > 0:
+            xs.append(i)
+            ys.append(distance)
+            ysp.append(pace)
+    return xs, ys, ysp
+
+def render_runplot(data:Tuple[List[int], List[float], List[float]])->None:
+    xs, ys, ysp=data
+    plt.close() # "Fix": 2 plots open, but one is empty
+    fig, ax1 = plt.subplots()
+
+    ax2 = ax1.twinx()
+
+    ax1.set_xlabel("Days")
+    ax1.set_ylabel("Distance")
+    ax2.set_ylabel("Pace")
+    ax1.scatter(xs,ys,label="Distance",color="b")
+    ax2.plot(xs,ysp,label="Pace",color="r")
+    ticks=get_pace_ticks(ysp)
+    ax2.set_yticks(ticks[0])
+    ax2.set_yticklabels(ticks[1])
+    fig.legend()
+    logging.info("Displaying plot ...")
+    show_plot("runplot") 
+    logging.info("Plot closed") 
+
+def prepare_run_path(project:ChronoProject, reference:str, start:str="start", stop:str="stop")->Tuple[List[float], List[float]]:
+    days = project.analysis_get_between(start, stop, reference)
+    xs=[] #distance
+    ys=[] #time  
+    for i in range(len(days)):
+        lengths=sum([run.time for run in days[i].sport["runs"]])
+        distance=sum([run.distance for run in days[i].sport["runs"]])
+        pace=lengths/max(distance,1)
+        if distance > 0:
+            xs.append(distance)
+            ys.append(pace)
+    return xs, ys
+
+def render_run_path(data:Tuple[List[float], List[float]])->None:
+    xs, ys=data
+    plt.close() # "Fix": 2 plots open, but one is empty
+    fig, ax = plt.subplots()
+    line, = ax.plot([], [], lw=2)
+    ax.set_xlim(0.9*min(xs),1.1*max(xs))
+    ax.set_ylim(0.9*min(ys),1.1*max(ys))
+    ticks=get_pace_ticks(ys)
+    ax.set_yticks(ticks[0])
+    ax.set_yticklabels(ticks[1])
+
+    def init():
+        line.set_data([], [])
+        return line,
+
+    def animate(i, xs, ys):
+        i=i%len(xs)
+        line.set_data(xs[:i], ys[:i])
+        ax.set_title(f"{i}/{len(xs)}")
+        return line,    
+
+    anim = animation.FuncAnimation(fig, lambda x: animate(x,xs,ys), init_func=init,
+                           frames=len(xs)-1, interval=100, blit=False)
+
+    plt.grid(True)
+    logging.info("Displaying plot ...")
+    show_plot("run_path", anim)
+    logging.info("Plot closed") 
+
+def sync_fftplot(project:ChronoProject, reference:str, tag:str, min_period_length:str="2", max_period_length:str="31", start:str="start", stop:str="stop")->None:
+    MSSH.c_fill_empty_days(project,reference,start,stop)
+
+def prepare_fftplot(project:ChronoProject, reference:str, tag:str, min_period_length:str="2", max_period_length:str="31", start:str="start", stop:str="stop")->Dict[str, Any]:
+    days = project.analysis_get_between(start, stop, reference)
+    n=len(days)
+    tags=project.get_tags()
+    index_offsets:List[int]=[0,n-1]    
+    if tag in tags:  
+        for i in range(0,n):
+            if tag in days[i].get_tags():
+                index_offsets[0]=i
+                break
+        for i in range(1,n+1):
+            if (tag in days[n-i].get_tags()):
+                index_offsets[1]=n-i
+                break
+    else:
+        for i in range(0,n):
+            if tag in days[i].functions.keys():
+                index_offsets[0]=i
+                break
+        for i in range(1,n+1):
+            if tag in days[n-i].functions.keys():
+                index_offsets[1]=n-i
+                break
+    if index_offsets[0]>0:
+        logging.info(f"Ignored the first {index_offsets[0]} day(s)")
+    if index_offsets[1]>0:
+        logging.info(f"Ignored the last {index_offsets[1]} day(s)")
+    ys=[]
+    #populate ys
+    for day in days[index_offsets[0]:index_offsets[1]]:
+        if tag in day.functions.keys():
+            ys.append(day.functions[tag])
+        else:
+            ys.append(get_time(day, tag))
+    if len(ys)>0:avg=sum(ys)/len(ys)
+    else: avg=0
+    ys=[y-avg for y in ys]
+    N = index_offsets[1]-index_offsets[0]
+    T = 1
+    y = np.array(ys)
+    yf = scipy_fft.fft(y)
+    xf = [1/v if v!=0 else 2*(n+1) for v in list(scipy_fft.fftfreq(N, T)[:N//2])]
+    if max_period_length=="max": max_period_length=str(n+1)
+    return {"xf":xf, "amplitude":(2.0/N * np.abs(yf[:N//2])), "N":N, "xlim":(int(min_period_length),int(max_period_length)),
+            "title":f"fft({tag}):[{days[index_offsets[0]].date.isoformat()},{days[index_offsets[1]].date.isoformat()}]"}
+
+def render_fftplot(data:Dict[str, Any])->None:
+    plt.plot(data["xf"], data["amplitude"],label=f"Influence(1/f), {data['N']} data points")
+    plt.scatter(data["xf"], data["amplitude"],marker="*",c="red")
+    plt.xlim(*data["xlim"])
+    plt.grid()
+    plt.title(data["title"])
+    plt.legend()
+    show_plot("fftplot")
+
+def prepare_show_graph(project:ChronoProject, reference:str, start:str="start", end:str="stop")->List[Tuple["nx.Graph", Dict[str, Any]]]:
+    """The connected components of the tag graph and their layouts."""
+    G=project.get_tag_graph(start, end, reference)
+    rtn=[]
+    for cc in nx.connected_components(G):
+        sub_g=G.subgraph(cc).copy()
+        rtn.append((sub_g, nx.circular_layout(sub_g,scale=2)))
+    return rtn
+
+def render_show_graph(data:List[Tuple["nx.Graph", Dict[str, Any]]])->None:
+    for sub_g, pos in data:
+        plt.clf()
+        nx.draw(sub_g, pos, with_labels=True, edge_color="tab:red", node_size=300)
+        logging.info("Plotted a cc")
+        show_plot("display_graph_img")
+        logging.info("Plot closed")
+
+def sync_review_days(project:ChronoProject, reference:str, ndays:str, interpolate:str="3")->None:
+    MSSH.c_sync_sleep(project,"ref",(datetime.today().date()-timedelta(days=int(ndays)+1)).isoformat())
+
+def prepare_review_days(project:ChronoProject, reference:str, ndays:str, interpolate:str="3")->Dict[str, Any]:
+    assert len(project.settings["review_days"]["tags"])==9 #TODO: verbessern
+    n_days=int(ndays)
+    days=project.analysis_get_between("start","stop","ref")[-int(n_days)-1:-1]
+    fs=project.get_functions(days)
+    tags=project.settings["review_days"]["tags"]
+    ys={tag:[] for tag in tags}
+    normalizer={key:n_days*project.settings["review_days"]["normalizer"][key] for key in project.settings["review_days"]["normalizer"].keys()}
+    series=ChronoSeries(project, days, tags, int(interpolate))
+    for tag in tags:
+        ys[tag]=list(series.at(tag, [day.date for day in days]))
+        if tag in fs: normalizer[tag]+=len(days)
+    rollups=project.sync_rollups()
+    tags_sum={tag:sum(ys[tag]) if tag in fs or days==[] else rollups.tag_total(tag, days[0].date, days[-1].date)[0]/3600 for tag in ys.keys()}
+    return {"n_days":n_days, "tags":tags, "ys":ys, "normalizer":normalizer, "tags_sum":tags_sum,
+            "goals":project.settings["review_days"]["goals"], "goal_colors":project.settings["review_days"]["goal_colors"]}
+
+def render_review_days(data:Dict[str, Any])->None:
+    n_days, tags, ys, normalizer, tags_sum=data["n_days"], data["tags"], data["ys"], data["normalizer"], data["tags_sum"]
+    goals, goal_colors=data["goals"], data["goal_colors"]
+    fig, axs = plt.subplots(3, 3)
+    for i in range(9):
+        axs[i//3, i%3].plot(ys[tags[i]],label="Data")
+        axs[i//3, i%3].scatter([j for j in range(len(ys[tags[i]]))],ys[tags[i]],label="DataPoints",c="red",marker="*")
+        axs[i//3, i%3].plot([tags_sum[tags[i]]/max(normalizer[tags[i]],1) for _ in range(n_days)],label="Average")
+        axs[i//3, i%3].plot([goals[tags[i]] for _ in range(n_days)],label="Reference")
+        axs[i//3, i%3].set_title(tags[i],color=goal_colors[tags[i]][int(goals[tags[i]]<=tags_sum[tags[i]]/max(normalizer[tags[i]],1))])
+    if tags[i]=="weight":
+        axs[i//3, i%3].set_ylim((min([y for y in ys[tags[i]] if y >0])-1,max(max(ys[tags[i]])+1,goals[tags[i]])))
+    elif tags[i]=="all_sleep":
+        axs[i//3, i%3].set_ylim((min([y for y in ys[tags[i]] if y >0])-1,max(max(ys[tags[i]])+1,goals[tags[i]])))
+        axs[i//3, i%3].legend(loc=2,prop={'size': 6})
+    fig.tight_layout(pad=1.0)
+    show_plot("review_days")
+
+# analysis commands which can run in the background (see bg and jobs)
+PLOT_STATS=Analysis(prepare_plot_stats, render_plot_stats)
+HEATMAP=Analysis(prepare_heatmap, render_heatmap)
+RUNPLOT=Analysis(prepare_runplot, render_runplot)
+RUN_PATH=Analysis(prepare_run_path, render_run_path)
+FFTPLOT=Analysis(prepare_fftplot, render_fftplot, sync_fftplot)
+SHOW_GRAPH=Analysis(prepare_show_graph, render_show_graph)
+REVIEW_DAYS=Analysis(prepare_review_days, render_review_days, sync_review_days)
+ANALYSES:Dict[Callable, Analysis]={MSSH.c_plot_stats:PLOT_STATS, MSSH.c_heatmap:HEATMAP, MSSH.c_runplot:RUNPLOT, MSSH.c_run_path:RUN_PATH,
+                                   MSSH.c_fftplot:FFTPLOT, MSSH.c_display_graph_img:SHOW_GRAPH, MSSH.c_review_days:REVIEW_DAYS}
@@ -7,7 +7,10 @@ MSSH_COMMS={
     "mktime":MSSH.c_create_time,
     "days":MSSH.c_days,
     "mk":MSSH.c_mk,
+    "mkrange":MSSH.c_mk_range,
     "show":MSSH.c_show,
+    "latexjobs":MSSH.c_latex_jobs,
+    "jobs":MSSH.c_jobs,
     "times":MSSH.c_times,
     "generatedays":MSSH.c_gen_days,
     "clear":MSSH.c_clear,
@@ -37,6 +40,7 @@ MSSH_COMMS={
     "heatmap":MSSH.c_heatmap,
     "split": MSSH.c_split_project,
     "ourasleep": MSSH.c_oura_sleep,
+    "syncsleep": MSSH.c_sync_sleep,
     "getsleep": MSSH.c_get_sleep,
     "lastnightsleep":MSSH.c_last_sleep,
     "showruns":MSSH.c_show_run,
@@ -50,6 +54,7 @@ MSSH_COMMS={
     "exportsport": MSSH.c_export_sport,
     "exportweek": MSSH.c_exportweek,
     "exportcsv": MSSH.c_to_csv,
+    "exportparquet": MSSH.c_export_parquet,
     "aliases": MSSH.c_aliases,
     "runsum": MSSH.c_runsum,
     "heatmapsummary": MSSH.c_heatmap_summary,
@@ -76,9 +81,23 @@ MSSH_COMMS={
     "intelliref": MSSH.c_intelli_ref,
     "gblgetsplitforce": MSSH.c_gblf,
     "gbltreeview": MSSH.c_treeview,
+    "exportgbltree": MSSH.c_export_treeview,
     "fftplot": MSSH.c_fftplot,
+    "spectrum": MSSH.c_spectrum,
+    "query": MSSH.c_query,
+    "rollup": MSSH.c_rollup,
+    "sleepstats": MSSH.c_sleep_stats,
     "updatefunction":MSSH.c_set_function,
     "getfunction":MSSH.c_get_function,
     "reviewday":MSSH.c_review_days,
     "showsleepday":MSSH.c_show_sleep_day
-}
\ No newline at end of file
+}
+
+# commands which change the project, executed holding the project lock exclusively (see ChronoClient.execute)
+MSSH_MUTATING={
+    "setreference", "mkday", "mkevent", "mktime", "mk", "mkrange", "show", "generatedays", "clear", "clearfuture", "today",
+    "changeeventtime", "changeeventwhat", "changeeventtags", "changeevent", "deleteday", "deleteevent", "end",
+    "note", "deletenote", "deletenoteid", "deletenotes", "addrun", "addsitup", "addpushup", "addplank", "merge", "split",
+    "ourasleep", "syncsleep", "delrun", "delsitup", "delpushup", "delplank", "fillemptydays", "renametag", "deletetag",
+    "deletebytag", "mkeventdelta", "updatefunction", "reviewday", "fftplot"
+}
@@ -0,0 +1,59 @@
+import csv
+import gzip
+import io
+from typing import Any, Dict, IO, Iterable, List
+
+BUFFER_SIZE=1<<20
+
+TABLES:Dict[str, List[str]]={
+    "events":["date","what","tags","start","end"],
+    "times":["date","start","what","tags"],
+    "sport":["date","kind","start","time","distance","mult","times","mults"],
+    "functions":["date","function","value"],
+}
+
+
+def open_output(file:str, compress:bool=False, buffer_size:int=BUFFER_SIZE)->IO[str]:
+    """Opens var:file for writing csv with a var:buffer_size write buffer, gzip compressed iff var:compress."""
+    if compress:
+        return io.TextIOWrapper(io.BufferedWriter(gzip.GzipFile(file, "wb"), buffer_size), encoding="utf-8", newline="")
+    return open(file, "w", encoding="utf-8", newline="", buffering=buffer_size)
+
+
+def table_rows(table:str, day, times:Dict[str, List[Any]])->Iterable[List[Any]]:
+    """The rows of var:table for one ChronoDay. var:times contains additional ChronoTimes by date."""
+    d=day.date.isoformat()
+    if table=="events":
+        for event in day.get_slots():
+            yield [d, event.what, ";".join(event.tags), event.start.isoformat(), event.end.isoformat()]
+    elif table=="times":
+        for t in sorted(day.silent_events+times.get(d, []), key=lambda x:x.start):
+            yield [d, t.start.isoformat(), t.what, ";".join(t.tags)]
+    elif table=="sport":
+        for run in day.sport["runs"]:
+            yield [d, "run", run.start_time.isoformat(), run.time, run.distance, "", "", ""]
+        for situp in day.sport["situps"]:
+            yield [d, "situps", situp.start_time.isoformat(), situp.time, "", situp.mult, "", ""]
+        for plank in day.sport["planks"]:
+            yield [d, "plank", plank.start_time.isoformat(), plank.time, "", "", "", ""]
+        for pushup in day.sport["pushups"]:
+            yield [d, "pushups", pushup.start_time.isoformat(), "", "", "", ";".join(map(str, pushup.times)), ";".join(map(str, pushup.mults))]
+    elif table=="functions":
+        for name, value in day.functions.items():
+            yield [d, name, value]
+    else:
+        raise Exception(f"unknown table: {table}")
+
+
+def export_csv(days:Iterable, file:str, table:str="events", times:Dict[str, List[Any]]={}, compress:bool=False)->int:
+    """Writes var:table (see TABLES) of var:days to var:file, with a header. The days are consumed one by one,
+    so only the write buffer is held in memory. Returns the number of rows."""
+    n=0
+    with open_output(file, compress) as f:
+        writer=csv.writer(f)
+        writer.writerow(TABLES[table])
+        for day in days:
+            for row in table_rows(table, day, times):
+                writer.writerow(row)
+                n+=1
+    return n
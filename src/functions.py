@@ -0,0 +1,99 @@
+from datetime import date
+from typing import Dict, List, Optional
+import numpy as np
+
+
+class FunctionStore:
+    """Dense storage of all functions of a ChronoProject. Each function name owns one float array indexed
+    by the ordinal of the date (relative to origin) and a mask telling which values are present."""
+
+    origin:int
+    capacity:int
+    values:Dict[str, np.ndarray]
+    mask:Dict[str, np.ndarray]
+
+    def __init__(self):
+        """Constructor: FunctionStore. The arrays are allocated on the first set."""
+        self.origin=0
+        self.capacity=0
+        self.values=dict()
+        self.mask=dict()
+
+    def _grow(self, ordinal:int)->None:
+        """Makes sure ordinal can be stored, reallocating all arrays if necessary."""
+        if self.capacity==0:
+            self.origin, self.capacity=ordinal-32, 64
+            return
+        if self.origin<=ordinal<self.origin+self.capacity:
+            return
+        slack=max(64, self.capacity//2)
+        origin=min(self.origin, ordinal-slack)
+        end=max(self.origin+self.capacity, ordinal+slack+1)
+        offset=self.origin-origin
+        for name in self.values.keys():
+            values=np.zeros(end-origin)
+            mask=np.zeros(end-origin, dtype=bool)
+            values[offset:offset+self.capacity]=self.values[name]
+            mask[offset:offset+self.capacity]=self.mask[name]
+            self.values[name]=values
+            self.mask[name]=mask
+        self.origin, self.capacity=origin, end-origin
+
+    def set(self, d:date, function_name:str, function_value:float)->None:
+        """Sets function_name(d)."""
+        self._grow(d.toordinal())
+        if not function_name in self.values.keys():
+            self.values[function_name]=np.zeros(self.capacity)
+            self.mask[function_name]=np.zeros(self.capacity, dtype=bool)
+        i=d.toordinal()-self.origin
+        self.values[function_name][i]=function_value
+        self.mask[function_name][i]=True
+
+    def clear_day(self, d:date)->None:
+        """Removes all function values of d."""
+        i=d.toordinal()-self.origin
+        if 0<=i<self.capacity:
+            for name in self.values.keys():
+                self.values[name][i]=0
+                self.mask[name][i]=False
+
+    def get(self, d:date, function_name:str)->Optional[float]:
+        """Returns function_name(d) or None if it is not set."""
+        i=d.toordinal()-self.origin
+        if function_name in self.values.keys() and 0<=i<self.capacity and self.mask[function_name][i]:
+            return float(self.values[function_name][i])
+        return None
+
+    def names(self)->List[str]:
+        """All function names that were ever set."""
+        return list(self.values.keys())
+
+    def window(self, function_name:str, start:date, stop:date)->np.ndarray:
+        """Values and mask of function_name on [start,stop]. Unknown dates are missing."""
+        n=(stop-start).days+1
+        values=np.zeros(n)
+        mask=np.zeros(n, dtype=bool)
+        if function_name in self.values.keys() and n>0:
+            lo=start.toordinal()-self.origin
+            a, b=max(lo, 0), min(lo+n, self.capacity)
+            if a<b:
+                values[a-lo:b-lo]=self.values[function_name][a:b]
+                mask[a-lo:b-lo]=self.mask[function_name][a:b]
+        return np.stack((values, mask))
+
+    def get_range(self, function_name:str, start:date, stop:date, interpolate:int=0)->np.ndarray:
+        """Returns function_name on every day of [start,stop]. If interpolate>0 missing values are replaced by the
+        average of the values present at most interpolate-1 days before / after, otherwise (or without neighbours) by 0."""
+        n=(stop-start).days+1
+        if n<=0: return np.zeros(0)
+        w=max(interpolate-1, 0)
+        data=self.window(function_name, date.fromordinal(start.toordinal()-w), date.fromordinal(stop.toordinal()+w))
+        values, mask=data[0], data[1]
+        present=mask[w:w+n].astype(bool)
+        if w==0:
+            return np.where(present, values[w:w+n], 0.0)
+        kernel=np.ones(2*w+1)
+        kernel[w]=0
+        num=np.convolve(values*mask, kernel, mode="valid")
+        den=np.convolve(mask, kernel, mode="valid")
+        return np.where(present, values[w:w+n], num/np.maximum(den, 1))
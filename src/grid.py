@@ -0,0 +1,128 @@
+import csv
+import heapq
+import html
+from datetime import time
+from typing import Dict, IO, List, Optional, Tuple
+
+from src.atoms import ChronoEvent
+from src.helper import what_or_none
+
+Slot=Tuple[int, int]
+
+
+def seconds(t:time)->int:
+    return t.hour*3600+t.minute*60+t.second
+
+
+def label(s:int)->str:
+    """HH:MM of var:s seconds after midnight (24:00 for the end of the day)."""
+    return f"{s//3600:02d}:{s//60%60:02d}"
+
+
+def poi_slots(columns:List[List[ChronoEvent]])->List[Slot]:
+    """The slots between consecutive starts / ends of all events."""
+    pois=sorted({seconds(t) for events in columns for event in events for t in (event.start, event.end)})
+    return [(pois[i], pois[i+1]) for i in range(len(pois)-1)]
+
+
+def fixed_slots(columns:List[List[ChronoEvent]], resolution:int)->List[Slot]:
+    """Slots of var:resolution minutes from the first start to the last end of all events (rounded to the resolution)."""
+    times=[seconds(t) for events in columns for event in events for t in (event.start, event.end)]
+    if times==[]: return []
+    step=resolution*60
+    first, last=min(times)//step*step, -(-max(times)//step)*step
+    return [(s, s+step) for s in range(first, last, step)]
+
+
+def sweep(events:List[ChronoEvent], slots:List[Slot])->List[Optional[ChronoEvent]]:
+    """For every slot (sorted, not overlapping) the first event of var:events (in list order) which overlaps it, i.e.
+    start<slot end and end>slot start. Walks the events sorted by start once, keeping the started events in a heap
+    by list index; events which ended are dropped lazily when they reach the top."""
+    order=sorted(range(len(events)), key=lambda i: events[i].start)
+    bounds=[(seconds(events[i].start), seconds(events[i].end)) for i in range(len(events))]
+    active:List[int]=[]
+    rtn:List[Optional[ChronoEvent]]=[]
+    k=0
+    for slot_start, slot_end in slots:
+        while k<len(order) and bounds[order[k]][0]<slot_end:
+            heapq.heappush(active, order[k])
+            k+=1
+        while active!=[] and bounds[active[0]][1]<=slot_start:
+            heapq.heappop(active)
+        rtn.append(events[active[0]] if active!=[] else None)
+    return rtn
+
+
+class SlotGrid:
+    """The events of some columns (e.g. the days of a week) on common time slots: cells[row][column] is the first event
+    of the column overlapping slots[row] or None. Used by exportweek and exportschedule, which write it as LaTeX, csv
+    or html."""
+
+    title:str
+    columns:List[str]
+    slots:List[Slot]
+    cells:List[List[Optional[ChronoEvent]]]
+
+    def __init__(self, title:str, columns:List[str], slots:List[Slot], cells:List[List[Optional[ChronoEvent]]]):
+        """Constructor: SlotGrid."""
+        self.title=title
+        self.columns=columns
+        self.slots=slots
+        self.cells=cells
+
+    @staticmethod
+    def build(title:str, columns:List[str], events:List[List[ChronoEvent]], resolution:int=0, slots:Optional[List[Slot]]=None)->"SlotGrid":
+        """Builds the grid of var:events (one list per column). The slots lie between the starts / ends of all events,
+        or are var:resolution minutes long if var:resolution>0. var:slots overrides both."""
+        if slots==None:
+            slots=fixed_slots(events, resolution) if resolution>0 else poi_slots(events)
+        by_column=[sweep(column, slots) for column in events]
+        return SlotGrid(title, columns, slots, [[by_column[c][r] for c in range(len(columns))] for r in range(len(slots))])
+
+    def compact(self)->"SlotGrid":
+        """Merges consecutive slots with the same events."""
+        slots:List[Slot]=[]
+        cells:List[List[Optional[ChronoEvent]]]=[]
+        for slot, row in zip(self.slots, self.cells):
+            if cells!=[] and slots[-1][1]==slot[0] and all(a is b for a, b in zip(cells[-1], row)):
+                slots[-1]=(slots[-1][0], slot[1])
+            else:
+                slots.append(slot)
+                cells.append(row)
+        return SlotGrid(self.title, self.columns, slots, cells)
+
+    def slot_labels(self)->List[str]:
+        return [f"{label(s)}-{label(e)}" for s, e in self.slots]
+
+    def latex_data(self, scheme:Dict[str, str])->List[List[str]]:
+        """The rows for write_table (including the header)."""
+        return [["Timeslots"]+self.columns]+[[name]+[what_or_none([] if event==None else [event], scheme) for event in row]
+                                             for name, row in zip(self.slot_labels(), self.cells)]
+
+
+def write_csv(f:IO[str], grids:List[SlotGrid])->None:
+    """Writes the grids as one csv table with the columns table, slot and one per grid column."""
+    writer=csv.writer(f)
+    for i, grid in enumerate(grids):
+        if i==0: writer.writerow(["table", "slot"]+grid.columns)
+        for name, row in zip(grid.slot_labels(), grid.cells):
+            writer.writerow([grid.title, name]+["" if event==None else event.what for event in row])
+
+
+def write_html(f:IO[str], grids:List[SlotGrid], scheme:Dict[str, str])->None:
+    """Writes the grids as html tables, colored like the LaTeX export."""
+    f.write("<!DOCTYPE html>\n<html>\n<head><meta charset=\"utf-8\"><style>table{border-collapse:collapse;margin-bottom:2em}"
+            "td,th{border:1px solid #999;padding:2px 6px}</style></head>\n<body>\n")
+    for grid in grids:
+        f.write(f"<table>\n<caption>{html.escape(grid.title)}</caption>\n")
+        f.write("<tr><th>Timeslots</th>"+"".join(f"<th>{html.escape(c)}</th>" for c in grid.columns)+"</tr>\n")
+        for name, row in zip(grid.slot_labels(), grid.cells):
+            f.write(f"<tr><td>{name}</td>")
+            for event in row:
+                if event==None: f.write("<td></td>")
+                else:
+                    color=next((scheme[tag] for tag in event.tags if tag in scheme.keys()), scheme.get("default", "black"))
+                    f.write(f"<td style=\"color:{html.escape(color)}\">{html.escape(event.what)}</td>")
+            f.write("</tr>\n")
+        f.write("</table>\n")
+    f.write("</body>\n</html>\n")
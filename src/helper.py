@@ -5,7 +5,7 @@ from functools import reduce
 from datetime import datetime, time
 from inspect import signature
 from collections.abc import Iterable
-import matplotlib.pyplot as plt
+from src.render import plt
 from math import floor
 from datetime import timedelta
 
@@ -100,18 +100,6 @@ def get_nargs(f:Callable[[Any],Any])->int:
     sig=signature(f)
     return len(sig.parameters)
 
-def get_slice_start(args:List[str])->int:
-    """Helper function specifically to be used by cursed_get_lambda."""
-    indis=[int(arg.replace("$","")) for arg in args if "$" in arg and "$N" not in arg]
-    return sum(indis)+2
-
-def cursed_get_lambda(alias:str,cmds=Dict[str, Callable[[Any],Any]])->Callable[[Any],Any]:
-    """Turns an alias (see alias documentation) into a function. Works with multiple commands. Either cursed or genius, edit: definitely cursed."""
-    get_cmds=(alias.split(" |> ")) #Inspired by f#
-    splitcmds=[split_command(cmd) for cmd in get_cmds]
-    return (lambda *xs: reduce(lambda acc, sc: cmds[sc[0].lower()](xs[0],acc,*get_two([arg if (not "$" in arg)\
-         else (xs[int(arg.replace("$",""))+1] if (not "$N" in arg) else xs[slice(get_slice_start(sc[1:]),None)]) for arg in sc[1:]])), splitcmds, xs[1]))
-
 def time_from_str(str_time:str)->time:
     """Returns the time object associated with the given string."""
     return time(int(str_time[0:2]),int(str_time[3:5]))
@@ -154,6 +142,10 @@ def get_pace_ticks(ysp:List[float],n:int=5)->Tuple[List[float],List[str]]:
 def heatmap(project, tag:str, reference:str, start_date:str="start", end_date:str="stop", title=""):
     """Draws a heat map for a specific var:tag with at most 15 vertical labels with data from 
     [var:start_date,var:end_date]."""
+    draw_heatmap(heatmap_data(project, tag, reference, start_date, end_date, title))
+
+def heatmap_data(project, tag:str, reference:str, start_date:str="start", end_date:str="stop", title="")->Dict[str, Any]:
+    """Computes the heat map drawn by heatmap without touching matplotlib."""
     if title=="": title="Heatmap: " + tag
     days=project.analysis_get_between(start_date,end_date,reference)
     events=list(filter(lambda a: tag in a[0].tags,
@@ -180,12 +172,17 @@ def heatmap(project, tag:str, reference:str, start_date:str="start", end_date:st
         for i, t in enumerate(timeframes):
             if t[0]<=estart<=t[1] or t[0]<=eend<=t[1] or estart<=t[0]<=eend or estart<=t[1]<=eend:
                     heatmap[i][event[1].weekday()]+=1
-    plt.imshow(heatmap, cmap="hot",interpolation="nearest", aspect=10/steps)
-    plt.title(title)
+    return {"heatmap":heatmap, "title":title, "steps":steps,
+            "yticks":([floor(i*(steps-1)/yt) for i in range(yt)], [timeframes[floor(i*(steps-1)/yt)][0].time() for i in range(yt)])}
+
+def draw_heatmap(data:Dict[str, Any])->None:
+    """Draws a heat map computed by heatmap_data."""
+    plt.imshow(data["heatmap"], cmap="hot",interpolation="nearest", aspect=10/data["steps"])
+    plt.title(data["title"])
     plt.xticks([i for i in range(7)], map(lambda x: x[:3],WEEKDAYS))
-    plt.yticks([floor(i*(steps-1)/yt) for i in range(yt)], [timeframes[floor(i*(steps-1)/yt)][0].time() for i in range(yt)])
+    plt.yticks(*data["yticks"])
     plt.colorbar()
-    plt.get_current_fig_manager().set_window_title(title)
+    plt.get_current_fig_manager().set_window_title(data["title"])
 
 def create_db(cur:sqlite3.Cursor):
     """Create database (sqlite)."""
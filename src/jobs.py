@@ -0,0 +1,102 @@
+import itertools
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+
+class Analysis:
+    """An analysis command split in two: var:prepare computes the data from the project and var:render draws it. Only
+    prepare reads the project, so it can run in a worker (see JobManager) while render stays on the thread collecting
+    the job, since matplotlib is not thread safe. var:sync runs before prepare on the calling thread for steps which
+    change the project (e.g. filling in missing days). All three get the arguments of the command."""
+
+    def __init__(self, prepare:Callable[..., Any], render:Callable[[Any], None], sync:Optional[Callable[..., Any]]=None):
+        """Constructor: Analysis."""
+        self.prepare=prepare
+        self.render=render
+        self.sync=sync
+
+    def run(self, project:Any, reference:str, *args:str)->None:
+        """Runs the command in the foreground."""
+        if self.sync!=None: self.sync(project, reference, *args)
+        self.render(self.prepare(project, reference, *args))
+
+
+class AnalysisJob:
+    """An Analysis running in the background. The result of var:future is passed to var:render by JobManager.collect."""
+
+    def __init__(self, id:int, command:str, future:Future, render:Callable[[Any], None]):
+        """Constructor: AnalysisJob."""
+        self.id=id
+        self.command=command
+        self.future=future
+        self.render=render
+        self.collected=False
+
+    def status(self)->str:
+        if self.collected: return "collected"
+        if not self.future.done(): return "running"
+        return "failed" if self.future.exception()!=None else "done"
+
+
+class JobManager:
+    """Prepares analyses in var:workers threads. The workers read a detached copy of the project taken when the job is
+    submitted, so they do not hold the project lock and never block commands which change the project."""
+
+    def __init__(self, workers:int=2):
+        """Constructor: JobManager."""
+        self.workers=workers
+        self.pool:Optional[ThreadPoolExecutor]=None
+        self.jobs:Dict[int, AnalysisJob]=dict()
+        self.ids=itertools.count(1)
+        self.lock=threading.Lock()
+
+    def submit(self, command:str, analysis:Analysis, project:Any, reference:str, args:List[str])->AnalysisJob:
+        """Starts var:analysis (the command var:command) with var:args. Its sync step and the copy of var:project (see
+        ChronoProject.detached) run right away, so the caller has to hold the project lock exclusively if there is one."""
+        if analysis.sync!=None: analysis.sync(project, reference, *args)
+        view=project.detached()
+
+        def prepare()->Any:
+            return analysis.prepare(view, reference, *args)
+        with self.lock:
+            if self.pool==None:
+                self.pool=ThreadPoolExecutor(max_workers=max(self.workers, 1), thread_name_prefix="analysis")
+            id=next(self.ids)
+            job=AnalysisJob(id, " ".join([command]+args), self.pool.submit(prepare), analysis.render)
+            self.jobs[id]=job
+
+        def finished(future:Future)->None:
+            if future.exception()!=None:
+                logging.warning(f"Job {id} ({job.command}): {future.exception()}")
+                print(f"Job {id} ({job.command}) failed")
+            else:
+                print(f"Job {id} ({job.command}) done, show it with: jobs collect {id}")
+        job.future.add_done_callback(finished)
+        return job
+
+    def list(self)->List[AnalysisJob]:
+        with self.lock:
+            return list(self.jobs.values())
+
+    def collect(self, id:int)->None:
+        """Renders the result of the finished job var:id on the calling thread. Raises if the job failed or is still
+        running, so collecting never blocks the client."""
+        if not id in self.jobs.keys():
+            raise Exception(f"no job {id}")
+        job=self.jobs[id]
+        if job.collected:
+            raise Exception(f"job {id} was already collected")
+        if not job.future.done():
+            raise Exception(f"job {id} is still running")
+        try:
+            data=job.future.result()
+        finally:
+            job.collected=True
+        job.render(data)
+
+    def shutdown(self)->None:
+        if self.pool!=None:
+            self.pool.shutdown(wait=True)
+            self.pool=None
@@ -0,0 +1,190 @@
+import hashlib
+import io
+import itertools
+import json
+import logging
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from glob import glob
+from os import makedirs, path, remove
+from typing import Callable, Dict, List, Optional
+
+from src.helper import get_color, write_table
+
+
+def day_hash(day, scheme:Dict[str, str])->str:
+    """Identifies everything the LaTeX fragment of a ChronoDay depends on (before merging)."""
+    content=[day.date.isoformat(), [event.to_dict() for event in day.events],
+             [[t.start.isoformat(), t.what] for t in day.silent_events], scheme]
+    return hashlib.sha1(json.dumps(content, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def day_fragment(day, scheme:Dict[str, str])->str:
+    """The LaTeX section of a ChronoDay (merges the day). Empty if the day has no events."""
+    if day.events==[]:
+        return ""
+    day.merge()
+    f=io.StringIO()
+    f.write("\\section*{"+f"{day.date}"+ "}\n")
+    f.write("\\hypertarget{"+f"{day.date}"+"}{}\n")
+    slots=day.get_slots()
+    data=[[f"{slot.start.isoformat()}-{slot.end.isoformat()}", "\\textcolor{"+get_color(scheme, slot.tags)+"}{"+f"{slot.what}"+"}"]for slot in slots]
+    write_table(f, [2, len(slots)], data=data)
+    write_table(f, [2, len(day.silent_events)], data=[[time.start.isoformat(), time.what] for time in day.silent_events])
+    f.write("\\clearpage")
+    return f.getvalue()
+
+
+class FragmentCache:
+    """The LaTeX fragments of ChronoDays, cached in var:directory as <date>_<hash>.tex (see day_hash). A day is only
+    merged and rendered again if it changed. The hash of the last document built is kept in build.json."""
+
+    def __init__(self, directory:str):
+        """Constructor: FragmentCache."""
+        self.directory=directory
+        self.hits=0
+        self.misses=0
+
+    def fragment(self, day, scheme:Dict[str, str])->str:
+        """The (cached) fragment of var:day."""
+        file=path.join(self.directory, f"{day.date.isoformat()}_{day_hash(day, scheme)}.tex")
+        if path.exists(file):
+            self.hits+=1
+            with open(file, "r", encoding="utf-8") as f:
+                return f.read()
+        self.misses+=1
+        for old in glob(path.join(self.directory, f"{day.date.isoformat()}_*.tex")):
+            remove(old)
+        fragment=day_fragment(day, scheme)
+        makedirs(self.directory, exist_ok=True)
+        with open(file, "w+", encoding="utf-8") as f:
+            f.write(fragment)
+        return fragment
+
+    def prune(self, days:List[str])->None:
+        """Removes the fragments of all days not in var:days (isoformatted)."""
+        keep=set(days)
+        for file in glob(path.join(self.directory, "*_*.tex")):
+            if path.basename(file).split("_")[0] not in keep:
+                remove(file)
+
+    def last_build(self, output:str)->Optional[str]:
+        """The hash of the document last built to var:output."""
+        if not path.exists(file:=path.join(self.directory, "build.json")):
+            return None
+        with open(file, "r", encoding="utf-8") as f:
+            return json.load(f).get(output)
+
+    def set_build(self, output:str, document_hash:str)->None:
+        builds:Dict[str, str]={}
+        if path.exists(file:=path.join(self.directory, "build.json")):
+            with open(file, "r", encoding="utf-8") as f:
+                builds=json.load(f)
+        builds[output]=document_hash
+        makedirs(self.directory, exist_ok=True)
+        with open(file, "w+", encoding="utf-8") as f:
+            json.dump(builds, f, indent=4)
+
+
+def document_hash(document:str)->str:
+    return hashlib.sha1(document.encode("utf-8")).hexdigest()
+
+
+class LatexJob:
+    """Handle of a document submitted to a LatexRunner."""
+
+    def __init__(self, id:int, name:str, output:str, future:Future):
+        """Constructor: LatexJob."""
+        self.id=id
+        self.name=name
+        self.output=output
+        self.future=future
+
+    def done(self)->bool:
+        return self.future.done()
+
+    def result(self, timeout:Optional[float]=None)->str:
+        """Waits for the job and returns the path of the pdf. Raises if the build failed."""
+        return self.future.result(timeout)
+
+    def status(self)->str:
+        if not self.future.done(): return "running"
+        return "failed" if self.future.exception()!=None else "done"
+
+
+class LatexRunner:
+    """Builds LaTeX documents with var:workers pdflatex processes in parallel. Every job is built in its own temporary
+    directory, so jobs with the same name do not interfere and the working directory stays clean. pdflatex is run again
+    only if the log asks for a rerun (at most var:max_passes times)."""
+
+    def __init__(self, workers:int=2, command:str="pdflatex", max_passes:int=3):
+        """Constructor: LatexRunner."""
+        self.workers=workers
+        self.command=command
+        self.max_passes=max_passes
+        self.pool:Optional[ThreadPoolExecutor]=None
+        self.jobs:Dict[int, LatexJob]=dict()
+        self.ids=itertools.count(1)
+        self.lock=threading.Lock()
+
+    def build(self, directory:str, name:str, output:str)->str:
+        """Runs pdflatex on var:directory/var:name.tex and moves the pdf to var:output. Removes var:directory."""
+        try:
+            for _ in range(self.max_passes):
+                subprocess.run([self.command, "-interaction=nonstopmode", name+".tex"], cwd=directory,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                log=path.join(directory, name+".log")
+                if not path.isfile(log): break
+                with open(log, "r", encoding="utf-8", errors="replace") as f:
+                    if not "Rerun" in f.read(): break
+            if not path.isfile(pdf:=path.join(directory, name+".pdf")):
+                raise Exception(f"pdflatex failed to build {name}.pdf")
+            makedirs(path.dirname(output), exist_ok=True)
+            shutil.move(pdf, output)
+            return output
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def submit(self, name:str, document:str, output:str, files:List[str]=[], on_done:Optional[Callable[[str], None]]=None)->LatexJob:
+        """Builds var:document (named var:name.tex) to var:output in the background. var:files (relative paths) are copied
+        into the build directory before this returns, so they can be removed afterwards. var:on_done is called with
+        var:output once the pdf exists."""
+        directory=tempfile.mkdtemp(prefix="chrono_latex_")
+        with open(path.join(directory, name+".tex"), "w+", encoding="utf-8") as f:
+            f.write(document)
+        for file in files:
+            makedirs(path.join(directory, path.dirname(file)), exist_ok=True)
+            shutil.copy(file, path.join(directory, file))
+        with self.lock:
+            if self.pool==None:
+                self.pool=ThreadPoolExecutor(max_workers=max(self.workers, 1), thread_name_prefix="latex")
+            id=next(self.ids)
+            job=LatexJob(id, name, path.abspath(output), self.pool.submit(self.build, directory, name, path.abspath(output)))
+            self.jobs[id]=job
+
+        def finished(future:Future)->None:
+            if future.exception()!=None:
+                logging.warning(f"LaTeX job {id} ({name}): {future.exception()}")
+                print(f"LaTeX job {id} ({name}) failed")
+            elif on_done!=None:
+                on_done(output)
+        job.future.add_done_callback(finished)
+        return job
+
+    def run(self, name:str, document:str, output:str, files:List[str]=[])->str:
+        """Builds var:document and waits for it."""
+        return self.submit(name, document, output, files).result()
+
+    def wait(self)->None:
+        """Waits for all submitted jobs."""
+        for job in list(self.jobs.values()):
+            try: job.result()
+            except Exception: pass
+
+    def shutdown(self)->None:
+        if self.pool!=None:
+            self.pool.shutdown(wait=True)
+            self.pool=None
@@ -0,0 +1,71 @@
+import threading
+from contextlib import contextmanager
+from typing import Dict, Generator, Optional
+
+
+class RWLock:
+    """Readers-writer lock: any number of threads can hold it shared (read) or one thread exclusively (write). Waiting
+    writers keep new readers out, so a stream of reads does not starve edits. Both modes are reentrant and the writer
+    may read as well. Upgrading a read to a write would deadlock with a second reader, so it raises instead."""
+
+    def __init__(self):
+        """Constructor: RWLock."""
+        self.condition=threading.Condition(threading.Lock())
+        self.readers:Dict[int, int]=dict() # thread -> depth
+        self.writer:Optional[int]=None
+        self.writer_depth=0
+        self.waiting_writers=0
+
+    def acquire_read(self)->None:
+        me=threading.get_ident()
+        with self.condition:
+            if self.writer!=me and not me in self.readers.keys():
+                while self.writer!=None or self.waiting_writers>0:
+                    self.condition.wait()
+            self.readers[me]=self.readers.get(me, 0)+1
+
+    def release_read(self)->None:
+        me=threading.get_ident()
+        with self.condition:
+            self.readers[me]-=1
+            if self.readers[me]==0:
+                del self.readers[me]
+                if self.readers=={}: self.condition.notify_all()
+
+    def acquire_write(self)->None:
+        me=threading.get_ident()
+        with self.condition:
+            if self.writer==me:
+                self.writer_depth+=1
+                return
+            if me in self.readers.keys():
+                raise Exception("can not upgrade a read lock to a write lock")
+            self.waiting_writers+=1
+            try:
+                while self.writer!=None or self.readers!={}:
+                    self.condition.wait()
+            finally:
+                self.waiting_writers-=1
+            self.writer=me
+            self.writer_depth=1
+
+    def release_write(self)->None:
+        with self.condition:
+            self.writer_depth-=1
+            if self.writer_depth==0:
+                self.writer=None
+                self.condition.notify_all()
+
+    @contextmanager
+    def read(self)->Generator[None, None, None]:
+        """Holds the lock shared."""
+        self.acquire_read()
+        try: yield
+        finally: self.release_read()
+
+    @contextmanager
+    def write(self)->Generator[None, None, None]:
+        """Holds the lock exclusively."""
+        self.acquire_write()
+        try: yield
+        finally: self.release_write()
@@ -1,11 +1,10 @@
-from typing import List,Dict,TypeVar,Tuple
+from typing import List,Dict,TypeVar,Tuple,Hashable,Any
 import networkx as nx
-from functools import reduce
 
 X=TypeVar("X")
 
 def subset(l1:List[X],l2:List[X])->bool:
-    return reduce(lambda a,b: a and b, [(e in l2) for e in l1], True)
+    return set(l1)<=set(l2)
 
 def monotone_clustering(G:nx.Graph, filter_function:Dict[X,bool])->List[List[X]]:
     G_prime:nx.Graph=G.subgraph(filter(lambda x:filter_function[x],list(nx.nodes(G))))
@@ -13,32 +12,193 @@ def monotone_clustering(G:nx.Graph, filter_function:Dict[X,bool])->List[List[X]]
 
 def gbl(G:nx.Graph,f:Dict[X,float],rho:float): return monotone_clustering(G,{x:(f[x]>=rho) for x in f.keys()})
 
+class UnionFind:
+    """Disjoint sets with path halving and union by size. Each root remembers the smallest order and the largest
+    value of its set."""
+
+    def __init__(self):
+        self.parent:Dict[Hashable,Hashable]={}
+        self.size:Dict[Hashable,int]={}
+        self.first:Dict[Hashable,int]={}
+        self.birth:Dict[Hashable,float]={}
+
+    def add(self, x:Hashable, order:int, value:float)->None:
+        self.parent[x]=x
+        self.size[x]=1
+        self.first[x]=order
+        self.birth[x]=value
+
+    def find(self, x:Hashable)->Hashable:
+        while self.parent[x]!=x:
+            self.parent[x]=self.parent[self.parent[x]]
+            x=self.parent[x]
+        return x
+
+    def union(self, a:Hashable, b:Hashable)->Tuple[Hashable,Hashable]:
+        """Merges the sets of a and b. Returns (surviving root, absorbed root)."""
+        if self.size[a]<self.size[b]: a,b=b,a
+        self.parent[b]=a
+        self.size[a]+=self.size[b]
+        self.first[a]=min(self.first[a],self.first[b])
+        self.birth[a]=max(self.birth[a],self.birth[b])
+        return a,b
+
+class MergeTree:
+    """Merge tree of the superlevel filtration {x in G: f(x)>=rho}, computed by a single descending sweep over the nodes
+    of G sorted by f. Level i belongs to thresholds[i] (ascending, all distinct values of f). The clusters of each level
+    are ordered like nx.connected_components orders them (by their first node in G) and
+    parents[i][k] is the index of the cluster of level i-1 containing cluster k of level i (-1 on level 0).
+    splits[i][j] is the number of clusters of level i+1 contained in cluster j of level i.
+    persistence contains the 0-dimensional persistence pairs (representative, birth, death) using the elder rule."""
+
+    thresholds:List[float]
+    parents:List[List[int]]
+    splits:List[List[int]]
+    persistence:List[Tuple[X,float,float]]
+
+    def __init__(self, G:nx.Graph, f:Dict[X,float]):
+        self.thresholds=sorted(set(f.values()))
+        n=len(self.thresholds)
+        level={value:i for i,value in enumerate(self.thresholds)}
+        order={x:i for i,x in enumerate(G.nodes)}
+        self.nodes:List[List[X]]=[[] for _ in range(n)]
+        for x in G.nodes:
+            self.nodes[level[f[x]]].append(x)
+        self.parents=[[] for _ in range(n)]
+        self.splits=[[] for _ in range(n-1)]
+        self.persistence=[]
+        self.index:Dict[X,int]={} # cluster index of each node at its own level
+        uf=UnionFind()
+        upper:List[X]=[] # roots of the previous level
+        for i in range(n-1,-1,-1):
+            for x in self.nodes[i]:
+                uf.add(x, order[x], self.thresholds[i])
+                for y in G.neighbors(x):
+                    if y in uf.parent:
+                        rx,ry=uf.find(x),uf.find(y)
+                        if rx!=ry:
+                            elder,younger=(rx,ry) if (uf.birth[rx],-uf.first[rx])>=(uf.birth[ry],-uf.first[ry]) else (ry,rx)
+                            self.persistence.append((younger,uf.birth[younger],self.thresholds[i]))
+                            uf.union(rx,ry)
+            lower=sorted(set([uf.find(r) for r in upper]+[uf.find(x) for x in self.nodes[i]]),key=lambda r:uf.first[r])
+            position={r:k for k,r in enumerate(lower)}
+            if i<n-1:
+                self.parents[i+1]=[position[uf.find(r)] for r in upper]
+                counts=[0 for _ in lower]
+                for r in upper:
+                    counts[position[uf.find(r)]]+=1
+                self.splits[i]=counts
+            for x in self.nodes[i]:
+                self.index[x]=position[uf.find(x)]
+            upper=lower
+        if n>0: self.parents[0]=[-1 for _ in upper]
+        for r in upper:
+            self.persistence.append((r,uf.birth[r],float("-inf")))
+        self.order=order
+
+    def __len__(self)->int:
+        return len(self.thresholds)
+
+    def labels(self, i:int)->Dict[X,int]:
+        """Cluster index (on level i) of every node which is active on level i."""
+        labels:Dict[X,int]={}
+        for j in range(len(self)-1,i-1,-1):
+            if j<len(self)-1: labels={x:self.parents[j+1][k] for x,k in labels.items()}
+            for x in self.nodes[j]:
+                labels[x]=self.index[x]
+        return labels
+
+    def clustering(self, i:int)->List[List[X]]:
+        """The clusters of level i, equal to gbl(G,f,thresholds[i])."""
+        clusters:List[List[X]]=[[] for _ in self.parents[i]]
+        for x,k in sorted(self.labels(i).items(),key=lambda xk:self.order[xk[0]]):
+            clusters[k].append(x)
+        return clusters
+
+    def levels(self)->List[List[List[X]]]:
+        """The clusters of all levels (ascending thresholds)."""
+        clusterings:List[List[List[X]]]=[[] for _ in self.thresholds]
+        labels:Dict[X,int]={}
+        for j in range(len(self)-1,-1,-1):
+            if j<len(self)-1: labels={x:self.parents[j+1][k] for x,k in labels.items()}
+            for x in self.nodes[j]:
+                labels[x]=self.index[x]
+            clusters:List[List[X]]=[[] for _ in self.parents[j]]
+            for x,k in sorted(labels.items(),key=lambda xk:self.order[xk[0]]):
+                clusters[k].append(x)
+            clusterings[j]=clusters
+        return clusterings
+
+    def hierarchy(self, prune:bool=False)->"ClusterTree":
+        """The explicit cluster tree of all levels. If prune, levels which do not split any cluster are left out."""
+        return ClusterTree(self, prune)
+
+class ClusterTree:
+    """Explicit cluster hierarchy of a MergeTree. Level i contains the clusters at thresholds[i],
+    parents[i][k] is the index of the parent of cluster k of level i in level i-1 (-1 for the roots on level 0)."""
+
+    thresholds:List[float]
+    clusters:List[List[List[X]]]
+    parents:List[List[int]]
+
+    def __init__(self, tree:MergeTree, prune:bool=False):
+        levels=tree.levels()
+        keep=[i for i in range(len(tree)) if i==0 or not prune or max(tree.splits[i-1],default=0)>1]
+        self.thresholds=[tree.thresholds[i] for i in keep]
+        self.clusters=[levels[i] for i in keep]
+        self.parents=[[-1 for _ in levels[0]]] if len(tree)>0 else []
+        for previous,i in zip(keep,keep[1:]):
+            parents=tree.parents[i]
+            for j in range(i-1,previous,-1):
+                parents=[tree.parents[j][k] for k in parents]
+            self.parents.append(parents)
+
+    def __len__(self)->int:
+        return len(self.thresholds)
+
+    def children(self)->List[List[List[int]]]:
+        """children[i][k] are the indices (level i+1) of the children of cluster k of level i."""
+        children:List[List[List[int]]]=[[[] for _ in level] for level in self.clusters]
+        for i in range(1,len(self)):
+            for k,parent in enumerate(self.parents[i]):
+                children[i-1][parent].append(k)
+        return children
+
+    def subtrees(self)->List[List[List[int]]]:
+        """For each root: the indices of its descendants on every level (breadth first)."""
+        children=self.children()
+        trees:List[List[List[int]]]=[]
+        for root in range(len(self.clusters[0]) if len(self)>0 else 0):
+            tree=[[root]]
+            for i in range(len(self)-1):
+                tree.append([k for j in tree[-1] for k in children[i][j]])
+            trees.append(tree)
+        return trees
+
+    def to_dict(self)->Dict[str,Any]:
+        """Used to export the tree as json. Each node gets the id "level:index"."""
+        return {"thresholds":self.thresholds,
+                "nodes":[{"id":f"{i}:{k}","level":i,"threshold":self.thresholds[i],"members":cluster,
+                    "parent":None if i==0 else f"{i-1}:{self.parents[i][k]}"}
+                    for i,level in enumerate(self.clusters) for k,cluster in enumerate(level)]}
+
 def gbl_get_split_force(G:nx.Graph,f:Dict[X,float])->Tuple[float,List[List[X]],List[List[int]]]:
-    sorted_f=sorted([(key,f[key]) for key in f.keys()],key=lambda x:x[1])
-    sorted_filtered_f=[sorted_f[0]]
-    for key,value in sorted_f:
-        if not (sorted_filtered_f[-1][1]==value): sorted_filtered_f.append((key,value))
-    n=len(sorted_filtered_f)
-    ccs=[(value,gbl(G,f,value)) for key,value in sorted_filtered_f]
-    Events:List[List[int]]=[[len([1 for upper_cluster in ccs[i+1][1] if subset(upper_cluster,lower_cluster)]) for lower_cluster in ccs[i][1]] for i in range(n-1)]
-    has_split=[max(Events[i])>2 for i in range(len(Events))]
+    tree=MergeTree(G,f)
+    n=len(tree)
+    Events:List[List[int]]=tree.splits
+    has_split=[max(Events[i],default=0)>2 for i in range(len(Events))]
     index=n-2
     for _ in range(n-1):
         if not has_split[index]:
             index-=1
         else:
             break
-    return ccs[index+1][0],ccs[index+1][1], Events
-   
+    return tree.thresholds[index+1],tree.clustering(index+1), Events
+
 
 def gbl_get_ccs(G:nx.Graph,f:Dict[X,float])->List[Tuple[float,List[List[X]]]]:
-    sorted_f=sorted([(key,f[key]) for key in f.keys()],key=lambda x:x[1])
-    sorted_filtered_f=[sorted_f[0]]
-    for key,value in sorted_f:
-        if not (sorted_filtered_f[-1][1]==value): sorted_filtered_f.append((key,value))
-    n=len(sorted_filtered_f)
-    ccs=[(value,gbl(G,f,value)) for key,value in sorted_filtered_f]
-    return ccs
+    tree=MergeTree(G,f)
+    return list(zip(tree.thresholds,tree.levels()))
 
 if __name__ == "__main__":
     G=nx.Graph()
@@ -47,4 +207,4 @@ if __name__ == "__main__":
     filter_function={"a":True,"b":False,"c":True}
     print(monotone_clustering(G,filter_function))
     print(gbl(G,{"a":2,"b":0,"c":1},0.5))
-    print(gbl_get_split_force(G,{"a":2,"b":0,"c":1}))
\ No newline at end of file
+    print(gbl_get_split_force(G,{"a":2,"b":0,"c":1}))
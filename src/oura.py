@@ -1,24 +1,216 @@
-import requests
 import json
-from typing import (Tuple,Dict)
-from requests.models import Response
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date, timedelta
+from os import makedirs, path
+from typing import (Any, Dict, Generator, List, Optional, Tuple)
 
+from src.render import LazyModule
 
-def get_sleep(start_date:str,stop_date:str,code:str="")->Tuple[bool,Dict[str,Tuple[str,str,str,str,int,int,int]]]:
+requests=LazyModule("requests")
+
+BASE_URL="https://api.ouraring.com/v2/usercollection/"
+RETRY_STATUS=[429, 500, 502, 503, 504]
+CHUNK_DAYS=30
+WORKERS=4
+
+SleepData=Dict[str, Tuple[str, str, str]]
+
+
+def runs(days:List[str])->List[Tuple[str, str]]:
+    """Splits sorted isoformatted days into (first, last) runs of consecutive days."""
+    rtn:List[Tuple[str, str]]=[]
+    for day in days:
+        if rtn!=[] and date.fromisoformat(rtn[-1][1])+timedelta(days=1)==date.fromisoformat(day):
+            rtn[-1]=(rtn[-1][0], day)
+        else:
+            rtn.append((day, day))
+    return rtn
+
+
+def chunks(start_date:str, stop_date:str, chunk_days:int=CHUNK_DAYS)->List[Tuple[str, str]]:
+    """Splits [start_date, stop_date] into (first, last) ranges of at most var:chunk_days days."""
+    start, stop=date.fromisoformat(start_date), date.fromisoformat(stop_date)
+    rtn:List[Tuple[str, str]]=[]
+    while start<=stop:
+        last=min(start+timedelta(days=chunk_days-1), stop)
+        rtn.append((start.isoformat(), last.isoformat()))
+        start=last+timedelta(days=1)
+    return rtn
+
+
+class OuraClient:
+    """Client for the oura API v2. Uses one pooled requests.Session, retries failed requests with exponential backoff
+    (respecting Retry-After), follows next_token and caches the sleep documents of every night in var:cache_dir.
+    Nights which are cached and older than var:provisional_days are not fetched again. The client can be used by
+    multiple threads (see iter_sleep); a rate limit response pauses all of them."""
+
+    def __init__(self, code:str, base_url:str=BASE_URL, cache_dir:Optional[str]="./oura_cache/", timeout:Tuple[float, float]=(5, 30),
+                 retries:int=5, backoff:float=1.0, provisional_days:int=2, workers:int=WORKERS):
+        """Constructor: OuraClient. If var:cache_dir is None nothing is cached."""
+        self.base_url=base_url if base_url.endswith("/") else base_url+"/"
+        self.cache_dir=cache_dir
+        self.timeout=timeout
+        self.retries=retries
+        self.backoff=backoff
+        self.provisional_days=provisional_days
+        self.workers=workers
+        self.session=requests.Session()
+        self.session.headers.update({'Authorization': "Bearer "+code})
+        from requests.adapters import HTTPAdapter
+        adapter=HTTPAdapter(pool_connections=1, pool_maxsize=max(workers, 1))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.paused_until=0.0
+        self.lock=threading.Lock()
+
+    def close(self)->None:
+        self.session.close()
+
+    def pause(self, seconds:float)->None:
+        """Delays all requests (of all threads) by var:seconds."""
+        with self.lock:
+            self.paused_until=max(self.paused_until, time.monotonic()+seconds)
+
+    def wait(self)->None:
+        while (remaining:=self.paused_until-time.monotonic())>0:
+            time.sleep(remaining)
+
+    def request(self, endpoint:str, params:Dict[str, str])->Dict[str, Any]:
+        """GET var:endpoint. Connection errors, timeouts and the status codes in RETRY_STATUS are retried."""
+        for attempt in range(self.retries+1):
+            wait=self.backoff*2**attempt
+            self.wait()
+            try:
+                response=self.session.get(self.base_url+endpoint, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt==self.retries: raise
+                logging.warning(f"oura: {e}, retrying in {wait}s")
+            else:
+                if response.status_code==200:
+                    return response.json()
+                if not response.status_code in RETRY_STATUS or attempt==self.retries:
+                    raise Exception(f"oura: {endpoint} failed with status {response.status_code}")
+                if (retry_after:=response.headers.get("Retry-After"))!=None and retry_after.isdigit():
+                    wait=float(retry_after)
+                logging.warning(f"oura: status {response.status_code}, retrying in {wait}s")
+                if response.status_code==429:
+                    self.pause(wait)
+                    continue
+            time.sleep(wait)
+        raise Exception(f"oura: {endpoint} failed")
+
+    def documents(self, endpoint:str, start_date:str, stop_date:str)->Generator[Dict[str, Any], None, None]:
+        """All documents of var:endpoint in [start_date, stop_date], following next_token."""
+        params={'start_date':start_date, 'end_date':stop_date}
+        while True:
+            page=self.request(endpoint, params)
+            yield from page["data"]
+            if page.get("next_token") in [None, ""]:
+                return
+            params={'start_date':start_date, 'end_date':stop_date, 'next_token':page["next_token"]}
+
+    def cache_file(self, day:str)->str:
+        return path.join(self.cache_dir, f"sleep_{day}.json")
+
+    def cached(self, day:str)->Optional[List[Dict[str, Any]]]:
+        """The cached sleep documents of the night ending on var:day, None if it is not cached or still provisional."""
+        if self.cache_dir==None or not path.exists(self.cache_file(day)):
+            return None
+        with open(self.cache_file(day), "r", encoding="utf-8") as f:
+            entry=json.load(f)
+        if date.fromisoformat(entry["fetched"])-date.fromisoformat(day)<=timedelta(days=self.provisional_days):
+            return None
+        return entry["documents"]
+
+    def store(self, day:str, documents:List[Dict[str, Any]])->None:
+        if self.cache_dir==None: return
+        makedirs(self.cache_dir, exist_ok=True)
+        with open(self.cache_file(day), "w+", encoding="utf-8") as f:
+            json.dump({"fetched":date.today().isoformat(), "documents":documents}, f)
+
+    def sleep_documents(self, start_date:str, stop_date:str, refresh:bool=False)->Dict[str, List[Dict[str, Any]]]:
+        """The sleep documents of every night in [start_date, stop_date] by day. Only the nights which are missing or
+        provisional in the cache are fetched (one request per run of consecutive nights)."""
+        start, stop=date.fromisoformat(start_date), date.fromisoformat(stop_date)
+        days=[(start+timedelta(days=i)).isoformat() for i in range((stop-start).days+1)]
+        rtn:Dict[str, List[Dict[str, Any]]]={}
+        missing:List[str]=[]
+        for day in days:
+            if not refresh and (documents:=self.cached(day))!=None: rtn[day]=documents
+            else: missing.append(day)
+        for first, last in runs(missing):
+            fetched:Dict[str, List[Dict[str, Any]]]={day:[] for day in missing if first<=day<=last}
+            for document in self.documents("sleep", first, last):
+                if document["day"] in fetched.keys():
+                    fetched[document["day"]].append(document)
+            for day, documents in fetched.items():
+                self.store(day, documents)
+                rtn[day]=documents
+        return {day:rtn[day] for day in days}
+
+    def get_sleep(self, start_date:str, stop_date:str, refresh:bool=False)->SleepData:
+        """(bedtime_start, bedtime_end, sleep_phase_5_min) of every night in [start_date, stop_date] with data.
+        If a day has multiple documents the last one is used."""
+        return {day:(documents[-1]["bedtime_start"],documents[-1]["bedtime_end"],documents[-1]["sleep_phase_5_min"])
+                for day, documents in self.sleep_documents(start_date, stop_date, refresh).items() if documents!=[]}
+
+    def iter_sleep(self, start_date:str, stop_date:str, chunk_days:int=CHUNK_DAYS, refresh:bool=False)->Generator[Tuple[str, str, SleepData], None, None]:
+        """get_sleep for every chunk (see chunks) of [start_date, stop_date] as (first, last, nights), in order. The chunks are
+        fetched by var:workers threads; at most 2*var:workers chunks are fetched ahead of the consumer."""
+        ranges=chunks(start_date, stop_date, chunk_days)
+        with ThreadPoolExecutor(max_workers=max(self.workers, 1)) as pool:
+            pending:List[Tuple[str, str, Future]]=[]
+            for first, last in ranges:
+                pending.append((first, last, pool.submit(self.get_sleep, first, last, refresh)))
+                if len(pending)>2*self.workers:
+                    first, last, future=pending.pop(0)
+                    yield first, last, future.result()
+            for first, last, future in pending:
+                yield first, last, future.result()
+
+
+def get_sleep(start_date:str,stop_date:str,code:str="",base_url:str=BASE_URL)->Tuple[bool,SleepData]:
     print(f"Getting sleep data: [{start_date},{stop_date}]")
     print("Awaiting response ...")
-    url = 'https://api.ouraring.com/v2/usercollection/sleep' 
-    params={ 
-        'start_date':start_date, 
-        'end_date': stop_date 
-    }
-    headers = { 
-    'Authorization': "Bearer "+code
-    }
-    response = requests.request('GET', url, headers=headers, params=params) 
-    if response.status_code==200:
-        sleep=sleep=json.loads(response.content.decode(encoding="utf-8"))["data"]
-        return (True, {day["day"]:(day["bedtime_start"],day["bedtime_end"],day["sleep_phase_5_min"]) for day in sleep}) 
-    else:
-        print("Failed") 
+    client=OuraClient(code, base_url)
+    try:
+        return (True, client.get_sleep(start_date, stop_date))
+    except Exception as e:
+        logging.warning(e)
+        print("Failed")
         return (False,{})
+    finally:
+        client.close()
+
+
+def night_hash(night:Tuple[str, str, str])->str:
+    """Identifies the content of a night returned by OuraClient.get_sleep."""
+    return hashlib.sha1(json.dumps(list(night)).encode("utf-8")).hexdigest()
+
+
+class SleepSyncState:
+    """State of the incremental sleep import: the last night imported and the hash of every imported night."""
+
+    last:Optional[str]
+    nights:Dict[str, str]
+
+    def __init__(self, last:Optional[str]=None, nights:Optional[Dict[str, str]]=None):
+        """Constructor: SleepSyncState."""
+        self.last=last
+        self.nights=nights if nights!=None else dict()
+
+    @staticmethod
+    def load(file:str)->"SleepSyncState":
+        if not path.exists(file):
+            return SleepSyncState()
+        with open(file, "r", encoding="utf-8") as f:
+            d=json.load(f)
+        return SleepSyncState(d["last"], d["nights"])
+
+    def save(self, file:str)->None:
+        with open(file, "w+", encoding="utf-8") as f:
+            json.dump({"last":self.last, "nights":self.nights}, f, indent=4)
@@ -0,0 +1,141 @@
+from datetime import date, time
+from os import makedirs, path
+from typing import Any, Dict, List, Tuple
+
+from src.atoms import ChronoEvent, ChronoNote, ChronoTime
+from src.sport import ChronoPlankEvent, ChronoPushUpEvent, ChronoRunningEvent, ChronoSitUpsEvent
+
+TABLES=["days","events","times","runs","pushups","planks","situps","functions","sleep","notes"]
+
+
+def require_pyarrow():
+    """Imports pyarrow, which is only needed for the parquet commands."""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise Exception("The parquet commands need pyarrow: pip install pyarrow")
+    return pyarrow, pyarrow.parquet
+
+
+def schemas(pa)->Dict[str, Any]:
+    """The schema of every table."""
+    t=pa.time32("s")
+    d=pa.date32()
+    return {
+        "days":pa.schema([("date", d)]),
+        "events":pa.schema([("date", d), ("start", t), ("end", t), ("what", pa.string()), ("tags", pa.list_(pa.string()))]),
+        "times":pa.schema([("date", d), ("start", t), ("what", pa.string()), ("tags", pa.list_(pa.string())), ("silent", pa.bool_())]),
+        "runs":pa.schema([("date", d), ("start", t), ("time", pa.float64()), ("distance", pa.float64())]),
+        "pushups":pa.schema([("date", d), ("start", t), ("times", pa.list_(pa.float64())), ("mults", pa.list_(pa.int64()))]),
+        "planks":pa.schema([("date", d), ("start", t), ("time", pa.float64())]),
+        "situps":pa.schema([("date", d), ("start", t), ("time", pa.float64()), ("mult", pa.int64())]),
+        "functions":pa.schema([("date", d), ("name", pa.string()), ("value", pa.float64())]),
+        "sleep":pa.schema([("date", d), ("sleep_start", pa.string()), ("phases", pa.string())]),
+        "notes":pa.schema([("text", pa.string()), ("datetime", pa.timestamp("us"))]),
+    }
+
+
+def day_rows(day)->Dict[str, List[Tuple]]:
+    """The rows of every (per day) table for one ChronoDay."""
+    d=day.date
+    return {
+        "days":[(d,)],
+        "events":[(d, e.start, e.end, e.what, list(e.tags)) for e in day.get_slots()],
+        "times":[(d, t.start, t.what, list(t.tags), True) for t in day.silent_events],
+        "runs":[(d, r.start_time, float(r.time), float(r.distance)) for r in day.sport["runs"]],
+        "pushups":[(d, p.start_time, [float(x) for x in p.times], [int(x) for x in p.mults]) for p in day.sport["pushups"]],
+        "planks":[(d, p.start_time, float(p.time)) for p in day.sport["planks"]],
+        "situps":[(d, s.start_time, float(s.time), int(s.mult)) for s in day.sport["situps"]],
+        "functions":[(d, name, float(value)) for name, value in day.functions.items()],
+        "sleep":[(d, day.sleep_start, day.sleep)] if day.sleep!="" else [],
+    }
+
+
+def export_parquet(project, directory:str)->Dict[str, int]:
+    """Writes the project to one parquet file per table in var:directory. Every month of days is one row group, so only one
+    month is held in memory. Returns the number of rows per table."""
+    pa, pq=require_pyarrow()
+    schema=schemas(pa)
+    makedirs(directory, exist_ok=True)
+    meta={"name":project.name, "path":project.path}
+    writers={table:pq.ParquetWriter(path.join(directory, table+".parquet"), schema[table].with_metadata(meta)) for table in TABLES}
+    counts={table:0 for table in TABLES}
+    rows:Dict[str, List[Tuple]]={table:[] for table in TABLES}
+
+    def flush()->None:
+        for table, table_rows in rows.items():
+            if table_rows!=[]:
+                columns=list(zip(*table_rows))
+                writers[table].write_table(pa.Table.from_arrays([pa.array(list(c), type=f.type) for c, f in zip(columns, schema[table])], schema=schema[table]))
+                counts[table]+=len(table_rows)
+                rows[table]=[]
+
+    try:
+        month=""
+        for key in sorted(project.days.keys()):
+            if key[:7]!=month:
+                flush()
+                month=key[:7]
+            for table, table_rows in day_rows(project.days[key]).items():
+                rows[table]+=table_rows
+        flush()
+        rows["times"]=[(t.tdate, t.start, t.what, list(t.tags), False) for t in sorted(project.sevents, key=lambda x:(x.tdate, x.start))]
+        rows["notes"]=[(note.text, note.dt) for note in project.todo]
+        flush()
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return counts
+
+
+def make_event(start:time, end:time, what:str, tags:List[str])->ChronoEvent:
+    """Creates a ChronoEvent without parsing and validating its input (it was validated when it was exported)."""
+    event=ChronoEvent.__new__(ChronoEvent)
+    event.start, event.end, event.what, event.tags=start, end, what, tags
+    return event
+
+
+def read_columns(pq, directory:str, table:str)->Dict[str, List[Any]]:
+    return pq.ParquetFile(path.join(directory, table+".parquet")).read().to_pydict()
+
+
+def import_parquet(project_class, day_class, directory:str):
+    """Rebuilds a ChronoProject (of var:project_class, with days of var:day_class) from the files written by export_parquet."""
+    pa, pq=require_pyarrow()
+    meta=pq.read_schema(path.join(directory, "days.parquet")).metadata
+    project=project_class(name=meta[b"name"].decode("utf-8"), path=meta[b"path"].decode("utf-8"))
+    days:Dict[date, Any]={}
+    for d in read_columns(pq, directory, "days")["date"]:
+        days[d]=day_class([], d.isoformat())
+    c=read_columns(pq, directory, "events")
+    for d, start, end, what, tags in zip(c["date"], c["start"], c["end"], c["what"], c["tags"]):
+        days[d].events.append(make_event(start, end, what, tags))
+    c=read_columns(pq, directory, "times")
+    for d, start, what, tags, silent in zip(c["date"], c["start"], c["what"], c["tags"], c["silent"]):
+        t=ChronoTime.__new__(ChronoTime)
+        t.tdate, t.start, t.what, t.tags=d, start, what, tags
+        if silent: days[d].silent_events.append(t)
+        else: project.sevents.append(t)
+    c=read_columns(pq, directory, "runs")
+    for d, start, run_time, distance in zip(c["date"], c["start"], c["time"], c["distance"]):
+        days[d].sport["runs"].append(ChronoRunningEvent(run_time, distance, start))
+    c=read_columns(pq, directory, "pushups")
+    for d, start, times, mults in zip(c["date"], c["start"], c["times"], c["mults"]):
+        days[d].sport["pushups"].append(ChronoPushUpEvent(times, mults, start))
+    c=read_columns(pq, directory, "planks")
+    for d, start, plank_time in zip(c["date"], c["start"], c["time"]):
+        days[d].sport["planks"].append(ChronoPlankEvent(plank_time, start))
+    c=read_columns(pq, directory, "situps")
+    for d, start, situp_time, mult in zip(c["date"], c["start"], c["time"], c["mult"]):
+        days[d].sport["situps"].append(ChronoSitUpsEvent(situp_time, mult, start))
+    c=read_columns(pq, directory, "functions")
+    for d, name, value in zip(c["date"], c["name"], c["value"]):
+        days[d].functions[name]=value
+    c=read_columns(pq, directory, "sleep")
+    for d, sleep_start, phases in zip(c["date"], c["sleep_start"], c["phases"]):
+        days[d].sleep, days[d].sleep_start=phases, sleep_start
+    c=read_columns(pq, directory, "notes")
+    project.todo=[ChronoNote(text, dt) for text, dt in zip(c["text"], c["datetime"])]
+    project.set_days({d.isoformat():day for d, day in days.items()})
+    return project
@@ -0,0 +1,99 @@
+import json
+import math
+import threading
+from os import path
+from typing import Any, Dict, List, Optional
+
+PERF_FILE="data/perf.json"
+BASE=2**0.25 # bucket width of LogHistogram: quantiles are accurate to about 10%
+FLOOR=1e-7 # smaller values share the lowest bucket
+
+
+class LogHistogram:
+    """Counts values in buckets [BASE^k, BASE^(k+1)), so the size does not grow with the number of values and
+    quantiles have a constant relative error. Keeps the exact count, sum and maximum."""
+
+    def __init__(self):
+        """Constructor: LogHistogram."""
+        self.buckets:Dict[int, int]=dict()
+        self.count=0
+        self.total=0.0
+        self.max=0.0
+
+    def add(self, x:float)->None:
+        k=math.floor(math.log(max(x, FLOOR), BASE))
+        self.buckets[k]=self.buckets.get(k, 0)+1
+        self.count+=1
+        self.total+=x
+        self.max=max(self.max, x)
+
+    def quantile(self, q:float)->float:
+        """The geometric middle of the bucket containing the var:q quantile (at most the maximum)."""
+        if self.count==0: return 0.0
+        rank=q*self.count
+        seen=0
+        for k in sorted(self.buckets.keys()):
+            seen+=self.buckets[k]
+            if seen>=rank: break
+        return min(BASE**(k+0.5), self.max)
+
+    def to_dict(self)->Dict[str, Any]:
+        return {"buckets":{str(k):n for k, n in self.buckets.items()}, "count":self.count, "total":self.total, "max":self.max}
+
+    @staticmethod
+    def from_dict(d:Dict[str, Any])->"LogHistogram":
+        h=LogHistogram()
+        h.buckets={int(k):n for k, n in d["buckets"].items()}
+        h.count, h.total, h.max=d["count"], d["total"], d["max"]
+        return h
+
+
+class PerfStats:
+    """Histograms of the wall time, the CPU time (of the executing thread) and, if measured, the peak allocation of the
+    process of every command and alias (see ChronoClient.execute)."""
+
+    METRICS=["wall", "cpu", "peak"]
+
+    def __init__(self):
+        """Constructor: PerfStats."""
+        self.commands:Dict[str, Dict[str, LogHistogram]]=dict()
+        self.lock=threading.Lock()
+
+    def record(self, cmd:str, wall:float, cpu:float, peak:Optional[int]=None)->None:
+        with self.lock:
+            hists=self.commands.setdefault(cmd, {metric:LogHistogram() for metric in PerfStats.METRICS})
+            hists["wall"].add(wall)
+            hists["cpu"].add(cpu)
+            if peak!=None: hists["peak"].add(peak)
+
+    def reset(self)->None:
+        with self.lock:
+            self.commands=dict()
+
+    def table(self)->List[List[str]]:
+        """One row per command (sorted by the total wall time) with the count, p50/p95/max of the wall time, p50/p95 of
+        the CPU time (both in ms) and the maximal peak allocation (KiB, - if not measured)."""
+        rows=[["command", "n", "p50", "p95", "max", "cpu p50", "cpu p95", "peak"]]
+        with self.lock:
+            for cmd, hists in sorted(self.commands.items(), key=lambda item: -item[1]["wall"].total):
+                wall, cpu, peak=hists["wall"], hists["cpu"], hists["peak"]
+                rows.append([cmd, str(wall.count)]+[f"{1000*x:.1f}" for x in (wall.quantile(0.5), wall.quantile(0.95), wall.max,
+                                                                              cpu.quantile(0.5), cpu.quantile(0.95))]
+                            +[f"{peak.max/1024:.0f}" if peak.count>0 else "-"])
+        return rows
+
+    def save(self, file:str=PERF_FILE)->None:
+        with self.lock:
+            data={cmd:{metric:h.to_dict() for metric, h in hists.items()} for cmd, hists in self.commands.items()}
+        with open(file, "w+", encoding="utf-8") as f:
+            json.dump(data, f)
+
+    @staticmethod
+    def load(file:str=PERF_FILE)->"PerfStats":
+        """The stats saved to var:file, empty ones if there are none."""
+        stats=PerfStats()
+        if path.isfile(file):
+            with open(file, "r", encoding="utf-8") as f:
+                data=json.load(f)
+            stats.commands={cmd:{metric:LogHistogram.from_dict(h) for metric, h in hists.items()} for cmd, hists in data.items()}
+        return stats
@@ -0,0 +1,281 @@
+from abc import ABC, abstractmethod
+from bisect import bisect_left, bisect_right
+from datetime import date
+from typing import Any, Dict, Generator, List, Optional, Set, Tuple
+import numpy as np
+
+from src.helper import WEEKDAYS, str_to_seconds, time_to_int
+from src.rollups import GRAINS, period_key
+
+BATCH_SIZE=4096
+GROUPS=["day","week","month","year","weekday","tag"]
+
+
+class EventBatch:
+    """Columns of a batch of (date, ChronoEvent) pairs, used to evaluate compiled predicates vectorized."""
+
+    def __init__(self, rows:List[Tuple[date, Any]]):
+        self.rows=rows
+        self.start=np.array([time_to_int(event.start) for _, event in rows], dtype=np.int64)
+        self.end=np.array([time_to_int(event.end) for _, event in rows], dtype=np.int64)
+        self.weekday=np.array([d.weekday() for d, _ in rows], dtype=np.int64)
+        self.what=np.array([event.what.lower() for _, event in rows], dtype=str)
+        tag_rows:Dict[str, List[int]]=dict()
+        for i, (_, event) in enumerate(rows):
+            for tag in event.tags:
+                tag_rows.setdefault(tag, []).append(i)
+        self.tags={tag:np.array(indices, dtype=np.int64) for tag, indices in tag_rows.items()} # rows having the tag
+
+    def __len__(self)->int:
+        return len(self.rows)
+
+    def tag_mask(self, tag:str)->np.ndarray:
+        rtn=np.zeros(len(self), dtype=bool)
+        if tag in self.tags.keys(): rtn[self.tags[tag]]=True
+        return rtn
+
+
+class Predicate(ABC):
+    """A compiled condition on events. mask evaluates it for a whole EventBatch,
+    required_tags are tags every matching event has (used for index lookups)."""
+
+    @abstractmethod
+    def mask(self, batch:EventBatch)->np.ndarray:
+        pass
+
+    def required_tags(self)->Set[str]:
+        return set()
+
+
+class TagPredicate(Predicate):
+    def __init__(self, tag:str):
+        self.tag=tag
+
+    def mask(self, batch:EventBatch)->np.ndarray:
+        return batch.tag_mask(self.tag)
+
+    def required_tags(self)->Set[str]:
+        return {self.tag}
+
+
+class WhatPredicate(Predicate):
+    def __init__(self, text:str):
+        self.text=text.lower()
+
+    def mask(self, batch:EventBatch)->np.ndarray:
+        return np.char.find(batch.what, self.text)>=0
+
+
+class TimePredicate(Predicate):
+    """Events overlapping [start,end) (seconds since midnight)."""
+
+    def __init__(self, start:int, end:int):
+        self.start=start
+        self.end=end
+
+    def mask(self, batch:EventBatch)->np.ndarray:
+        return (batch.start<self.end)&(batch.end>self.start)
+
+
+class WeekdayPredicate(Predicate):
+    def __init__(self, weekdays:Set[int]):
+        self.weekdays=np.array(sorted(weekdays))
+
+    def mask(self, batch:EventBatch)->np.ndarray:
+        return np.isin(batch.weekday, self.weekdays)
+
+
+class NotPredicate(Predicate):
+    def __init__(self, p:Predicate):
+        self.p=p
+
+    def mask(self, batch:EventBatch)->np.ndarray:
+        return ~self.p.mask(batch)
+
+
+class AndPredicate(Predicate):
+    def __init__(self, ps:List[Predicate]):
+        self.ps=ps
+
+    def mask(self, batch:EventBatch)->np.ndarray:
+        rtn=np.ones(len(batch), dtype=bool)
+        for p in self.ps:
+            rtn&=p.mask(batch)
+        return rtn
+
+    def required_tags(self)->Set[str]:
+        return set().union(*[p.required_tags() for p in self.ps])
+
+
+class OrPredicate(Predicate):
+    def __init__(self, ps:List[Predicate]):
+        self.ps=ps
+
+    def mask(self, batch:EventBatch)->np.ndarray:
+        rtn=np.zeros(len(batch), dtype=bool)
+        for p in self.ps:
+            rtn|=p.mask(batch)
+        return rtn
+
+
+def parse_weekday(s:str)->int:
+    """Weekday by index (0=Monday) or (abbreviated) name."""
+    if s.isdigit(): return int(s)
+    for i, name in enumerate(WEEKDAYS):
+        if name.lower().startswith(s.lower()): return i
+    raise Exception(f"unknown weekday: {s}")
+
+
+class ChronoQuery:
+    """A query over the events of a ChronoProject, e.g.
+    tag:mathe and not tag:uni date:i-30..stop time:06:00..09:00 group:week sum:duration
+
+    Conditions: tag:X, what:X (substring), time:HH:MM..HH:MM (overlap), weekday:Mon..Fri or weekday:Sat,Sun,
+    combined with and (default), or, not and parentheses.
+    Options: date:start..stop (IntelliRef), group:day|week|month|year|weekday|tag, sum:duration|count."""
+
+    predicate:Predicate
+    start:str
+    stop:str
+    group:Optional[str]
+    aggregate:Optional[str]
+
+    def __init__(self, terms:List[str]):
+        """Compiles the query given as a list of terms."""
+        self.start, self.stop="start", "stop"
+        self.group=None
+        self.aggregate=None
+        tokens:List[str]=[]
+        for term in terms:
+            while term.startswith("("):
+                tokens.append("(")
+                term=term[1:]
+            closing=len(term)-len(term.rstrip(")"))
+            if term[:len(term)-closing]!="": tokens.append(term[:len(term)-closing])
+            tokens+=[")" for _ in range(closing)]
+        conditions=[token for token in tokens if not self.option(token)]
+        self.tokens=conditions
+        self.pos=0
+        self.predicate=self.parse_or() if conditions!=[] else AndPredicate([])
+        if self.pos<len(self.tokens):
+            raise Exception(f"unexpected token: {self.tokens[self.pos]}")
+        if self.group!=None and self.aggregate==None: self.aggregate="count"
+
+    def option(self, token:str)->bool:
+        """Consumes options (date, group, sum). Returns False for everything else."""
+        key, _, value=token.partition(":")
+        if key=="date":
+            self.start, _, self.stop=value.partition("..")
+            if self.stop=="": self.stop=self.start
+        elif key=="group":
+            if not value in GROUPS: raise Exception(f"unknown group: {value}")
+            self.group=value
+        elif key=="sum":
+            if not value in ["duration","count"]: raise Exception(f"unknown sum: {value}")
+            self.aggregate=value
+        else:
+            return False
+        return True
+
+    def peek(self)->Optional[str]:
+        return self.tokens[self.pos] if self.pos<len(self.tokens) else None
+
+    def parse_or(self)->Predicate:
+        ps=[self.parse_and()]
+        while self.peek()=="or":
+            self.pos+=1
+            ps.append(self.parse_and())
+        return ps[0] if len(ps)==1 else OrPredicate(ps)
+
+    def parse_and(self)->Predicate:
+        ps=[self.parse_not()]
+        while (token:=self.peek())!=None and token not in ["or",")"]:
+            if token=="and": self.pos+=1
+            ps.append(self.parse_not())
+        return ps[0] if len(ps)==1 else AndPredicate(ps)
+
+    def parse_not(self)->Predicate:
+        token=self.peek()
+        if token==None:
+            raise Exception("incomplete query")
+        self.pos+=1
+        if token=="not":
+            return NotPredicate(self.parse_not())
+        if token=="(":
+            p=self.parse_or()
+            if self.peek()!=")": raise Exception("missing )")
+            self.pos+=1
+            return p
+        key, _, value=token.partition(":")
+        if key=="tag":
+            return TagPredicate(value)
+        elif key=="what":
+            return WhatPredicate(value)
+        elif key=="time":
+            a, _, b=value.partition("..")
+            return TimePredicate(str_to_seconds(a)*60 if a.count(":")==1 else str_to_seconds(a), str_to_seconds(b)*60 if b.count(":")==1 else str_to_seconds(b))
+        elif key=="weekday":
+            if ".." in value:
+                a, _, b=value.partition("..")
+                return WeekdayPredicate(set(range(parse_weekday(a), parse_weekday(b)+1)))
+            return WeekdayPredicate({parse_weekday(w) for w in value.split(",")})
+        raise Exception(f"unknown condition: {token}")
+
+    def candidate_days(self, project, reference:str)->Generator[Any, None, None]:
+        """Days in the date range containing all required tags, looked up in the tag index of the project."""
+        project.sync()
+        index=project.tag_graph
+        a=bisect_left(index.ordinals, project.date_from_str(self.start, reference).toordinal())
+        b=bisect_right(index.ordinals, project.date_from_str(self.stop, reference).toordinal())
+        required=self.predicate.required_tags()
+        for o in index.ordinals[a:b]:
+            if all(tag in index.buckets[o].tags for tag in required):
+                yield project.days[date.fromordinal(o).isoformat()]
+
+    def matches(self, project, reference:str)->Generator[Tuple[date, Any], None, None]:
+        """All matching (date, ChronoEvent) pairs sorted by date and start, evaluated in batches."""
+        rows:List[Tuple[date, Any]]=[]
+        for day in self.candidate_days(project, reference):
+            rows+=[(day.date, event) for event in day.get_slots()]
+            if len(rows)>=BATCH_SIZE:
+                yield from self.filter(rows)
+                rows=[]
+        yield from self.filter(rows)
+
+    def filter(self, rows:List[Tuple[date, Any]])->List[Tuple[date, Any]]:
+        if rows==[]: return []
+        mask=self.predicate.mask(EventBatch(rows))
+        return [row for row, m in zip(rows, mask) if m]
+
+    def header(self)->List[str]:
+        if self.aggregate==None: return ["date","start","end","what","tags"]
+        return [self.group if self.group!=None else "all", "hours" if self.aggregate=="duration" else "count"]
+
+    def keys(self, d:date, event)->List[str]:
+        """Group keys of an event."""
+        if self.group in GRAINS: return [period_key(d, self.group)]
+        elif self.group=="weekday": return [WEEKDAYS[d.weekday()]]
+        elif self.group=="tag": return list(dict.fromkeys(event.tags))
+        return ["all"]
+
+    def rows(self, project, reference:str)->Generator[List[Any], None, None]:
+        """Streams the result rows. Groups over consecutive dates are emitted as soon as they are complete."""
+        if self.aggregate==None:
+            for d, event in self.matches(project, reference):
+                yield [d.isoformat(), event.start.isoformat(), event.end.isoformat(), event.what, ",".join(event.tags)]
+            return
+        streaming=self.group in GRAINS
+        values:Dict[str, float]=dict()
+        for d, event in self.matches(project, reference):
+            value=(time_to_int(event.end)-time_to_int(event.start))/3600 if self.aggregate=="duration" else 1
+            for key in self.keys(d, event):
+                if streaming and values!={} and not key in values.keys():
+                    yield from ([k, v] for k, v in values.items())
+                    values={}
+                values[key]=values.get(key, 0)+value
+        if self.group=="weekday":
+            yield from ([k, values[k]] for k in WEEKDAYS if k in values.keys())
+        elif self.group=="tag":
+            yield from ([k, v] for k, v in sorted(values.items(), key=lambda kv:kv[1], reverse=True))
+        else:
+            yield from ([k, v] for k, v in values.items())
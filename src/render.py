@@ -0,0 +1,84 @@
+import importlib
+import itertools
+import sys
+from datetime import datetime
+from os import makedirs, path
+from types import ModuleType
+from typing import Any, Callable, List, Optional, Tuple
+
+HEADLESS=False
+BLOCKING=True
+FIGURE_DIR="./figures/"
+figure_ids=itertools.count(1)
+animations:List[Tuple[int, Any]]=[] # (figure number, animation) of the open non-blocking windows
+
+
+class LazyModule:
+    """Stands in for a module which is only imported when one of its attributes is used for the first time.
+    var:before is called right before the import."""
+
+    def __init__(self, name:str, before:Optional[Callable[[], None]]=None):
+        """Constructor: LazyModule."""
+        self._name=name
+        self._before=before
+        self._module:Optional[ModuleType]=None
+
+    def _load(self)->ModuleType:
+        if self._module==None:
+            if self._before!=None: self._before()
+            self._module=importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr:str)->Any:
+        return getattr(self._load(), attr)
+
+
+def configure_backend()->None:
+    """Selects the Agg backend before pyplot is imported if Chrono runs headless."""
+    if HEADLESS:
+        import matplotlib
+        matplotlib.use("Agg")
+
+
+plt=LazyModule("matplotlib.pyplot", configure_backend)
+animation=LazyModule("matplotlib.animation", configure_backend)
+
+
+def set_headless(headless:bool=True, figure_dir:Optional[str]=None)->None:
+    """In headless mode figures are written to var:figure_dir instead of being shown (see show_plot)."""
+    global HEADLESS, FIGURE_DIR
+    HEADLESS=headless
+    if figure_dir!=None: FIGURE_DIR=figure_dir
+    if headless and "matplotlib.pyplot" in sys.modules:
+        plt.switch_backend("Agg")
+
+
+def set_blocking(blocking:bool=True)->None:
+    """If var:blocking is False show_plot returns while the window is still open."""
+    global BLOCKING
+    BLOCKING=blocking
+
+
+def show_plot(name:str="figure", anim:Any=None)->Optional[str]:
+    """Shows the current figure (or var:anim). Unless BLOCKING is set the window stays open while Chrono continues and
+    the next plot gets a new figure. In headless mode it is saved to FIGURE_DIR as png (gif for animations) and closed
+    instead; the file is returned."""
+    if not HEADLESS:
+        if BLOCKING:
+            plt.show()
+            return None
+        if anim!=None: animations.append((plt.gcf().number, anim)) # animations stop when they are garbage collected
+        for number in plt.get_fignums():
+            if plt.figure(number).axes==[]: plt.close(number) # opened for a plot which made its own figure
+        animations[:]=[(number, a) for number, a in animations if plt.fignum_exists(number)]
+        plt.show(block=False)
+        plt.pause(0.001)
+        plt.figure()
+        return None
+    makedirs(FIGURE_DIR, exist_ok=True)
+    file=path.join(FIGURE_DIR, f"{name}_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}_{next(figure_ids)}"+(".gif" if anim!=None else ".png"))
+    if anim!=None: anim.save(file, writer="pillow")
+    else: plt.savefig(file)
+    plt.close("all")
+    print(f"Saved {file}")
+    return file
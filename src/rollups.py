@@ -0,0 +1,155 @@
+from bisect import bisect_left, bisect_right, insort
+from datetime import date, timedelta
+import json
+from os import path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from src.helper import get_tf_length
+
+GRAINS=["day","week","month","year"]
+
+Contribution=Tuple[Dict[str, List[int]], Dict[str, float]]
+
+
+def period_key(d:date, grain:str)->str:
+    """The period of var:grain containing d, e.g. 2023-06-16, 2023-W24, 2023-06 or 2023."""
+    if grain=="day": return d.isoformat()
+    elif grain=="week": return f"{d.isocalendar()[0]}-W{d.isocalendar()[1]:02d}"
+    elif grain=="month": return d.isoformat()[:7]
+    elif grain=="year": return d.isoformat()[:4]
+    raise Exception(f"unknown grain: {grain}")
+
+
+def day_tags(events:Iterable)->Dict[str, List[int]]:
+    """[seconds, count] of every tag of the events of one day."""
+    tags:Dict[str, List[int]]=dict()
+    for event in events:
+        length=get_tf_length((event.start, event.end))
+        for tag in set(event.tags):
+            entry=tags.setdefault(tag, [0, 0])
+            entry[0]+=length
+            entry[1]+=1
+    return tags
+
+
+class RollupIndex:
+    """Materialized per-period totals of a ChronoProject. For every grain (day, week, month, year) and period
+    tables[grain][period]["tags"][tag] is [seconds, count] and tables[grain][period]["functions"][name] is [sum, count].
+    The contribution of every day is kept, so a changed day is subtracted and added again instead of rebuilding
+    the tables. Days in dirty are not up to date yet (see ChronoProject.sync_rollups)."""
+
+    days:Dict[str, Contribution]
+    keys:List[str]
+    tables:Dict[str, Dict[str, Dict[str, Dict[str, List[float]]]]]
+    dirty:Set[str]
+
+    def __init__(self):
+        """Constructor: RollupIndex."""
+        self.days=dict()
+        self.keys=[]
+        self.tables={grain:dict() for grain in GRAINS}
+        self.dirty=set()
+
+    def _apply(self, d:date, contribution:Contribution, sign:int)->None:
+        tags, functions=contribution
+        for grain in GRAINS:
+            period=period_key(d, grain)
+            entry=self.tables[grain].setdefault(period, {"tags":dict(), "functions":dict()})
+            for tag, (seconds, count) in tags.items():
+                total=entry["tags"].setdefault(tag, [0, 0])
+                total[0]+=sign*seconds
+                total[1]+=sign*count
+                if total[1]==0: entry["tags"].pop(tag)
+            for name, value in functions.items():
+                total=entry["functions"].setdefault(name, [0.0, 0])
+                total[0]+=sign*value
+                total[1]+=sign
+                if total[1]==0: entry["functions"].pop(name)
+            if entry["tags"]=={} and entry["functions"]=={}:
+                self.tables[grain].pop(period)
+
+    def update_day(self, d:date, events:Iterable, functions:Dict[str, float])->None:
+        """Replaces the contribution of d."""
+        self.remove_day(d)
+        contribution=(day_tags(events), dict(functions))
+        self.days[d.isoformat()]=contribution
+        insort(self.keys, d.isoformat())
+        self._apply(d, contribution, 1)
+
+    def remove_day(self, d:date)->None:
+        """Removes the contribution of d."""
+        if (key:=d.isoformat()) in self.days.keys():
+            self._apply(d, self.days.pop(key), -1)
+            self.keys.pop(bisect_left(self.keys, key))
+
+    def get(self, grain:str, period:str)->Dict[str, Dict[str, List[float]]]:
+        """The totals of a single period."""
+        return self.tables[grain].get(period, {"tags":dict(), "functions":dict()})
+
+    def periods(self, grain:str, start:date, stop:date)->List[Tuple[str, Dict[str, Dict[str, List[float]]]]]:
+        """All (period, totals) of var:grain with data overlapping [start,stop], sorted."""
+        first, last=period_key(start, grain), period_key(stop, grain)
+        return [(period, self.tables[grain][period]) for period in sorted(self.tables[grain].keys()) if first<=period<=last]
+
+    def count_days(self, start:date, stop:date)->int:
+        """Number of days in [start,stop]."""
+        return bisect_right(self.keys, stop.isoformat())-bisect_left(self.keys, start.isoformat())
+
+    def blocks(self, start:date, stop:date)->List[Tuple[str, str]]:
+        """Decomposes [start,stop] into as few (grain, period) blocks as possible: whole years, whole months and
+        single days."""
+        rtn:List[Tuple[str, str]]=[]
+        d=start
+        while d<=stop:
+            if d.month==1 and d.day==1 and (end:=date(d.year, 12, 31))<=stop:
+                rtn.append(("year", period_key(d, "year")))
+            elif d.day==1 and (end:=(date(d.year+d.month//12, d.month%12+1, 1)-timedelta(days=1)))<=stop:
+                rtn.append(("month", period_key(d, "month")))
+            else:
+                end=d
+                rtn.append(("day", period_key(d, "day")))
+            d=end+timedelta(days=1)
+        return rtn
+
+    def tag_total(self, tag:str, start:date, stop:date)->Tuple[int, int]:
+        """[seconds, count] of var:tag in [start,stop]."""
+        seconds, count=0, 0
+        for grain, period in self.blocks(start, stop):
+            if (entry:=self.get(grain, period)["tags"].get(tag))!=None:
+                seconds+=entry[0]
+                count+=entry[1]
+        return seconds, count
+
+    def function_total(self, name:str, start:date, stop:date)->Tuple[float, int]:
+        """[sum, count] of the function var:name in [start,stop]."""
+        value, count=0.0, 0
+        for grain, period in self.blocks(start, stop):
+            if (entry:=self.get(grain, period)["functions"].get(name))!=None:
+                value+=entry[0]
+                count+=entry[1]
+        return value, count
+
+    def to_dict(self)->Dict[str, Any]:
+        """Used to persist the rollups. The tables are rebuilt from the day contributions on load."""
+        return {"days":{key:{"tags":tags, "functions":functions} for key, (tags, functions) in self.days.items()}}
+
+    def save(self, file:str, stamp:List[int])->None:
+        """Saves the rollups, var:stamp identifies the project file they belong to."""
+        with open(file, "w+", encoding="utf-8") as f:
+            json.dump({"stamp":stamp, **self.to_dict()}, f)
+
+    @staticmethod
+    def load(file:str, stamp:List[int])->Optional["RollupIndex"]:
+        """Loads the rollups saved for the project file identified by var:stamp. None if they are missing or stale."""
+        if not path.exists(file):
+            return None
+        with open(file, "r", encoding="utf-8") as f:
+            d=json.load(f)
+        if d.get("stamp")!=stamp:
+            return None
+        rollups=RollupIndex()
+        for key, contribution in d["days"].items():
+            rollups.days[key]=(contribution["tags"], contribution["functions"])
+            rollups._apply(date.fromisoformat(key), rollups.days[key], 1)
+        rollups.keys=sorted(rollups.days.keys())
+        return rollups
@@ -0,0 +1,99 @@
+from datetime import date, timedelta
+from typing import Dict, List
+import numpy as np
+
+from src.helper import get_tf_length
+
+
+class ChronoSeries:
+    """Dense (day x series) view of a sorted list of ChronoDays. Days in between without a ChronoDay count as zero.
+    Tags are summed in hours, functions are taken from the project (optionally interpolated)."""
+
+    start:date
+    n:int
+    tags:List[str]
+    ys:Dict[str, np.ndarray]
+    corr:np.ndarray
+    present:np.ndarray
+
+    def __init__(self, project, days:List, tags:List[str], interpolate:int=0):
+        """Constructor: ChronoSeries. var:days has to be sorted by date."""
+        self.tags=list(dict.fromkeys(tags))
+        if days==[]:
+            self.start=date.today()
+            self.n=0
+        else:
+            self.start=days[0].date
+            self.n=(days[-1].date-self.start).days+1
+        self.ys={tag:np.zeros(self.n) for tag in self.tags}
+        self.corr=np.zeros(self.n)
+        self.present=np.zeros(self.n, dtype=bool)
+        fs=project.get_functions(days)
+        ftags=[tag for tag in self.tags if tag in fs]
+        etags={tag:k for k, tag in enumerate(self.tags) if not tag in fs}
+        rows:List[int]=[]
+        cols:List[int]=[]
+        hours:List[float]=[]
+        for day in days:
+            i=(day.date-self.start).days
+            self.present[i]=True
+            for event in day.events:
+                I=[tag for tag in self.tags if tag in event.tags]
+                if I==[]: continue
+                h=get_tf_length((event.start, event.end))/3600
+                self.corr[i]+=h*(len(I)-1)
+                for tag in I:
+                    if tag in etags:
+                        rows.append(i)
+                        cols.append(etags[tag])
+                        hours.append(h)
+        if hours!=[]:
+            m=np.zeros((len(self.tags), self.n))
+            np.add.at(m, (np.array(cols), np.array(rows)), np.array(hours))
+            for tag, k in etags.items():
+                self.ys[tag]=m[k]
+        for tag in ftags:
+            self.ys[tag]=project.get_function_range(tag, self.start, self.start+timedelta(days=self.n-1), interpolate)
+        if len(self.tags)>1:
+            self.ys["sum"]=sum(self.ys[tag] for tag in self.tags)-self.corr
+
+    @staticmethod
+    def between(project, reference:str, tags:List[str], start_date:str="start", end_date:str="stop", interpolate:int=0)->"ChronoSeries":
+        """Builds a ChronoSeries from the days in [var:start_date, var:end_date]. Both support IntelliRef."""
+        return ChronoSeries(project, project.analysis_get_between(start_date, end_date, reference), tags, interpolate)
+
+    @property
+    def dates(self)->List[date]:
+        """The date of each row."""
+        return [self.start+timedelta(days=i) for i in range(self.n)]
+
+    def index(self, d:date)->int:
+        """Row of the date var:d, -1 if it is out of range."""
+        i=(d-self.start).days
+        return i if 0<=i<self.n else -1
+
+    def at(self, key:str, ds:List[date])->np.ndarray:
+        """Values of the series var:key on the dates var:ds, NaN for dates out of range."""
+        i=np.array([(d-self.start).days for d in ds], dtype=np.int64)
+        inside=(0<=i)&(i<self.n)
+        rtn=np.full(len(ds), np.nan)
+        rtn[inside]=self.ys[key][i[inside]]
+        return rtn
+
+    def main_key(self)->str:
+        """The sum if there are multiple tags, otherwise the only tag."""
+        return "sum" if len(self.tags)>1 else self.tags[0]
+
+    def rolling(self, key:str, r:int)->np.ndarray:
+        """r-day moving average of the series var:key (prefix sums). The i-th value belongs to row i+r-1."""
+        c=np.concatenate(([0.0], np.cumsum(self.ys[key])))
+        return (c[r:]-c[:-r])/r
+
+    def weekday_average(self, key:str)->np.ndarray:
+        """Average of the series var:key for each weekday (0=Monday)."""
+        wd=(np.arange(self.n)+self.start.weekday())%7
+        return np.bincount(wd, weights=self.ys[key], minlength=7)/np.maximum(np.bincount(wd, minlength=7), 1)
+
+    def weekday_profile(self, key:str)->np.ndarray:
+        """The weekday average of each row."""
+        return self.weekday_average(key)[(np.arange(self.n)+self.start.weekday())%7]
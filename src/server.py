@@ -0,0 +1,192 @@
+import io
+import json
+import logging
+import os
+import secrets
+import socket
+import socketserver
+import sys
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Generator, IO, List, Optional, Tuple
+
+from src.helper import split_command
+
+SERVER_INFO="data/server.json"
+SOCKET_PATH="data/chrono.sock"
+AUTOSAVE=60.0 # seconds
+
+
+class ThreadLocalStdout:
+    """Replaces sys.stdout while serving: output of a thread capturing (see capture) goes to its buffer, all other
+    output to var:default."""
+
+    def __init__(self, default:IO[str]):
+        """Constructor: ThreadLocalStdout."""
+        self.default=default
+        self.local=threading.local()
+
+    def write(self, s:str)->int:
+        return (getattr(self.local, "buffer", None) or self.default).write(s)
+
+    def flush(self)->None:
+        (getattr(self.local, "buffer", None) or self.default).flush()
+
+    @contextmanager
+    def capture(self)->Generator[io.StringIO, None, None]:
+        self.local.buffer=io.StringIO()
+        try:
+            yield self.local.buffer
+        finally:
+            self.local.buffer=None
+
+
+class ChronoServer:
+    """Keeps the project of a ChronoClient in memory and executes commands sent over a Unix domain socket (a TCP socket on
+    localhost if Unix sockets are not available). The protocol is one JSON object per line in both directions:
+    {"token", "command", "reference"} is answered with {"ok", "output", "reference"} or {"ok": false, "error"};
+    {"token", "op": "stop"} saves and stops the server. The address and the token are written to SERVER_INFO, which only
+    the user can read. Commands of different connections run concurrently under the lock of the project (see
+    ChronoClient.execute); the project is saved every var:autosave seconds if a command changed it since the last save."""
+
+    def __init__(self, client, socket_path:str=SOCKET_PATH, port:int=0, autosave:float=AUTOSAVE):
+        """Constructor: ChronoServer. var:port is only used for the TCP fallback (0 picks a free port)."""
+        self.client=client
+        self.socket_path=socket_path
+        self.port=port
+        self.autosave=autosave
+        self.token=secrets.token_hex(16)
+        self.changed=False
+        self.stopped=threading.Event()
+        self.stdout=ThreadLocalStdout(sys.stdout)
+        self.server:Optional[socketserver.BaseServer]=None
+
+    def execute(self, line:str, reference:str)->Dict[str, Any]:
+        ip=split_command(line)
+        if ip==[]:
+            return {"ok":False, "error":"empty command"}
+        if not self.client.exists(ip[0].lower()):
+            return {"ok":False, "error":f"{ip[0]} does not exist"}
+        with self.stdout.capture() as output:
+            try:
+                reference=self.client.execute(ip, reference)
+            except Exception as e:
+                logging.warning(e)
+                return {"ok":False, "error":str(e), "output":output.getvalue()}
+            finally:
+                if self.client.mutates(ip[0].lower()): self.changed=True
+        return {"ok":True, "output":output.getvalue(), "reference":reference}
+
+    def handle(self, request:Dict[str, Any])->Dict[str, Any]:
+        if request.get("token")!=self.token:
+            return {"ok":False, "error":"invalid token"}
+        if request.get("op")=="stop":
+            threading.Thread(target=self.stop).start()
+            return {"ok":True, "output":"stopping\n"}
+        return self.execute(str(request.get("command", "")), str(request.get("reference", "base")))
+
+    def save(self)->None:
+        with self.client.project.lock.read():
+            if self.changed:
+                self.changed=False
+                self.client.project.save()
+                logging.info("server: saved")
+        self.client.perf.save()
+
+    def autosave_loop(self)->None:
+        while not self.stopped.wait(self.autosave):
+            try: self.save()
+            except Exception as e: logging.warning(f"server: autosave failed: {e}")
+
+    def make_server(self)->socketserver.BaseServer:
+        server=self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self)->None:
+                for line in self.rfile:
+                    try: response=server.handle(json.loads(line))
+                    except ValueError as e: response={"ok":False, "error":f"invalid request: {e}"}
+                    self.wfile.write((json.dumps(response)+"\n").encode("utf-8"))
+                    self.wfile.flush()
+
+        if hasattr(socket, "AF_UNIX"):
+            if os.path.exists(self.socket_path): os.remove(self.socket_path)
+            unix_server=socketserver.ThreadingUnixStreamServer(self.socket_path, Handler)
+            os.chmod(self.socket_path, 0o600)
+            return unix_server
+        return socketserver.ThreadingTCPServer(("127.0.0.1", self.port), Handler)
+
+    def write_info(self)->None:
+        if hasattr(socket, "AF_UNIX"): info={"family":"unix", "address":os.path.abspath(self.socket_path)}
+        else: info={"family":"tcp", "address":list(self.server.server_address)}
+        info.update({"token":self.token, "pid":os.getpid()})
+        fd=os.open(SERVER_INFO, os.O_WRONLY|os.O_CREAT|os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(info, f)
+
+    def serve(self)->None:
+        """Serves until stopped (stop request or KeyboardInterrupt), then saves."""
+        self.server=self.make_server()
+        self.server.daemon_threads=True
+        self.write_info()
+        sys.stdout=self.stdout
+        threading.Thread(target=self.autosave_loop, daemon=True).start()
+        print(f"Chrono serving on {self.socket_path if hasattr(socket, 'AF_UNIX') else self.server.server_address}", file=sys.__stdout__)
+        try:
+            self.server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stopped.set()
+            sys.stdout=self.stdout.default
+            self.save()
+            self.server.server_close()
+            for file in [SERVER_INFO]+([self.socket_path] if hasattr(socket, "AF_UNIX") else []):
+                if os.path.exists(file): os.remove(file)
+
+    def stop(self)->None:
+        if self.server!=None:
+            self.server.shutdown()
+
+
+def connect(info_file:str=SERVER_INFO, timeout:float=30.0)->Optional[Tuple[socket.socket, str]]:
+    """A connection to the running server and its token, None if there is none."""
+    if not os.path.exists(info_file):
+        return None
+    with open(info_file, "r", encoding="utf-8") as f:
+        info=json.load(f)
+    if info["family"]=="unix":
+        s=socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        address:Any=info["address"]
+    else:
+        s=socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        address=tuple(info["address"])
+    s.settimeout(timeout)
+    try:
+        s.connect(address)
+    except OSError:
+        s.close()
+        return None
+    return s, info["token"]
+
+
+def send(commands:List[str], reference:str="base", stop:bool=False, info_file:str=SERVER_INFO)->int:
+    """Thin client: sends var:commands to the running server over one connection (threading the reference through) and
+    prints their output. Returns 0 on success, 1 if a command failed and 2 if no server is running."""
+    connection=connect(info_file)
+    if connection==None:
+        print("No chrono server running (start one with --serve)", file=sys.stderr)
+        return 2
+    s, token=connection
+    requests=[{"op":"stop"}] if stop else [{"command":command} for command in commands]
+    with s, s.makefile("rwb") as f:
+        for request in requests:
+            f.write((json.dumps({"token":token, "reference":reference, **request})+"\n").encode("utf-8"))
+            f.flush()
+            response=json.loads(f.readline())
+            sys.stdout.write(response.get("output", ""))
+            if not response["ok"]:
+                print(response["error"], file=sys.stderr)
+                return 1
+            reference=response.get("reference", reference)
+    return 0
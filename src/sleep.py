@@ -0,0 +1,218 @@
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime
+import json
+from os import mkdir, path, replace
+from typing import Dict, List, Optional, Set, Tuple
+import numpy as np
+
+PHASES=["deep","light","rem","awake"] # phase i+1 of the oura sleep_phase_5_min string
+SLOT=5 # minutes per phase
+AWAKE=4
+ARRAYS=["ordinals","bedtime","offsets","lengths","phases"]
+
+
+def phases_from_str(pattern:str)->np.ndarray:
+    """The oura sleep_phase_5_min string as uint8 array."""
+    return np.frombuffer(pattern.encode("ascii"), dtype=np.uint8)-ord("0")
+
+
+def bedtime_offset(sleep_start:datetime, wake_day:date)->int:
+    """Minutes between midnight of var:wake_day and var:sleep_start (negative if the night starts the day before)."""
+    return (sleep_start.date()-wake_day).days*24*60+sleep_start.hour*60+sleep_start.minute
+
+
+def smooth(phases:np.ndarray)->np.ndarray:
+    """Removes single samples which differ from equal neighbours (see fix_oura)."""
+    rtn=phases.copy()
+    if len(phases)>2:
+        inner=phases[:-2]==phases[2:]
+        rtn[1:-1]=np.where(inner, phases[:-2], phases[1:-1])
+    return rtn
+
+
+class SleepStore:
+    """The sleep phases of all nights of a ChronoProject, packed into flat arrays: night k (sorted by the ordinal of the
+    day it ends on) starts bedtime[k] minutes after midnight of that day and its phases are
+    phases[offsets[k]:offsets[k]+lengths[k]]. Changes are collected in pending and packed on demand. The arrays can be
+    saved as .npy files and are memory mapped on load; save replaces the files instead of writing into them."""
+
+    ordinals:np.ndarray
+    bedtime:np.ndarray
+    offsets:np.ndarray
+    lengths:np.ndarray
+    phases:np.ndarray
+    pending:Dict[int, Optional[Tuple[int, np.ndarray]]]
+    dirty:Set[str]
+
+    def __init__(self):
+        """Constructor: SleepStore."""
+        self.ordinals=np.zeros(0, dtype=np.int64)
+        self.bedtime=np.zeros(0, dtype=np.int32)
+        self.offsets=np.zeros(0, dtype=np.int64)
+        self.lengths=np.zeros(0, dtype=np.int64)
+        self.phases=np.zeros(0, dtype=np.uint8)
+        self.pending=dict()
+        self.dirty=set()
+
+    def set_night(self, d:date, bedtime:int, phases:np.ndarray)->None:
+        """Sets the night ending on d."""
+        self.pending[d.toordinal()]=(bedtime, phases)
+
+    def remove_night(self, d:date)->None:
+        """Removes the night ending on d."""
+        self.pending[d.toordinal()]=None
+
+    def pack(self)->None:
+        """Applies the pending changes."""
+        if self.pending=={}: return
+        nights={int(o):(int(self.bedtime[k]), self.phases[self.offsets[k]:self.offsets[k]+self.lengths[k]]) for k, o in enumerate(self.ordinals)}
+        for o, night in self.pending.items():
+            if night==None: nights.pop(o, None)
+            else: nights[o]=night
+        ordinals=sorted(nights.keys())
+        self.ordinals=np.array(ordinals, dtype=np.int64)
+        self.bedtime=np.array([nights[o][0] for o in ordinals], dtype=np.int32)
+        self.lengths=np.array([len(nights[o][1]) for o in ordinals], dtype=np.int64)
+        self.offsets=np.concatenate(([0], np.cumsum(self.lengths)[:-1])).astype(np.int64) if ordinals!=[] else np.zeros(0, dtype=np.int64)
+        self.phases=np.concatenate([nights[o][1] for o in ordinals]).astype(np.uint8) if ordinals!=[] else np.zeros(0, dtype=np.uint8)
+        self.pending=dict()
+
+    def __len__(self)->int:
+        self.pack()
+        return len(self.ordinals)
+
+    def between(self, start:date, stop:date)->slice:
+        """The nights ending in [start,stop]."""
+        self.pack()
+        return slice(bisect_left(self.ordinals, start.toordinal()), bisect_right(self.ordinals, stop.toordinal()))
+
+    def night(self, d:date)->Optional[Tuple[int, np.ndarray]]:
+        """(bedtime, phases) of the night ending on d."""
+        s=self.between(d, d)
+        if s.start==s.stop: return None
+        k=s.start
+        return int(self.bedtime[k]), self.phases[self.offsets[k]:self.offsets[k]+self.lengths[k]]
+
+    def save(self, directory:str, stamp:List[int])->None:
+        """Saves the arrays to var:directory, var:stamp identifies the project file they belong to. Every file is written to a
+        temporary file which then replaces it, so stores mapping the old files (see load) keep reading consistent data."""
+        self.pack()
+        if not path.exists(directory):
+            mkdir(directory)
+        for name in ARRAYS:
+            file=path.join(directory, name+".npy")
+            with open(file+".tmp", "wb") as f:
+                np.save(f, np.asarray(getattr(self, name)))
+            replace(file+".tmp", file)
+        file=path.join(directory, "stamp.json")
+        with open(file+".tmp", "w+", encoding="utf-8") as f:
+            json.dump(stamp, f)
+        replace(file+".tmp", file)
+
+    @staticmethod
+    def load(directory:str, stamp:List[int])->Optional["SleepStore"]:
+        """Loads the arrays saved for the project file identified by var:stamp, memory mapped. None if they are missing or stale."""
+        if not path.exists(path.join(directory, "stamp.json")):
+            return None
+        with open(path.join(directory, "stamp.json"), "r", encoding="utf-8") as f:
+            if json.load(f)!=stamp: return None
+        store=SleepStore()
+        for name in ARRAYS:
+            setattr(store, name, np.load(path.join(directory, name+".npy"), mmap_mode="r"))
+        return store
+
+    def stats(self, start:date, stop:date)->"SleepStats":
+        """Analytics of the nights ending in [start,stop]."""
+        return SleepStats(self, start, stop)
+
+
+class SleepStats:
+    """Per night and summary statistics of a range of a SleepStore. All times are minutes relative to midnight of the
+    day the night ends on. Onset is the first and wake the end of the last non awake phase."""
+
+    dates:List[date]
+    minutes:np.ndarray
+    bedtime:np.ndarray
+    onset:np.ndarray
+    wake:np.ndarray
+    midpoint:np.ndarray
+
+    def __init__(self, store:SleepStore, start:date, stop:date):
+        """Constructor: SleepStats."""
+        s=store.between(start, stop)
+        ordinals=np.asarray(store.ordinals[s])
+        self.dates=[date.fromordinal(int(o)) for o in ordinals]
+        n=len(ordinals)
+        lengths=np.asarray(store.lengths[s])
+        offsets=np.asarray(store.offsets[s])
+        self.bedtime=np.asarray(store.bedtime[s]).astype(np.int64)
+        first=int(offsets[0]) if n>0 else 0
+        phases=np.asarray(store.phases[first:first+int(lengths.sum())])
+        night=np.repeat(np.arange(n), lengths)
+        local=np.arange(len(phases))-np.repeat(offsets-first, lengths)
+        self.minutes=np.zeros((n, len(PHASES)))
+        np.add.at(self.minutes, (night, np.clip(phases.astype(np.int64)-1, 0, len(PHASES)-1)), SLOT)
+        asleep=phases!=AWAKE
+        big=np.iinfo(np.int64).max
+        first_asleep=np.full(n, big)
+        last_asleep=np.full(n, -1)
+        np.minimum.at(first_asleep, night[asleep], local[asleep])
+        np.maximum.at(last_asleep, night[asleep], local[asleep])
+        valid=last_asleep>=0
+        self.onset=np.where(valid, self.bedtime+SLOT*np.where(valid, first_asleep, 0), np.nan)
+        self.wake=np.where(valid, self.bedtime+SLOT*(last_asleep+1), np.nan)
+        self.midpoint=(self.onset+self.wake)/2
+        self.ordinals=ordinals
+        self.store=store
+        self.slice=s
+
+    def __len__(self)->int:
+        return len(self.dates)
+
+    def drift(self)->float:
+        """Slope of the midpoints (minutes per day)."""
+        valid=~np.isnan(self.midpoint)
+        if valid.sum()<2: return 0.0
+        return float(np.polyfit(self.ordinals[valid].astype(float), self.midpoint[valid], 1)[0])
+
+    def sleep_grid(self)->np.ndarray:
+        """(day x 5 minute slot) matrix of the consecutive days from the first to the last night (noon to noon),
+        True while asleep."""
+        if len(self)==0: return np.zeros((0, 24*60//SLOT), dtype=bool)
+        slots=24*60//SLOT
+        days=int(self.ordinals[-1]-self.ordinals[0])+1
+        grid=np.zeros(days*slots, dtype=bool)
+        s=self.slice
+        lengths=np.asarray(self.store.lengths[s])
+        offsets=np.asarray(self.store.offsets[s])
+        first=int(offsets[0])
+        phases=np.asarray(self.store.phases[first:first+int(lengths.sum())])
+        # position of each sample on the noon to noon grid
+        base=(self.ordinals-self.ordinals[0])*slots+(self.bedtime+12*60)//SLOT
+        position=np.repeat(base, lengths)+np.arange(len(phases))-np.repeat(offsets-first, lengths)
+        inside=(position>=0)&(position<len(grid))
+        grid[position[inside]]=phases[inside]!=AWAKE
+        return grid.reshape(days, slots)
+
+    def regularity(self)->float:
+        """Sleep regularity index: 200*P(same state 24h apart)-100 over pairs of consecutive days with data."""
+        if len(self)<2: return float("nan")
+        grid=self.sleep_grid()
+        present=np.zeros(len(grid), dtype=bool)
+        present[(self.ordinals-self.ordinals[0]).astype(np.int64)]=True
+        pairs=present[:-1]&present[1:]
+        if not pairs.any(): return float("nan")
+        return float(200*np.mean(grid[:-1][pairs]==grid[1:][pairs])-100)
+
+    def summary(self)->Dict[str, float]:
+        """Means and standard deviations of the range."""
+        rtn:Dict[str, float]={"nights":len(self)}
+        for i, phase in enumerate(PHASES):
+            rtn[phase]=float(self.minutes[:, i].mean()) if len(self)>0 else 0.0
+        for name in ["onset","wake","midpoint"]:
+            values=getattr(self, name)
+            rtn[name]=float(np.nanmean(values)) if len(self)>0 and not np.isnan(values).all() else float("nan")
+            rtn[name+"_std"]=float(np.nanstd(values)) if len(self)>0 and not np.isnan(values).all() else float("nan")
+        rtn["drift"]=self.drift()
+        rtn["regularity"]=self.regularity()
+        return rtn
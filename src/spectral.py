@@ -0,0 +1,55 @@
+from typing import Dict, List, Tuple
+import numpy as np
+from scipy.fft import rfft, rfftfreq
+from scipy.signal import welch
+
+from src.series import ChronoSeries
+
+
+class ChronoSpectrum:
+    """Spectra of several series at once. The series are the rows of a (series x day) matrix which is transformed
+    along the day axis in a single call. Days without a ChronoDay count as 0."""
+
+    keys:List[str]
+    periods:np.ndarray
+    power:np.ndarray
+    first:int
+    last:int
+
+    def __init__(self, series:ChronoSeries, keys:List[str], method:str="fft"):
+        """Constructor: ChronoSpectrum. The matrix is cut to the days between the first and the last nonzero value of
+        any of the series and each row is centered. var:method is either "fft" (amplitudes) or "welch" (power density)."""
+        self.keys=keys
+        self.start=series.start
+        Y=np.stack([series.ys[key] for key in keys]) if keys!=[] else np.zeros((0, series.n))
+        nonzero=np.flatnonzero(np.any(Y!=0, axis=0))
+        self.first, self.last=(int(nonzero[0]), int(nonzero[-1])) if len(nonzero)>0 else (0, -1)
+        Y=Y[:, self.first:self.last+1]
+        Y=Y-Y.mean(axis=1, keepdims=True) if Y.shape[1]>0 else Y
+        N=Y.shape[1]
+        if method=="welch":
+            freqs, self.power=welch(Y, fs=1.0, nperseg=min(N, 256), axis=1) if N>1 else (np.zeros(0), np.zeros((len(keys), 0)))
+        elif method=="fft":
+            freqs=rfftfreq(N, 1)
+            self.power=2.0/max(N, 1)*np.abs(rfft(Y, axis=1)) if N>0 else np.zeros((len(keys), 0))
+        else:
+            raise Exception(f"unknown method: {method}")
+        freqs=np.asarray(freqs)
+        self.periods=np.divide(1.0, freqs, out=np.full(freqs.shape, np.inf), where=freqs!=0)
+        self.days=N
+
+    def dominant(self, top:int=3, min_period:float=2, max_period:float=31)->Dict[str, List[Tuple[float, float]]]:
+        """The var:top strongest periods (in days) with min_period<=period<=max_period of each series, strongest first."""
+        allowed=np.flatnonzero((self.periods>=min_period)&(self.periods<=max_period))
+        rtn:Dict[str, List[Tuple[float, float]]]=dict()
+        for i, key in enumerate(self.keys):
+            ranked=allowed[np.argsort(-self.power[i, allowed], kind="stable")][:top]
+            rtn[key]=[(float(self.periods[j]), float(self.power[i, j])) for j in ranked]
+        return rtn
+
+    def to_text(self, top:int=3, min_period:float=2, max_period:float=31)->str:
+        """Text representation of dominant, used for headless runs."""
+        lines=[f"{self.days} data points"]
+        for key, peaks in self.dominant(top, min_period, max_period).items():
+            lines.append(f"{key}: "+", ".join(f"{period:.2f} days ({strength:.3f})" for period, strength in peaks))
+        return "\n".join(lines)
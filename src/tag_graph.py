@@ -0,0 +1,123 @@
+from bisect import bisect_left, bisect_right, insort
+from datetime import date
+from typing import Dict, List, Tuple, Iterable
+
+from src.helper import get_tf_length
+from src.render import LazyModule
+
+nx=LazyModule("networkx")
+
+Pair=Tuple[str, str]
+
+
+class TagDayBucket:
+    """Co-occurrence data of a single ChronoDay. pairs and tags map to [seconds, count]."""
+
+    pairs:Dict[Pair, List[int]]
+    tags:Dict[str, List[int]]
+    solo:Dict[str, int]
+
+    def __init__(self, events:Iterable):
+        """Constructor: TagDayBucket. Scans the events of one day once."""
+        self.pairs=dict()
+        self.tags=dict()
+        self.solo=dict()
+        for event in events:
+            length=get_tf_length((event.start, event.end))
+            if len(event.tags)==1:
+                self.solo[event.tags[0]]=self.solo.get(event.tags[0], 0)+1
+            tags=sorted(set(event.tags))
+            for i, tag1 in enumerate(tags):
+                entry=self.tags.setdefault(tag1, [0, 0])
+                entry[0]+=length
+                entry[1]+=1
+                for tag2 in tags[i+1:]:
+                    entry=self.pairs.setdefault((tag1, tag2), [0, 0])
+                    entry[0]+=length
+                    entry[1]+=1
+
+
+class TagGraphIndex:
+    """Weighted tag co-occurrence graph of a ChronoProject, bucketed by day. The buckets form a sparse symmetric
+    matrix (seconds, count) per day; the diagonal (tags) contains the total per tag. Arbitrary date ranges are
+    summed over the buckets, so no events have to be scanned."""
+
+    buckets:Dict[int, TagDayBucket]
+    ordinals:List[int]
+
+    def __init__(self):
+        """Constructor: TagGraphIndex."""
+        self.buckets=dict()
+        self.ordinals=[]
+
+    def update_day(self, d:date, events:Iterable)->None:
+        """Replaces the bucket of d."""
+        if not (o:=d.toordinal()) in self.buckets.keys():
+            insort(self.ordinals, o)
+        self.buckets[o]=TagDayBucket(events)
+
+    def remove_day(self, d:date)->None:
+        """Removes the bucket of d."""
+        if (o:=d.toordinal()) in self.buckets.keys():
+            self.buckets.pop(o)
+            self.ordinals.pop(bisect_left(self.ordinals, o))
+
+    def between(self, start:date, stop:date)->List[TagDayBucket]:
+        """All buckets in [start,stop]."""
+        a=bisect_left(self.ordinals, start.toordinal())
+        b=bisect_right(self.ordinals, stop.toordinal())
+        return [self.buckets[o] for o in self.ordinals[a:b]]
+
+    def sums(self, start:date, stop:date)->Tuple[Dict[Pair, List[int]], Dict[str, List[int]], Dict[str, int]]:
+        """Sums pairs, tags and solo occurrences over [start,stop]."""
+        pairs:Dict[Pair, List[int]]=dict()
+        tags:Dict[str, List[int]]=dict()
+        solo:Dict[str, int]=dict()
+        for bucket in self.between(start, stop):
+            for pair, (seconds, count) in bucket.pairs.items():
+                entry=pairs.setdefault(pair, [0, 0])
+                entry[0]+=seconds
+                entry[1]+=count
+            for tag, (seconds, count) in bucket.tags.items():
+                entry=tags.setdefault(tag, [0, 0])
+                entry[0]+=seconds
+                entry[1]+=count
+            for tag, count in bucket.solo.items():
+                solo[tag]=solo.get(tag, 0)+count
+        return pairs, tags, solo
+
+    def graph(self, start:date, stop:date, ignored_tags:List[str]=[], solo_nodes:bool=True)->"nx.Graph":
+        """The co-occurrence graph of [start,stop]. Edges carry the accumulated seconds (weight) and the number
+        of shared events (count). Tags in ignored_tags do not get edges; tags which only ever occur alone are
+        nodes iff solo_nodes."""
+        pairs, _, solo=self.sums(start, stop)
+        g=nx.Graph()
+        if solo_nodes:
+            g.add_nodes_from(solo.keys())
+        for (tag1, tag2), (seconds, count) in pairs.items():
+            if tag1 not in ignored_tags and tag2 not in ignored_tags:
+                g.add_edge(tag1, tag2, weight=seconds, count=count)
+        return g
+
+    def tag_seconds(self, start:date, stop:date)->Dict[str, int]:
+        """Total seconds of every tag in [start,stop]."""
+        return {tag:entry[0] for tag, entry in self.sums(start, stop)[1].items()}
+
+    def tags(self)->List[str]:
+        """All tags of all days."""
+        tags=set()
+        for bucket in self.buckets.values():
+            tags.update(bucket.tags.keys())
+        return list(tags)
+
+    def matrix(self, start:date, stop:date, count:bool=False):
+        """The symmetric co-occurrence matrix (scipy.sparse, seconds or counts) of [start,stop] and its tag order."""
+        from scipy.sparse import coo_matrix
+        pairs, tags, _=self.sums(start, stop)
+        order=sorted(tags.keys())
+        index={tag:i for i, tag in enumerate(order)}
+        k=int(count)
+        rows=[index[a] for a, b in pairs.keys()]+[index[b] for a, b in pairs.keys()]+list(range(len(order)))
+        cols=[index[b] for a, b in pairs.keys()]+[index[a] for a, b in pairs.keys()]+list(range(len(order)))
+        data=[v[k] for v in pairs.values()]*2+[tags[tag][k] for tag in order]
+        return coo_matrix((data, (rows, cols)), shape=(len(order), len(order))).tocsr(), order
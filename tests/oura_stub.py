@@ -0,0 +1,83 @@
+import json
+import random
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Tuple
+from urllib.parse import parse_qs, urlparse
+
+
+def night(day:str)->Dict[str, Any]:
+    """The (deterministic) sleep document of the night ending on var:day."""
+    rng=random.Random(day)
+    bedtime_start=f"{(date.fromisoformat(day)-timedelta(days=1)).isoformat()}T23:{rng.randint(0,59):02d}:{rng.randint(0,59):02d}+01:00"
+    return {"id":"id-"+day, "day":day, "bedtime_start":bedtime_start, "bedtime_end":"", "type":"long_sleep",
+            "sleep_phase_5_min":"".join(rng.choice("1234") for _ in range(rng.randint(60,100)))}
+
+
+class OuraStub(ThreadingHTTPServer):
+    """Local stand-in for the sleep endpoint of the oura API v2. Returns var:page_size nights per page (following next_token),
+    answers the next var:rate_limited requests with 429 and Retry-After: 0 and delays every response by var:latency seconds.
+    Records the query of every request and the maximal number of concurrent requests."""
+
+    def __init__(self, page_size:int=10, latency:float=0.0):
+        """Constructor: OuraStub."""
+        super().__init__(("127.0.0.1", 0), OuraHandler)
+        self.page_size=page_size
+        self.latency=latency
+        self.rate_limited=0
+        self.requests:List[Dict[str, str]]=[]
+        self.concurrent=0
+        self.max_concurrent=0
+        self.lock=threading.Lock()
+        self.daemon_threads=True
+
+    @property
+    def url(self)->str:
+        return f"http://127.0.0.1:{self.server_address[1]}/"
+
+    def start(self)->"OuraStub":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self)->None:
+        self.shutdown()
+        self.server_close()
+
+    def respond(self, query:Dict[str, str])->Tuple[int, Dict[str, Any]]:
+        with self.lock:
+            self.requests.append(query)
+            if self.rate_limited>0:
+                self.rate_limited-=1
+                return 429, {}
+        start, stop=date.fromisoformat(query["start_date"]), date.fromisoformat(query["end_date"])
+        days=[(start+timedelta(days=i)).isoformat() for i in range((stop-start).days+1)]
+        offset=int(query.get("next_token", "0"))
+        return 200, {"data":[night(day) for day in days[offset:offset+self.page_size]],
+                     "next_token":str(offset+self.page_size) if offset+self.page_size<len(days) else None}
+
+
+class OuraHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, *args:Any)->None:
+        pass
+
+    def do_GET(self)->None:
+        stub:OuraStub=self.server
+        with stub.lock:
+            stub.concurrent+=1
+            stub.max_concurrent=max(stub.max_concurrent, stub.concurrent)
+        try:
+            time.sleep(stub.latency)
+            status, body=stub.respond({key:value[0] for key, value in parse_qs(urlparse(self.path).query).items()})
+            content=json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            if status==429: self.send_header("Retry-After", "0")
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+        finally:
+            with stub.lock:
+                stub.concurrent-=1
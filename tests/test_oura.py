@@ -0,0 +1,103 @@
+import os
+import tempfile
+import unittest
+from datetime import date, timedelta
+
+from src.oura import OuraClient, chunks
+from tests.oura_stub import OuraStub, night
+
+
+def days_ago(n:int)->str:
+    return (date.today()-timedelta(days=n)).isoformat()
+
+
+class OuraClientTest(unittest.TestCase):
+
+    def setUp(self):
+        self.stub=OuraStub(page_size=10).start()
+        self.cache=tempfile.TemporaryDirectory()
+        self.client=OuraClient("code", self.stub.url, self.cache.name, backoff=0.01)
+
+    def tearDown(self):
+        self.client.close()
+        self.stub.stop()
+        self.cache.cleanup()
+
+    def test_pagination(self):
+        nights=self.client.get_sleep(days_ago(40), days_ago(16))
+        self.assertEqual(len(nights), 25)
+        self.assertEqual(nights[days_ago(20)][2], night(days_ago(20))["sleep_phase_5_min"])
+        self.assertEqual([request.get("next_token") for request in self.stub.requests], [None, "10", "20"])
+
+    def test_rate_limit(self):
+        self.stub.rate_limited=2
+        nights=self.client.get_sleep(days_ago(40), days_ago(36))
+        self.assertEqual(len(nights), 5)
+        self.assertEqual(len(self.stub.requests), 3)
+
+    def test_retries_exhausted(self):
+        self.stub.rate_limited=10
+        client=OuraClient("code", self.stub.url, None, retries=2, backoff=0.01)
+        with self.assertRaises(Exception):
+            client.get_sleep(days_ago(40), days_ago(36))
+        client.close()
+        self.assertEqual(len(self.stub.requests), 3)
+
+    def test_cache(self):
+        first=self.client.get_sleep(days_ago(40), days_ago(31))
+        self.assertEqual(len(self.stub.requests), 1)
+        self.assertEqual(self.client.get_sleep(days_ago(40), days_ago(31)), first)
+        self.assertEqual(len(self.stub.requests), 1)
+        self.client.get_sleep(days_ago(40), days_ago(31), refresh=True)
+        self.assertEqual(len(self.stub.requests), 2)
+
+    def test_cache_fetches_missing_runs(self):
+        self.client.get_sleep(days_ago(40), days_ago(31))
+        os.remove(self.client.cache_file(days_ago(35)))
+        os.remove(self.client.cache_file(days_ago(34)))
+        self.stub.requests.clear()
+        self.assertEqual(len(self.client.get_sleep(days_ago(40), days_ago(31))), 10)
+        self.assertEqual(self.stub.requests, [{"start_date":days_ago(35), "end_date":days_ago(34)}])
+
+    def test_provisional_nights_are_fetched_again(self):
+        self.client.get_sleep(days_ago(5), days_ago(0))
+        self.stub.requests.clear()
+        self.client.get_sleep(days_ago(5), days_ago(0))
+        self.assertEqual(self.stub.requests, [{"start_date":days_ago(self.client.provisional_days), "end_date":days_ago(0)}])
+
+
+class IterSleepTest(unittest.TestCase):
+
+    def setUp(self):
+        self.stub=OuraStub(page_size=100, latency=0.05).start()
+        self.client=OuraClient("code", self.stub.url, None, backoff=0.01, workers=3)
+
+    def tearDown(self):
+        self.client.close()
+        self.stub.stop()
+
+    def test_chunks(self):
+        self.assertEqual(chunks("2024-01-01", "2024-01-25", 10), [("2024-01-01", "2024-01-10"), ("2024-01-11", "2024-01-20"), ("2024-01-21", "2024-01-25")])
+        self.assertEqual(chunks("2024-01-01", "2024-01-01", 10), [("2024-01-01", "2024-01-01")])
+        self.assertEqual(chunks("2024-01-02", "2024-01-01", 10), [])
+
+    def test_chunk_order(self):
+        start, stop=days_ago(120), days_ago(10)
+        received=list(self.client.iter_sleep(start, stop, chunk_days=7))
+        self.assertEqual([(first, last) for first, last, _ in received], chunks(start, stop, 7))
+        for first, last, nights in received:
+            self.assertTrue(all(first<=day<=last for day in nights.keys()))
+        self.assertEqual(sum(len(nights) for _, _, nights in received), 111)
+        self.assertGreater(self.stub.max_concurrent, 1)
+        self.assertLessEqual(self.stub.max_concurrent, self.client.workers)
+
+    def test_chunk_order_with_rate_limit(self):
+        self.stub.rate_limited=3
+        start, stop=days_ago(60), days_ago(10)
+        received=list(self.client.iter_sleep(start, stop, chunk_days=5))
+        self.assertEqual([(first, last) for first, last, _ in received], chunks(start, stop, 5))
+        self.assertEqual(sum(len(nights) for _, _, nights in received), 51)
+
+
+if __name__=="__main__":
+    unittest.main()